@@ -0,0 +1,256 @@
+""" Asyncio version of QueryService
+
+AsyncQueryService has the same methods as QueryService as coroutines, so an asyncio app can await the queries
+rather than block the event loop. It uses SQLAlchemy's async engine with the aiosqlite driver, so many concurrent
+requests share a pool of connections rather than each needing a thread.
+
+The statements are not duplicated: each method runs the QueryService method in an AsyncSession with run_sync,
+where SQLAlchemy awaits the driver for each statement. The iter_ methods are async generators that stream rows.
+
+    queries = AsyncQueryService()
+    hosts = await queries.read_hosts()
+    async for row in queries.iter_games_host_country():
+        ...
+
+Requires the aiosqlite and greenlet packages.
+"""
+from contextlib import asynccontextmanager, nullcontext
+from contextvars import ContextVar
+from datetime import date
+from typing import AsyncIterator, Optional, Sequence, Union
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from para_app.database import db_file, pragma_listener, pragma_settings
+from para_app.models import Disability, Games, GamesSummary, Host
+from para_app.query_service import (DISABILITIES, FIRST_YEAR_CURSOR, GAMES_HOST_COUNTRY, PAGE_SIZE, READ_HOSTS,
+                                    SEARCH_LIMIT, STREAM_BATCH_SIZE, Page, QueryService)
+from para_app.result_cache import ResultCache
+
+async_db_url = f"sqlite+aiosqlite:///{str(db_file)}"
+
+
+def create_async_db_engine(url: str = async_db_url, profile: str = "default", pragmas: Optional[dict] = None,
+                           **kwargs):
+    """ Creates an async engine that applies the PRAGMAs of a profile on every new connection
+
+    Args:
+        url: database URL with an async driver, e.g. sqlite+aiosqlite:///paralympics.db
+        profile: name of a profile in para_app.database.PRAGMA_PROFILES
+        pragmas: PRAGMA name -> value, overriding or adding to those of the profile
+        **kwargs: passed to create_async_engine, e.g. pool_size=10
+
+    Raises:
+        ValueError: if the profile or a PRAGMA name is not supported
+    """
+    settings = pragma_settings(profile, pragmas)
+    new_engine = create_async_engine(url, **kwargs)
+    if settings:
+        event.listen(new_engine.sync_engine, "connect", pragma_listener(settings))
+    return new_engine
+
+
+class _SessionQueryService(QueryService):
+    """ QueryService that runs its methods in a given session, used by AsyncQueryService inside run_sync """
+
+    def __init__(self, session: Session, cache: Optional[ResultCache], flush_only: bool):
+        super().__init__(session.get_bind(), cache=cache)
+        self.session = session
+        self.flush_only = flush_only
+
+    def _session(self):
+        return nullcontext(self.session)
+
+    def _commit(self, session: Session):
+        if self.flush_only:
+            session.flush()
+        else:
+            session.commit()
+
+
+class AsyncQueryService:
+    """ Asyncio version of QueryService, see the module docstring
+
+    Attributes:
+        engine: SQLAlchemy AsyncEngine for the database
+        cache (ResultCache | None): cache for the results of the read methods, see QueryService
+    """
+
+    def __init__(self, eng=None, profile: str = "default", cache: Optional[ResultCache] = None):
+        """
+        Args:
+            eng: SQLAlchemy AsyncEngine for the database
+            profile: PRAGMA profile used to create an engine for paralympics.db when eng is None, see QueryService
+            cache: cache for the results of the read methods, see QueryService
+        """
+        self.engine = eng if eng is not None else create_async_db_engine(profile=profile)
+        self.cache = cache
+        # The session of the unit of work in progress in each asyncio task
+        self._scope: ContextVar[Optional[AsyncSession]] = ContextVar(f"unit_of_work_{id(self)}", default=None)
+
+    @asynccontextmanager
+    async def unit_of_work(self):
+        """ Runs the calls awaited in the async with block in one session and transaction, see
+        QueryService.unit_of_work. The unit of work belongs to the task that entered it. """
+        if self._scope.get() is not None:
+            yield self
+            return
+        async with AsyncSession(self.engine, expire_on_commit=False) as session:
+            token = self._scope.set(session)
+            try:
+                yield self
+                await session.commit()
+            except BaseException:
+                await session.rollback()
+                raise
+            finally:
+                self._scope.reset(token)
+        if self.cache is not None:
+            self.cache.invalidate()
+
+    async def _run(self, method, *args, **kwargs):
+        """ Runs a QueryService method in the unit of work's session, or a new session """
+        session = self._scope.get()
+        in_unit_of_work = session is not None
+
+        def run(sync_session: Session):
+            queries = _SessionQueryService(sync_session, None if in_unit_of_work else self.cache,
+                                           flush_only=in_unit_of_work)
+            return method(queries, *args, **kwargs)
+
+        if in_unit_of_work:
+            return await session.run_sync(run)
+        async with AsyncSession(self.engine) as session:
+            return await session.run_sync(run)
+
+    def invalidate_cache(self, *models):
+        """ Removes the cached results that read the tables of the models, or all cached results if none are given """
+        if self.cache is not None:
+            self.cache.invalidate(*(model.__tablename__ for model in models))
+
+    async def dispose(self):
+        """ Closes the engine's connections """
+        await self.engine.dispose()
+
+    # CRUD
+    async def read_hosts(self) -> Sequence[Host]:
+        return await self._run(QueryService.read_hosts)
+
+    async def create_host(self, place_name: str, country_name: str) -> Host:
+        return await self._run(QueryService.create_host, place_name, country_name)
+
+    async def read_host(self, host_id: int) -> Host:
+        return await self._run(QueryService.read_host, host_id)
+
+    async def update_host(self, updated_host: Host) -> Host:
+        return await self._run(QueryService.update_host, updated_host)
+
+    async def delete_host(self, host_id: int) -> None:
+        return await self._run(QueryService.delete_host, host_id)
+
+    async def create_hosts(self, hosts: Sequence[tuple[str, str]]) -> list[Host]:
+        return await self._run(QueryService.create_hosts, hosts)
+
+    async def read_hosts_by_ids(self, host_ids: Sequence[int]) -> list[Host]:
+        return await self._run(QueryService.read_hosts_by_ids, host_ids)
+
+    async def update_hosts(self, updated_hosts: Sequence[Host]) -> list[Host]:
+        return await self._run(QueryService.update_hosts, updated_hosts)
+
+    async def delete_hosts(self, host_ids: Sequence[int]) -> int:
+        return await self._run(QueryService.delete_hosts, host_ids)
+
+    # Queries
+    async def query_games_year_type(self) -> Sequence:
+        return await self._run(QueryService.query_games_year_type)
+
+    async def query_games_type_with_host(self, event_type: str) -> Sequence:
+        return await self._run(QueryService.query_games_type_with_host, event_type)
+
+    async def query_disabilities(self) -> Sequence:
+        return await self._run(QueryService.query_disabilities)
+
+    async def query_games_after_year(self, year: int) -> Sequence:
+        return await self._run(QueryService.query_games_after_year, year)
+
+    async def query_games_between_dates(self, start: Union[str, date], end: Union[str, date]) -> Sequence[Games]:
+        return await self._run(QueryService.query_games_between_dates, start, end)
+
+    async def query_games_by_start(self) -> Sequence[Games]:
+        return await self._run(QueryService.query_games_by_start)
+
+    async def query_region_teams(self, region: str) -> Sequence:
+        return await self._run(QueryService.query_region_teams, region)
+
+    async def query_host_country(self, country: str) -> Sequence:
+        return await self._run(QueryService.query_host_country, country)
+
+    async def query_games_host_country(self) -> Sequence:
+        return await self._run(QueryService.query_games_host_country)
+
+    async def query_disabilities_by_games(self) -> Sequence:
+        return await self._run(QueryService.query_disabilities_by_games)
+
+    async def query_games_summary(self) -> Sequence[GamesSummary]:
+        return await self._run(QueryService.query_games_summary)
+
+    async def query_teams_year(self, year: int, event_type: str) -> Sequence:
+        return await self._run(QueryService.query_teams_year, year, event_type)
+
+    async def query_games_disability(self, disability: str) -> Sequence:
+        return await self._run(QueryService.query_games_disability, disability)
+
+    async def search(self, text: str, prefix: bool = False, limit: int = SEARCH_LIMIT) -> Sequence:
+        return await self._run(QueryService.search, text, prefix, limit)
+
+    async def update_where(self, model, values: dict, **where) -> int:
+        return await self._run(QueryService.update_where, model, values, **where)
+
+    async def update_disability(self, description: str, new_description: str) -> int:
+        return await self._run(QueryService.update_disability, description, new_description)
+
+    async def export(self, query: str, output: str = "pandas", **params):
+        return await self._run(QueryService.export, query, output, **params)
+
+    async def games_metrics(self, *criteria):
+        return await self._run(QueryService.games_metrics, *criteria)
+
+    # Streaming and keyset pagination
+    async def _stream(self, statement, batch_size: int, scalars: bool = False) -> AsyncIterator:
+        """ Yields the results of the statement, fetching batch_size rows at a time
+
+        Args:
+            statement: select statement
+            batch_size: rows fetched at a time
+            scalars: if True, yield the first column of each row, e.g. the model instance
+        """
+        session = self._scope.get()
+        async with nullcontext(session) if session is not None else AsyncSession(self.engine) as session:
+            result = await session.stream(statement, execution_options={"yield_per": batch_size})
+            async for row in result.scalars() if scalars else result:
+                yield row
+
+    async def iter_hosts(self, batch_size: int = STREAM_BATCH_SIZE) -> AsyncIterator[Host]:
+        async for host in self._stream(READ_HOSTS, batch_size, scalars=True):
+            yield host
+
+    async def iter_disabilities(self, batch_size: int = STREAM_BATCH_SIZE) -> AsyncIterator[Disability]:
+        async for disability in self._stream(DISABILITIES, batch_size, scalars=True):
+            yield disability
+
+    async def iter_games_host_country(self, batch_size: int = STREAM_BATCH_SIZE) -> AsyncIterator:
+        async for row in self._stream(GAMES_HOST_COUNTRY, batch_size):
+            yield row
+
+    async def page_hosts(self, after_id: int = 0, limit: int = PAGE_SIZE) -> Page:
+        return await self._run(QueryService.page_hosts, after_id, limit)
+
+    async def page_games(self, after: tuple[int, int] = (FIRST_YEAR_CURSOR, 0), limit: int = PAGE_SIZE) -> Page:
+        return await self._run(QueryService.page_games, after, limit)
+
+    async def page_games_host_country(self, after: tuple[int, int, int] = (FIRST_YEAR_CURSOR, 0, 0),
+                                      limit: int = PAGE_SIZE) -> Page:
+        return await self._run(QueryService.page_games_host_country, after, limit)
@@ -0,0 +1,196 @@
+""" Benchmarks for the para_app services
+
+Run against a database file, e.g. one written by para_app.synthetic, with:
+
+    python -m para_app.benchmarks concurrency --db synthetic.db --requests 500 --concurrency 50
+    python -m para_app.benchmarks latency --db src/para_app/data/paralympics.db --calls 2000
+
+concurrency_benchmark compares answering many concurrent read requests with:
+
+- sync: QueryService, one request after another
+- threads: QueryService in a thread pool with a thread per concurrent request
+- sync in event loop: QueryService called from coroutines, as an asyncio app that embeds it would
+- async: AsyncQueryService, the requests awaited together on one event loop
+
+For the two event loop modes it also records the longest time the loop was blocked, which is how late a timer
+due every millisecond ran. Blocking calls hold the loop for a whole query, while awaited queries let other tasks
+run, which is the aim of the async service. Throughput depends on the workload: SQLite runs in-process and holds
+the GIL for much of each query, so overlapping requests gains little and aiosqlite adds a hand-off to its
+connection thread per statement.
+
+latency_benchmark times the calls of each QueryService read method one after another, without a result cache, so
+on a small database it shows the time spent in Python building, compiling and executing the statement rather than
+in SQLite. It also counts the statements that SQLAlchemy had to compile rather than take from the engine's compiled
+cache.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import GeneratorType
+
+from sqlalchemy import event
+
+from para_app.async_query_service import AsyncQueryService, create_async_db_engine
+from para_app.database import create_db_engine
+from para_app.query_plan import READ_CALLS
+from para_app.query_service import QueryService
+
+
+def _result(seconds: float, requests: int) -> dict:
+    return {"seconds": round(seconds, 4), "requests_per_second": round(requests / seconds, 1)}
+
+
+def concurrency_benchmark(db_path, requests: int = 200, concurrency: int = 20,
+                          method: str = "query_games_type_with_host", args: tuple = ("winter",)) -> dict:
+    """ Times answering requests calls of a read method with the sync and async query services
+
+    Args:
+        db_path: path of the SQLite database file
+        requests: number of calls of the method
+        concurrency: number of calls in progress at a time, and the size of the connection pools
+        method: name of the QueryService read method
+        args: arguments of the method
+
+    Returns:
+        dict of mode -> {'seconds': ..., 'requests_per_second': ...} for the modes 'sync', 'threads',
+        'sync in event loop' and 'async', the event loop modes also have 'max_loop_lag_ms'
+    """
+    results = {}
+    sync_engine = create_db_engine(f"sqlite:///{db_path}", profile="read-serving", pool_size=concurrency)
+    queries = QueryService(sync_engine)
+    call = getattr(queries, method)
+    call(*args)  # Warm up the pool and the page cache
+
+    start = time.perf_counter()
+    for _ in range(requests):
+        call(*args)
+    results["sync"] = _result(time.perf_counter() - start, requests)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        start = time.perf_counter()
+        list(pool.map(lambda _: call(*args), range(requests)))
+        results["threads"] = _result(time.perf_counter() - start, requests)
+
+    async def blocking_request():
+        return call(*args)
+
+    results["sync in event loop"] = asyncio.run(_timed_on_loop(blocking_request, requests))
+    sync_engine.dispose()
+
+    results["async"] = asyncio.run(_async_requests(db_path, requests, concurrency, method, args))
+    return results
+
+
+async def _async_requests(db_path, requests: int, concurrency: int, method: str, args: tuple) -> dict:
+    """ Times the async part of concurrency_benchmark """
+    queries = AsyncQueryService(create_async_db_engine(f"sqlite+aiosqlite:///{db_path}", profile="read-serving",
+                                                       pool_size=concurrency))
+    call = getattr(queries, method)
+    limit = asyncio.Semaphore(concurrency)
+
+    async def request():
+        async with limit:
+            return await call(*args)
+
+    await asyncio.gather(*(request() for _ in range(concurrency)))  # Open the pooled connections
+    result = await _timed_on_loop(request, requests)
+    await queries.dispose()
+    return result
+
+
+async def _timed_on_loop(request, requests: int) -> dict:
+    """ Times awaiting the requests together, recording the longest time the event loop was blocked """
+    lag = [0.0]
+    done = asyncio.Event()
+
+    async def monitor():
+        while not done.is_set():
+            due = time.perf_counter() + 0.001
+            await asyncio.sleep(0.001)
+            lag[0] = max(lag[0], time.perf_counter() - due)
+
+    monitor_task = asyncio.create_task(monitor())
+    await asyncio.sleep(0)
+    start = time.perf_counter()
+    await asyncio.gather(*(request() for _ in range(requests)))
+    result = _result(time.perf_counter() - start, requests)
+    done.set()
+    await monitor_task
+    result["max_loop_lag_ms"] = round(lag[0] * 1000, 2)
+    return result
+
+
+def latency_benchmark(db_path, calls: int = 1000) -> dict:
+    """ Times calls of each QueryService read method, as listed in para_app.query_plan.READ_CALLS
+
+    Args:
+        db_path: path of the SQLite database file
+        calls: number of calls of each method
+
+    Returns:
+        dict of method -> {'mean_us': ..., 'median_us': ..., 'compiled': ...}, where compiled is the number of
+        statements compiled rather than found in the compiled cache during the timed calls
+    """
+    engine = create_db_engine(f"sqlite:///{db_path}", profile="read-serving")
+    queries = QueryService(engine)
+    compiled = [0]
+
+    def count_compiled(conn, cursor, statement, parameters, context, executemany):
+        if context is not None and context.cache_hit != context.dialect.CACHE_HIT:
+            compiled[0] += 1
+
+    event.listen(engine, "before_cursor_execute", count_compiled)
+    results = {}
+    for name, kwargs in READ_CALLS:
+        call = getattr(queries, name)
+        _consume(call(**kwargs))  # Warm up the pool and the compiled cache
+        compiled[0] = 0
+        times = []
+        for _ in range(calls):
+            start = time.perf_counter()
+            _consume(call(**kwargs))
+            times.append(time.perf_counter() - start)
+        label = f"{name}({', '.join(f'{key}={value!r}' for key, value in kwargs.items())})"
+        results[label] = {"mean_us": round(statistics.fmean(times) * 1e6, 1),
+                          "median_us": round(statistics.median(times) * 1e6, 1), "compiled": compiled[0]}
+    event.remove(engine, "before_cursor_execute", count_compiled)
+    engine.dispose()
+    return results
+
+
+def _consume(result):
+    """ Reads a generator returned by an iter_ method to the end """
+    if isinstance(result, GeneratorType):
+        list(result)
+
+
+def main(argv=None):
+    """ Runs a benchmark from the command line and prints the results """
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+    concurrency = subparsers.add_parser("concurrency", help=concurrency_benchmark.__doc__.splitlines()[0])
+    concurrency.add_argument("--db", required=True, help="path of the SQLite database")
+    concurrency.add_argument("--requests", type=int, default=200)
+    concurrency.add_argument("--concurrency", type=int, default=20)
+    concurrency.add_argument("--method", default="query_games_type_with_host")
+    concurrency.add_argument("args", nargs="*", default=["winter"], help="arguments of the method")
+    latency = subparsers.add_parser("latency", help=latency_benchmark.__doc__.splitlines()[0])
+    latency.add_argument("--db", required=True, help="path of the SQLite database")
+    latency.add_argument("--calls", type=int, default=1000)
+    args = parser.parse_args(argv)
+
+    if args.benchmark == "concurrency":
+        results = concurrency_benchmark(args.db, args.requests, args.concurrency, args.method, tuple(args.args))
+        for mode, result in results.items():
+            lag = f"{result['max_loop_lag_ms']:>8.2f} ms max event loop lag" if "max_loop_lag_ms" in result else ""
+            print(f"{mode:<20} {result['seconds']:>9.3f}s {result['requests_per_second']:>10.1f} requests/s {lag}")
+    elif args.benchmark == "latency":
+        for call, result in latency_benchmark(args.db, args.calls).items():
+            print(f"{call:<60} {result['mean_us']:>9.1f} us mean {result['median_us']:>9.1f} us median "
+                  f"{result['compiled']:>6} compiled")
+
+
+if __name__ == "__main__":
+    main()
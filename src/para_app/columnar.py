@@ -0,0 +1,78 @@
+""" Column-oriented query results for analytics
+
+The QueryService read methods return SQLModel instances or Row tuples, one Python object per row. To hand results
+to NumPy or pandas it is quicker to run the statement with Core, which does not create model instances, and to
+turn each column into one array. The dtype of each array comes from the SQL type of the column:
+
+- Integer: int64, or float64 with NaN for NULL in NumPy and the nullable Int64 in pandas
+- Float and Numeric: float64, NULL is NaN
+- Date and DateTime: datetime64, NULL is NaT
+- anything else, e.g. text: object
+"""
+from typing import Sequence
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import Date, DateTime, Float, Integer, Numeric
+
+OUTPUTS = ["pandas", "numpy"]
+
+
+def _kind(sql_type) -> str:
+    """ Returns 'int', 'float', 'date', 'datetime' or 'object' for a SQLAlchemy column type """
+    if isinstance(sql_type, Integer):
+        return "int"
+    if isinstance(sql_type, (Float, Numeric)):
+        return "float"
+    if isinstance(sql_type, DateTime):
+        return "datetime"
+    if isinstance(sql_type, Date):
+        return "date"
+    return "object"
+
+
+def _numpy_column(values: Sequence, kind: str) -> np.ndarray:
+    if kind == "int":
+        return np.array(values, dtype=np.float64 if None in values else np.int64)
+    if kind == "float":
+        return np.array(values, dtype=np.float64)
+    if kind == "date":
+        return np.array(values, dtype="datetime64[D]")
+    if kind == "datetime":
+        return np.array(values, dtype="datetime64[us]")
+    column = np.empty(len(values), dtype=object)
+    column[:] = values
+    return column
+
+
+def _pandas_column(values: Sequence, kind: str):
+    if kind == "int" and None in values:
+        return pd.array(values, dtype="Int64")
+    return _numpy_column(values, kind)
+
+
+def result_columns(result, statement, output: str = "pandas"):
+    """ Returns the rows of a Core result as columns
+
+    Args:
+        result: result of executing the statement on a Connection
+        statement: the select statement, whose selected columns give the SQL types
+        output: 'pandas' for a DataFrame, 'numpy' for a dict of column name -> array
+
+    Returns:
+        pd.DataFrame or dict[str, np.ndarray] with a column per selected column, in order
+
+    Raises:
+        ValueError: if the output is not supported
+    """
+    if output not in OUTPUTS:
+        raise ValueError(f"{output} is not in {OUTPUTS}")
+    names = list(result.keys())
+    kinds = [_kind(column.type) for column in statement.selected_columns]
+    rows = result.fetchall()
+    values = list(zip(*rows)) if rows else [()] * len(names)
+    convert = _pandas_column if output == "pandas" else _numpy_column
+    columns = {name: convert(column, kind) for name, column, kind in zip(names, values, kinds)}
+    if output == "pandas":
+        return pd.DataFrame(columns, columns=names)
+    return columns
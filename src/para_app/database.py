@@ -1,52 +1,375 @@
 """ Creates the database file with tables """
+import hashlib
+import os
+import stat
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
 from importlib import resources
+from pathlib import Path
+from typing import Optional
 
 import pandas as pd
-from sqlmodel import SQLModel, Session, create_engine, delete, select
+from sqlalchemy import String, event
+from sqlalchemy import column as sa_column, table as sa_table
+from sqlalchemy.schema import CreateIndex, CreateTable
+from sqlmodel import SQLModel, Session, create_engine, delete, exists, func, insert, select, update
 
 from para_app import data
-from para_app.models import Country, Disability, Games, GamesDisability, GamesHost, GamesTeam, Host, Team  # noqa
+from para_app.games_search import CREATE_GAMES_SEARCH, GAMES_SEARCH, search_is_missing
+from para_app.games_summary import (delete_games_summary, rebuild_games_summary, refresh_games_summary,
+                                    summary_is_missing)
+from para_app.load_report import LoadReport, phase
+from para_app.models import (Country, Disability, Games, GamesDisability, GamesHost, GamesSummary, GamesTeam, Host,
+                             SourceFingerprint, Team)
+from para_app.workbook import iter_sheet_batches, read_sheets, to_date_string, to_int
 
 db_file = resources.files(data).joinpath("paralympics.db")
+DATA_FILE = resources.files(data).joinpath("paralympics_all_raw.xlsx")
 db_url = f"sqlite:///{str(db_file)}"
 
-engine = create_engine(
+# PRAGMAs applied to every new connection by create_db_engine, by profile name
+# cache_size is negative for KiB rather than pages; mmap_size is in bytes
+PRAGMA_PROFILES = {
+    # SQLite's own defaults
+    "default": {},
+    # For loading a database that is discarded if the load fails, e.g. by rebuild_database. A failed transaction
+    # cannot be rolled back with the journal off.
+    "bulk-load": {
+        "journal_mode": "OFF",
+        "synchronous": "OFF",
+        "cache_size": -262144,
+        "temp_store": "MEMORY",
+        "foreign_keys": "OFF",
+    },
+    # For serving queries, readers do not block on a writer in WAL mode
+    "read-serving": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -65536,
+        "mmap_size": 268435456,
+        "temp_store": "MEMORY",
+        "foreign_keys": "ON",
+    },
+}
+
+SUPPORTED_PRAGMAS = ["journal_mode", "synchronous", "cache_size", "mmap_size", "temp_store", "foreign_keys"]
+
+
+def create_db_engine(url: str = db_url, profile: str = "default", pragmas: Optional[dict] = None, **kwargs):
+    """ Creates an engine that applies the PRAGMAs of a profile on every new connection
+
+    Args:
+        url: database URL
+        profile: name of a profile in PRAGMA_PROFILES, e.g. "bulk-load" or "read-serving"
+        pragmas: PRAGMA name -> value, overriding or adding to those of the profile
+        **kwargs: passed to create_engine, e.g. echo=True
+
+    Raises:
+        ValueError: if the profile or a PRAGMA name is not supported
+    """
+    settings = pragma_settings(profile, pragmas)
+    new_engine = create_engine(url, **kwargs)
+    if settings:
+        event.listen(new_engine, "connect", pragma_listener(settings))
+    return new_engine
+
+
+def pragma_settings(profile: str, pragmas: Optional[dict] = None) -> dict:
+    """ Returns the PRAGMA name -> value of a profile, overridden or added to by pragmas
+
+    Raises:
+        ValueError: if the profile or a PRAGMA name is not supported
+    """
+    if profile not in PRAGMA_PROFILES:
+        raise ValueError(f"{profile} is not in {list(PRAGMA_PROFILES)}")
+    settings = {**PRAGMA_PROFILES[profile], **(pragmas or {})}
+    for name in settings:
+        if name not in SUPPORTED_PRAGMAS:
+            raise ValueError(f"{name} is not in {SUPPORTED_PRAGMAS}")
+    return settings
+
+
+def pragma_listener(settings: dict):
+    """ Returns a connect event listener that sets the PRAGMAs """
+
+    def apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in settings.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+    return apply_pragmas
+
+
+engine = create_db_engine(
     db_url,
     echo=False
 )  # Echo=True prints the SQL to the terminal, which can help when debugging.
 
+# Number of rows per multi-row INSERT statement used by the bulk loader.
+# Keep batch_size * number of columns below SQLite's bound parameter limit (32766 from SQLite 3.32).
+BULK_BATCH_SIZE = 500
+
+# Integer-like columns in the games sheet
+GAMES_INT_COLUMNS = ['year', 'participants_m', 'participants_f', 'participants', 'events', 'sports', 'countries']
+
+# Short country names used in the games sheet mapped to the team names used in the team_codes sheet
+COUNTRY_REPLACEMENTS = {
+    "USA": "United States of America",
+    "UK": "Great Britain",
+    "China": "People's Republic of China",
+    "Korea": "Republic of Korea",
+    "Russia": "Russian Federation",
+}
+
 
 def create_db_and_tables():
     """ Created the database file and tables if they do not already exist.
 
+    Indexes declared in the models that are missing from existing tables are also created, Games dates stored as
+    'dd-mm-YYYY' text by an earlier version are converted to ISO dates, and the games_summary and games_search
+    tables are built if the database has data but no summary or search index.
+
     Note: this does not pick up on changes to existing tables. Hint for extended learning: Alembic for migrations
 
     """
     SQLModel.metadata.create_all(engine)
+    for table in SQLModel.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(engine, checkfirst=True)
+    with engine.begin() as conn:
+        migrate_games_dates(conn)
+        if summary_is_missing(conn) or search_is_missing(conn):
+            rebuild_games_summary(conn)
+
+
+# The Games date columns as plain text, without the conversion of models.DateString
+_GAMES_DATES = sa_table("games", sa_column("start_date", String), sa_column("end_date", String))
+
+
+def migrate_games_dates(conn) -> int:
+    """ Converts the Games start_date and end_date values stored as 'dd-mm-YYYY' text to ISO 'YYYY-MM-DD'
+
+    Games dates are stored as ISO text by models.DateString, and were stored as 'dd-mm-YYYY' text by earlier
+    versions. Only valid dates are converted, other text is left as it is, as DateString stores it.
+
+    Args:
+        conn: SQLAlchemy Connection or Session
+
+    Returns:
+        number of values converted
+    """
+    converted = 0
+    for date_column in _GAMES_DATES.columns:
+        iso = (func.substr(date_column, 7, 4) + "-" + func.substr(date_column, 4, 2) + "-"
+               + func.substr(date_column, 1, 2))
+        statement = (
+            update(_GAMES_DATES)
+            .where(date_column.op("GLOB")("[0-9][0-9]-[0-9][0-9]-[0-9][0-9][0-9][0-9]"),
+                   # date() only moves a day past the end of the month, e.g. 31-02, into the next with a modifier
+                   func.date(iso, "+0 days") == iso)
+            .values({date_column.name: iso})
+        )
+        converted += conn.execute(statement).rowcount
+    return converted
+
+
+# Tables in the order drop_data deletes their rows: child tables first, then parents
+DELETE_ORDER = [
+    GamesSummary,
+    SourceFingerprint,
+    GamesDisability,
+    GamesHost,
+    GamesTeam,
+    Host,
+    Games,
+    Team,
+    Country,
+    Disability,
+]
 
 
 def drop_data(engine):
-    """ Drops the data from all the tables."""
-
-    # Delete in dependency order: child tables first, then parents
-    delete_order = [
-        GamesDisability,
-        GamesHost,
-        GamesTeam,
-        Host,
-        Games,
-        Team,
-        Country,
-        Disability,
-    ]
+    """ Drops the data from all the tables.
+
+    Returns:
+        LoadReport with the rows deleted from each table
+    """
+    with LoadReport(engine, "drop_data") as report, engine.connect() as conn:
+        _delete_data(conn, report)
+        with report.phase("commit"):
+            conn.commit()
+    return report
+
+
+def _delete_data(conn, report: Optional[LoadReport] = None):
+    """ Deletes the rows of every table, without committing """
+    with phase(report, "delete games_search") as stats:
+        stats.rows += conn.execute(delete(GAMES_SEARCH)).rowcount
+    for model in DELETE_ORDER:
+        with phase(report, f"delete {model.__tablename__}") as stats:
+            stats.rows += conn.execute(delete(model)).rowcount
+
+
+def rebuild_database(path=None, stream: bool = False, batch_size: int = BULK_BATCH_SIZE) -> Path:
+    """ Rebuilds the database file from the .xlsx file and swaps it into place
+
+    Unlike drop_data followed by add_data, the live database is not changed while the data is loaded, so readers
+    never see a half-empty database. The new database is built in a temporary file in the same directory with the
+    "bulk-load" PRAGMA profile, so journaling and syncing are off, its indexes are created after the data is loaded,
+    and it is then atomically renamed over the old file. Connections that are already open keep reading the old file
+    until they reconnect, e.g. after engine.dispose(); the module's engine is disposed when the default database is
+    rebuilt.
+
+    If the live database uses WAL journaling, close its connections first so that its -wal file is not left
+    behind for the new file.
+
+    Args:
+        path: path of the database file, defaults to paralympics.db
+        stream: if True, load with stream_add_data, otherwise with bulk_add_data
+        batch_size: maximum rows per INSERT statement
+
+    Returns:
+        Path of the rebuilt database file
+    """
+    path = Path(db_file if path is None else path)
+    fd, tmp_name = tempfile.mkstemp(prefix=f".{path.name}.", suffix=".tmp", dir=path.parent)
+    os.close(fd)
+    tmp_path = Path(tmp_name)
+    if path.exists():
+        os.chmod(tmp_path, stat.S_IMODE(path.stat().st_mode))
+
+    shadow_engine = create_db_engine(f"sqlite:///{tmp_path}", profile="bulk-load")
+    try:
+        # Tables only, the indexes are quicker to build once the data is in
+        with shadow_engine.begin() as conn:
+            for table in SQLModel.metadata.sorted_tables:
+                conn.execute(CreateTable(table))
+            conn.execute(CREATE_GAMES_SEARCH)
+        if stream:
+            stream_add_data(shadow_engine, batch_size=batch_size)
+        else:
+            df_games, df_teams, disabilities = prepare_data()
+            bulk_add_data(shadow_engine, df_games, df_teams, batch_size=batch_size, disabilities=disabilities)
+        with shadow_engine.begin() as conn:
+            for table in SQLModel.metadata.sorted_tables:
+                for index in table.indexes:
+                    conn.execute(CreateIndex(index))
+        shadow_engine.dispose()
+
+        # synchronous is off, so flush the file to disk before it replaces the live database
+        with open(tmp_path, "rb+") as f:
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        shadow_engine.dispose()
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+    if path == Path(str(db_file)):
+        engine.dispose()
+    return path
 
-    with Session(engine) as session:
-        for model in delete_order:
-            session.exec(delete(model))
-        session.commit()
 
+def prepare_data(use_cache: bool = True, parallel: bool = False, report: Optional[LoadReport] = None):
+    """ Reads the games and team_codes sheets from the .xlsx file, normalises the games values and collects the
+    unique disabilities
 
-def add_data(engine):
+    The two sheets are independent until their foreign keys are resolved, so with parallel=True each is parsed
+    and cleaned in its own process. This uses two cores when the workbook has to be parsed, but starting the
+    processes costs more than reading both sheets from the cache, so it is off by default.
+
+    Args:
+        use_cache: if True, reuse the parsed sheets cached next to the .xlsx file while it is unchanged
+        parallel: if True, prepare the two sheets concurrently in a process pool
+        report: LoadReport to record the phases in
+
+    Returns:
+        df_games (pd.DataFrame): games sheet with integer columns as Int64 and dates as dd-mm-YYYY strings
+        df_teams (pd.DataFrame): team_codes sheet
+        disabilities (list[str]): unique disabilities from the games sheet in the order they first appear
+    """
+    if parallel:
+        with phase(report, "prepare sheets (parallel)") as stats:
+            with ProcessPoolExecutor(max_workers=2) as pool:
+                games = pool.submit(_prepare_games_sheet, DATA_FILE, use_cache)
+                teams = pool.submit(_prepare_teams_sheet, DATA_FILE, use_cache)
+                df_games, disabilities = games.result()
+                df_teams = teams.result()
+            stats.rows += len(df_games) + len(df_teams)
+    else:
+        # Read games and teams sheets keeping NaNs for controlled conversion
+        with phase(report, "read workbook") as stats:
+            sheets = read_sheets(DATA_FILE, ["games", "team_codes"], use_cache=use_cache)
+            df_games, df_teams = sheets["games"], sheets["team_codes"]
+            stats.rows += len(df_games) + len(df_teams)
+        with phase(report, "normalise games") as stats:
+            df_games = _normalise_games(df_games)
+            stats.rows += len(df_games)
+        with phase(report, "explode disabilities") as stats:
+            disabilities = unique_disabilities(df_games)
+            stats.rows += len(disabilities)
+
+    return df_games, df_teams, disabilities
+
+
+def read_data(use_cache: bool = True, parallel: bool = False):
+    """ Reads the games and team_codes sheets from the .xlsx file and normalises the games values
+
+    Args:
+        use_cache: if True, reuse the parsed sheets cached next to the .xlsx file while it is unchanged
+        parallel: if True, prepare the two sheets concurrently in a process pool, see prepare_data
+
+    Returns:
+        df_games (pd.DataFrame): games sheet with integer columns as Int64 and dates as dd-mm-YYYY strings
+        df_teams (pd.DataFrame): team_codes sheet
+    """
+    df_games, df_teams, _ = prepare_data(use_cache=use_cache, parallel=parallel)
+    return df_games, df_teams
+
+
+def unique_disabilities(df_games) -> list[str]:
+    """ Returns the unique disabilities in the games sheet, splitting the comma-separated values """
+    df_disability = (
+        df_games['disabilities_included']
+        .dropna()
+        .astype(str)
+        .str.split(',')
+        .explode()
+        .str.strip()
+    )
+    return df_disability[df_disability != ''].unique().tolist()
+
+
+def _normalise_games(df_games):
+    """ Converts the integer-like games columns to Int64 and the dates to dd-mm-YYYY strings """
+    # Convert integer-like columns to nullable Int64
+    for col in GAMES_INT_COLUMNS:
+        if col in df_games.columns:
+            df_games[col] = pd.to_numeric(df_games[col], errors='coerce').astype('Int64')
+
+    # Convert date-like columns to strings in dd-mm-YYYY format
+    for col in df_games.columns:
+        if col.lower() in ('start', 'end') or 'date' in col.lower():
+            df_games[col] = pd.to_datetime(df_games[col], errors='coerce').dt.strftime('%d-%m-%Y')
+
+    return df_games
+
+
+def _prepare_games_sheet(data_file, use_cache: bool):
+    """ Reads and normalises the games sheet and returns it with its unique disabilities, run in a worker process
+    by prepare_data """
+    df_games = _normalise_games(read_sheets(data_file, ["games"], use_cache=use_cache)["games"])
+    return df_games, unique_disabilities(df_games)
+
+
+def _prepare_teams_sheet(data_file, use_cache: bool):
+    """ Reads the team_codes sheet, run in a worker process by prepare_data """
+    return read_sheets(data_file, ["team_codes"], use_cache=use_cache)["team_codes"]
+
+
+def add_data(engine, bulk: bool = False, stream: bool = False, parallel: bool = False,
+             batch_size: int = BULK_BATCH_SIZE):
     """ Adds data to the database from the .xslx file
 
     This is adapted from the original code to add data.
@@ -59,237 +382,810 @@ def add_data(engine):
                      'participants_m', 'participants_f', 'participants', 'highlights',
                      'URL']
     df_teams_cols = ['Code', 'TeamName', 'Region', 'SubRegion', 'MemberType', 'Notes']
-    """
 
-    data_file = resources.files(data).joinpath("paralympics_all_raw.xlsx")
+    Args:
+        engine: SQLAlchemy engine for the database
+        bulk: if True, write all tables in one transaction using multi-row inserts, see bulk_add_data
+        stream: if True, read and write the rows in batches with bounded memory, see stream_add_data
+        parallel: if True, prepare the two sheets concurrently in a process pool, see prepare_data
+        batch_size: maximum rows per INSERT statement when bulk or stream is True
 
-    # Read games and teams sheets keeping NaNs for controlled conversion
-    df_games = pd.read_excel(data_file, sheet_name="games", keep_default_na=True)
-    df_teams = pd.read_excel(data_file, sheet_name="team_codes", keep_default_na=True)
+    Returns:
+        LoadReport with the wall time, rows, SQL statements and commits of each phase of the load
+    """
+    with LoadReport(engine, "add_data") as report:
+        if stream:
+            stream_add_data(engine, batch_size=batch_size, report=report)
+            return report
 
-    # Convert integer-like columns to nullable Int64
-    games_int_cols = ['year', 'participants_m', 'participants_f', 'participants', 'events', 'sports', 'countries']
-    for col in games_int_cols:
-        if col in df_games.columns:
-            df_games[col] = pd.to_numeric(df_games[col], errors='coerce').astype('Int64')
+        df_games, df_teams, df_disability = prepare_data(parallel=parallel, report=report)
+        if bulk:
+            bulk_add_data(engine, df_games, df_teams, batch_size=batch_size, disabilities=df_disability,
+                          report=report)
+        else:
+            _row_by_row_add_data(engine, df_games, df_teams, df_disability, batch_size, report)
+    return report
 
-    # Convert date-like columns to strings in dd-mm-YYYY format
-    for col in df_games.columns:
-        if col.lower() in ('start', 'end') or 'date' in col.lower():
-            df_games[col] = pd.to_datetime(df_games[col], errors='coerce').dt.strftime('%d-%m-%Y')
+
+def _row_by_row_add_data(engine, df_games, df_teams, df_disability, batch_size: int, report=None):
+    """ Adds the data with the ORM, committing each team and games row, see add_data """
+    # Identity maps of name -> id for the rows already in the database. They are updated as rows are inserted
+    # so every foreign key below is resolved from memory rather than with a select per row.
+    with phase(report, "identity maps"):
+        with Session(engine) as session:
+            conn = session.connection()
+            disability_ids = _existing_ids(conn, Disability.description, Disability.id)
+            country_ids = _existing_ids(conn, Country.country_name, Country.id)
+            team_codes = _existing_ids(conn, Team.name, Team.code)
+            host_ids = _existing_ids(conn, Host.place_name, Host.id)
 
     # Disabilities
-    # Collect unique disability values (split comma-separated strings into individual values)
-    df_disability = (
-        df_games['disabilities_included']
-        .dropna()
-        .astype(str)
-        .str.split(',')
-        .explode()
-        .str.strip()
-    )
-    df_disability = df_disability[df_disability != ''].unique().tolist()
-    with Session(engine) as session:
-        for d in df_disability:
-            dis = Disability(description=d)
-            session.add(dis)
-        session.commit()
+    # Unique disability values, prepare_data has split the comma-separated strings into individual values
+    with phase(report, "disabilities") as stats:
+        with Session(engine) as session:
+            dis_objs = [Disability(description=d) for d in df_disability]
+            session.add_all(dis_objs)
+            session.flush()  # Assigns the ids without expiring the objects, unlike commit
+            for dis in dis_objs:
+                disability_ids.setdefault(dis.description, dis.id)
+            session.commit()
+            stats.rows += len(dis_objs)
 
     # Countries and Teams
     # For every row, if df_teams['MemberType'] = "country" then save that value to Country and add the id of the
     # inserted Country as the foreign key to create a Team.
     # If df_team['MemberType'] is not "country", then just add a Team without the FK
-    for _, row in df_teams.iterrows():
-        # Normalize values from the row
-        code = str(row.get('Code')).upper()  # 3-letter code in uppercase
-        member_type = str(row.get('MemberType', '')).strip().lower()
-        team_name = row.get('TeamName').strip()
-        region = row.get('Region') if 'Region' in row else None
-        notes = row.get('Notes') if 'Notes' in row else None
+    with phase(report, "teams") as stats:
+        for _, row in df_teams.iterrows():
+            # Normalize values from the row
+            code = str(row.get('Code')).upper()  # 3-letter code in uppercase
+            member_type = str(row.get('MemberType', '')).strip().lower()
+            team_name = row.get('TeamName').strip()
+            region = row.get('Region') if 'Region' in row else None
+            notes = row.get('Notes') if 'Notes' in row else None
 
-        with Session(engine) as session:
-            country_id = None
-
-            # For any that is member_type of country then get the country id
-            if not pd.isna(team_name) or team_name != '':
-                if member_type == 'country':
-                    # Find or create the Country and get its id
-                    statement = select(Country).filter(Country.country_name == team_name)
-                    country = session.exec(statement).first()
-                    if not country:
-                        country = Country(country_name=team_name)
-                        session.add(country)
-                        session.commit()
-                        session.refresh(country)
-                    country_id = country.id
-
-            # Create the Team, linking to country_id when applicable
-            team = Team(
-                code=code,
-                name=str(team_name).strip(),
-                region=region,
-                notes=notes,
-                member_type=member_type,
-                country_id=country_id
-            )
-            session.add(team)
-            session.commit()
+            with Session(engine) as session:
+                country_id = None
 
-    # Host
-    with Session(engine) as session:
-        host_objs = []
-        for _, row in df_games.iterrows():
-            # Normalize and replace common country short names before lookup
-            country_name = row.get('country')
-            if pd.isna(country_name):
-                continue
-            country_name = str(country_name).strip()
-            replacements = {
-                "USA": "United States of America",
-                "UK": "Great Britain",
-                "China": "People's Republic of China",
-                "Korea": "Republic of Korea",
-                "Russia": "Russian Federation",
-            }
-            lookup_country = replacements.get(country_name, country_name)
-            statement = select(Country).filter(Country.country_name == lookup_country)
-            country = session.exec(statement).first()
-
-            if not country:
-                # print(f"{row['country']} not found in database")
-                continue
+                # For any that is member_type of country then get the country id
+                if not pd.isna(team_name) or team_name != '':
+                    if member_type == 'country':
+                        # Find or create the Country and get its id
+                        country_id = country_ids.get(team_name)
+                        if country_id is None:
+                            country = Country(country_name=team_name)
+                            session.add(country)
+                            session.flush()
+                            country_id = country_ids[team_name] = country.id
 
-            host_val = row.get('host')
-            if pd.isna(host_val):
-                continue
+                # Create the Team, linking to country_id when applicable
+                team = Team(
+                    code=code,
+                    name=str(team_name).strip(),
+                    region=region,
+                    notes=notes,
+                    member_type=member_type,
+                    country_id=country_id
+                )
+                session.add(team)
+                session.commit()
+                team_codes.setdefault(str(team_name).strip(), code)
+            stats.rows += 1
 
-            host_str = str(host_val)
-            # Split on comma into multiple host names, strip whitespace, ignore empty entries
-            host_names = [h.strip() for h in host_str.split(',') if h.strip()]
-            for host_name in host_names:
-                # Skip empty host names
-                if not host_name:
+    # Host
+    with phase(report, "hosts") as stats:
+        with Session(engine) as session:
+            host_objs = []
+            for _, row in df_games.iterrows():
+                # Normalize and replace common country short names before lookup
+                country_name = row.get('country')
+                if pd.isna(country_name):
                     continue
-                h = Host(place_name=host_name, country_id=country.id)
-                host_objs.append(h)
-        if host_objs:
-            seen = set()
-            unique_hosts = []
-            for h in host_objs:
-                key = (h.place_name, h.country_id)
-                if key not in seen:
-                    seen.add(key)
-                    unique_hosts.append(h)
-            session.add_all(unique_hosts)
-            session.commit()
+                country_name = str(country_name).strip()
+                lookup_country = COUNTRY_REPLACEMENTS.get(country_name, country_name)
+                country_id = country_ids.get(lookup_country)
 
-        # Special-case rows where multiple countries are listed (e.g. "UK, USA") and hosts align by position.
-        mask = df_games['country'].astype(str).str.strip() == 'UK, USA'
-        row = df_games.loc[mask].head(1)
-        country_field = row.get('country')
-        host_field = row.get('host')
-
-        if ',' in str(country_field) and ',' in str(host_field):
-            country_parts = [c.strip() for c in str(country_field).split(',') if c.strip()]
-            host_parts = [h.strip() for h in str(host_field).split(',') if h.strip()]
-            # Pair up by position; ignore extras
-            for c_name, h_name in zip(country_parts, host_parts):
-                lookup_country = replacements.get(c_name, c_name)
-                stmt = select(Country).filter(Country.country_name == lookup_country)
-                country_obj = session.exec(stmt).first()
-                if not country_obj:
+                if country_id is None:
+                    # print(f"{row['country']} not found in database")
                     continue
-                host_stmt = select(Host).filter(Host.place_name == h_name, Host.country_id == country_obj.id)
-                if session.exec(host_stmt).first():
+
+                host_val = row.get('host')
+                if pd.isna(host_val):
                     continue
-                host_objs.append(Host(place_name=h_name, country_id=country_obj.id))
+
+                host_str = str(host_val)
+                # Split on comma into multiple host names, strip whitespace, ignore empty entries
+                host_names = [h.strip() for h in host_str.split(',') if h.strip()]
+                for host_name in host_names:
+                    # Skip empty host names
+                    if not host_name:
+                        continue
+                    h = Host(place_name=host_name, country_id=country_id)
+                    host_objs.append(h)
+            if host_objs:
+                seen = set()
+                unique_hosts = []
+                for h in host_objs:
+                    key = (h.place_name, h.country_id)
+                    if key not in seen:
+                        seen.add(key)
+                        unique_hosts.append(h)
+                session.add_all(unique_hosts)
+                session.flush()
+                for h in unique_hosts:
+                    host_ids.setdefault(h.place_name, h.id)
+                session.commit()
+                stats.rows += len(unique_hosts)
+
+            # Special-case rows where multiple countries are listed (e.g. "UK, USA") and hosts align by position.
+            mask = df_games['country'].astype(str).str.strip() == 'UK, USA'
+            row = df_games.loc[mask].head(1)
+            country_field = row.get('country')
+            host_field = row.get('host')
+
+            if ',' in str(country_field) and ',' in str(host_field):
+                country_parts = [c.strip() for c in str(country_field).split(',') if c.strip()]
+                host_parts = [h.strip() for h in str(host_field).split(',') if h.strip()]
+                # Pair up by position; ignore extras
+                for c_name, h_name in zip(country_parts, host_parts):
+                    lookup_country = COUNTRY_REPLACEMENTS.get(c_name, c_name)
+                    country_id = country_ids.get(lookup_country)
+                    if country_id is None:
+                        continue
+                    if h_name in host_ids:
+                        continue
+                    host_objs.append(Host(place_name=h_name, country_id=country_id))
 
     # Games, GamesDisability, GamesHost, GamesTeam
-    with Session(engine) as session:
-        for _, row in df_games.iterrows():
-            # Convert NaN or NA to None
-            def san(v):
-                return None if pd.isna(v) else v
-
-            g = Games(
-                event_type=row.get('type').strip().lower(),
-                year=row.get('year'),
-                start_date=san(row.get('start')),
-                end_date=san(row.get('end')),
-                countries=san(row.get('countries')),
-                events=san(row.get('events')),
-                sports=san(row.get('sports')),
-                participants_m=san(row.get('participants_m')),
-                participants_f=san(row.get('participants_f')),
-                participants=san(row.get('participants')),
-                highlights=san(row.get('highlights')),
-                url=san(row.get('URL'))
-            )
-            session.add(g)
-            session.commit()
-            session.refresh(g)
-            games_id = g.id
-
-            # GamesTeam
-            # Find the Team.id where row.get('country') matches Team.name, create and add GamesTeam(games_id=games_id, team_id=Team.id)
-            country_name = row.get('country')
-            if not pd.isna(country_name):
-                statement = select(Team).filter(Team.name == country_name)
-                team = session.exec(statement).first()
-                if team:
-                    games_team = GamesTeam(games_id=games_id, team_id=team.code)
-                    session.add(games_team)
-                    session.commit()
-
-            # GamesDisability
-            # Get row.get('disabilities_included') and split on the comma into a list of strings. For each string, find
-            # the Disability.id where Disability.description matches the string, and insert
-            # GamesDisability(games_id=games_id, disability_id=disability_id)
-            dis_val = row.get('disabilities_included')
-            if not pd.isna(dis_val):
-                dis_list = [d.strip() for d in str(dis_val).split(',') if d.strip()]
-                games_dis_objs = []
-                for dis_desc in dis_list:
-                    statement = select(Disability).filter(Disability.description == dis_desc)
-                    disability = session.exec(statement).first()
-                    if disability:
-                        games_dis_objs.append(GamesDisability(games_id=games_id, disability_id=disability.id))
-                    else:
+    with phase(report, "games and links") as stats:
+        games_ids = []
+        with Session(engine) as session:
+            for _, row in df_games.iterrows():
+                g = Games(
+                    event_type=row.get('type').strip().lower(),
+                    year=row.get('year'),
+                    start_date=_san(row.get('start')),
+                    end_date=_san(row.get('end')),
+                    countries=_san(row.get('countries')),
+                    events=_san(row.get('events')),
+                    sports=_san(row.get('sports')),
+                    participants_m=_san(row.get('participants_m')),
+                    participants_f=_san(row.get('participants_f')),
+                    participants=_san(row.get('participants')),
+                    highlights=_san(row.get('highlights')),
+                    url=_san(row.get('URL'))
+                )
+                session.add(g)
+                session.flush()
+                games_id = g.id
+                games_ids.append(games_id)
+
+                # GamesTeam
+                # Find the Team.code where row.get('country') matches Team.name, create and add
+                # GamesTeam(games_id=games_id, team_id=Team.code)
+                country_name = row.get('country')
+                if not pd.isna(country_name) and country_name in team_codes:
+                    session.add(GamesTeam(games_id=games_id, team_id=team_codes[country_name]))
+
+                # GamesDisability
+                # Get row.get('disabilities_included') and split on the comma into a list of strings. For each string,
+                # find the Disability.id where Disability.description matches the string, and insert
+                # GamesDisability(games_id=games_id, disability_id=disability_id)
+                for dis_desc in _split(row.get('disabilities_included')):
+                    if dis_desc not in disability_ids:
                         # Create missing Disability record (safe fallback)
                         new_dis = Disability(description=dis_desc)
                         session.add(new_dis)
-                        session.commit()
-                        session.refresh(new_dis)
-                        games_dis_objs.append(GamesDisability(games_id=games_id, disability_id=new_dis.id))
-                if games_dis_objs:
-                    session.add_all(games_dis_objs)
-                    session.commit()
-
-            # GamesHost
-            # Find the Host.host_id where row.get('host') matches Host.place_name, then use games_id and host_id to
-            # insert GamesHost. Where row.get('host') has multiple strings separated by a comma, then create one
-            # GamesHost row for each pair of host_id and games_id
-            host_val = row.get('host')
-            if not pd.isna(host_val):
-                host_names = [h.strip() for h in str(host_val).split(',') if h.strip()]
-                games_host_objs = []
-                for host_name in host_names:
-                    statement = select(Host).filter(Host.place_name == host_name)
-                    host = session.exec(statement).first()
-                    if not host:
+                        session.flush()
+                        disability_ids[dis_desc] = new_dis.id
+                    session.add(GamesDisability(games_id=games_id, disability_id=disability_ids[dis_desc]))
+
+                # GamesHost
+                # Find the Host.host_id where row.get('host') matches Host.place_name, then use games_id and host_id to
+                # insert GamesHost. Where row.get('host') has multiple strings separated by a comma, then create one
+                # GamesHost row for each pair of host_id and games_id
+                for host_name in _split(row.get('host')):
+                    if host_name not in host_ids:
                         # Try to link host to the game's country when possible
-                        country_name = row.get('country')
-                        country_id = None
-                        if not pd.isna(country_name):
-                            country_stmt = select(Country).filter(Country.country_name == country_name)
-                            country = session.exec(country_stmt).first()
-                            if country:
-                                country_id = country.id
+                        country_id = None if pd.isna(country_name) else country_ids.get(country_name)
                         host = Host(place_name=host_name, country_id=country_id)
                         session.add(host)
-                        session.commit()
-                        session.refresh(host)
-                    games_host_objs.append(GamesHost(games_id=games_id, host_id=host.id))
-                if games_host_objs:
-                    session.add_all(games_host_objs)
-                    session.commit()
+                        session.flush()
+                        host_ids[host_name] = host.id
+                    session.add(GamesHost(games_id=games_id, host_id=host_ids[host_name]))
+
+                session.commit()
+                stats.rows += 1
+
+    # Fingerprints of the source rows, used by refresh_data
+    with phase(report, "fingerprints") as stats:
+        with engine.begin() as conn:
+            fingerprint_rows = _fingerprint_rows(_source_rows(df_games, _games_key), _source_rows(df_teams, _team_key),
+                                                 games_ids)
+            _insert_rows(conn, SourceFingerprint.__table__, fingerprint_rows, batch_size)
+        stats.rows += len(fingerprint_rows)
+
+    with phase(report, "games summary") as stats:
+        with engine.begin() as conn:
+            stats.rows += rebuild_games_summary(conn)
+
+
+def _san(value):
+    """ Convert NaN or NA to None """
+    return None if pd.isna(value) else value
+
+
+def _split(value) -> list[str]:
+    """ Splits a comma-separated cell into a list of stripped, non-empty strings """
+    if pd.isna(value):
+        return []
+    return [v.strip() for v in str(value).split(',') if v.strip()]
+
+
+def _batches(items: list, size: int = BULK_BATCH_SIZE):
+    """ Yields successive slices of at most size items """
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _existing_ids(conn, key_column, id_column, keys=None) -> dict:
+    """ Returns {key: id} for the rows already in a table, keeping the first match as select(...).first() does
+
+    If keys is given, only those keys are looked up using IN queries rather than reading the whole table.
+    """
+    if keys is None:
+        statements = [select(key_column, id_column)]
+    else:
+        keys = [k for k in set(keys) if k is not None]
+        statements = [select(key_column, id_column).where(key_column.in_(batch)) for batch in _batches(keys)]
+    ids = {}
+    for statement in statements:
+        for key, row_id in conn.execute(statement):
+            ids.setdefault(key, row_id)
+    return ids
+
+
+def _next_id(conn, table) -> int:
+    """ Returns the id SQLite would assign to the next row inserted in a table with an integer primary key """
+    return (conn.execute(select(func.max(table.c.id))).scalar() or 0) + 1
+
+
+def _insert_rows(conn, table, rows: list[dict], batch_size: int):
+    """ Inserts the rows using multi-row INSERT ... VALUES statements of at most batch_size rows """
+    for batch in _batches(rows, batch_size):
+        conn.execute(insert(table).values(batch))
+
+
+def _host_country_name(country_name) -> Optional[str]:
+    """ Returns the team name used for a country in the games sheet, e.g. 'Great Britain' for 'UK' """
+    if country_name is None:
+        return None
+    country_name = str(country_name).strip()
+    return COUNTRY_REPLACEMENTS.get(country_name, country_name)
+
+
+def _games_values(row: dict) -> dict:
+    """ Returns the Games column values for a row of the games sheet """
+    return {
+        'event_type': row.get('type').strip().lower(),
+        'year': row.get('year'),
+        'start_date': _san(row.get('start')),
+        'end_date': _san(row.get('end')),
+        'countries': _san(row.get('countries')),
+        'events': _san(row.get('events')),
+        'sports': _san(row.get('sports')),
+        'participants_m': _san(row.get('participants_m')),
+        'participants_f': _san(row.get('participants_f')),
+        'participants': _san(row.get('participants')),
+        'highlights': _san(row.get('highlights')),
+        'url': _san(row.get('URL')),
+    }
+
+
+def _team_values(row: dict) -> dict:
+    """ Returns the Team column values, other than country_id, for a row of the team_codes sheet """
+    return {
+        'code': str(row.get('Code')).upper(),
+        'name': row.get('TeamName').strip(),
+        'region': _san(row.get('Region')),
+        'notes': _san(row.get('Notes')),
+        'member_type': str(row.get('MemberType', '')).strip().lower(),
+    }
+
+
+# Tables in the order the loader writes them, parents before children
+LOAD_ORDER = [Disability, Country, Team, Host, Games, GamesTeam, GamesDisability, GamesHost, SourceFingerprint]
+
+
+class _LoadRows:
+    """ Rows waiting to be inserted into each table, with the name -> id maps used to resolve foreign keys
+
+    Ids are allocated in insert order from the current maximum id of each table, which are the ids SQLite would
+    assign, so the rows can be written with multi-row INSERT statements without reading the ids back.
+    """
+
+    def __init__(self, conn, disability_ids: dict, country_ids: dict, team_codes: dict, host_ids: dict):
+        self.disability_ids = disability_ids
+        self.country_ids = country_ids
+        self.team_codes = team_codes
+        self.host_ids = host_ids
+        self.rows = {model.__tablename__: [] for model in LOAD_ORDER}
+        self.next_ids = {model.__tablename__: _next_id(conn, model.__table__)
+                         for model in (Disability, Country, Host, Games)}
+
+    def add(self, model, values: dict) -> Optional[int]:
+        """ Adds a row, allocating its id if the table has an integer id, and returns the id """
+        name = model.__tablename__
+        if name in self.next_ids:
+            values = {'id': self.next_ids[name], **values}
+            self.next_ids[name] += 1
+        self.rows[name].append(values)
+        return values.get('id')
+
+    def disability_id(self, description: str) -> int:
+        """ Returns the id of the Disability, adding it if it is new """
+        if description not in self.disability_ids:
+            self.disability_ids[description] = self.add(Disability, {'description': description})
+        return self.disability_ids[description]
+
+    def country_id(self, country_name: str) -> int:
+        """ Returns the id of the Country, adding it if it is new """
+        if country_name not in self.country_ids:
+            self.country_ids[country_name] = self.add(Country, {'country_name': country_name})
+        return self.country_ids[country_name]
+
+    def team_country_id(self, values: dict) -> Optional[int]:
+        """ Returns the Country id for Team values, only teams with member_type 'country' have one """
+        return self.country_id(values['name']) if values['member_type'] == 'country' else None
+
+    def add_team(self, row: dict):
+        """ Adds the Team for a row of the team_codes sheet """
+        values = _team_values(row)
+        values['country_id'] = self.team_country_id(values)
+        self.add(Team, values)
+        self.team_codes.setdefault(values['name'], values['code'])
+
+    def add_games(self, row: dict) -> int:
+        """ Adds the Games and its link rows for a row of the games sheet and returns the Games id """
+        games_id = self.add(Games, _games_values(row))
+        self.add_games_links(games_id, row)
+        return games_id
+
+    def add_games_team(self, games_id: int, country_name):
+        """ Adds the GamesTeam, teams are matched on the unmodified country name from the games sheet """
+        if country_name is not None and country_name in self.team_codes:
+            self.add(GamesTeam, {'games_id': games_id, 'team_id': self.team_codes[country_name]})
+
+    def add_games_links(self, games_id: int, row: dict):
+        """ Adds the GamesTeam, GamesDisability and GamesHost rows for a row of the games sheet
+
+        New hosts are linked to the games' country, looked up by its team name or else by the name as given.
+        """
+        country_name = _san(row.get('country'))
+        self.add_games_team(games_id, country_name)
+        for description in _split(row.get('disabilities_included')):
+            self.add(GamesDisability, {'games_id': games_id, 'disability_id': self.disability_id(description)})
+        for host_name in _split(row.get('host')):
+            if host_name not in self.host_ids:
+                country_id = self.country_ids.get(_host_country_name(country_name), self.country_ids.get(country_name))
+                self.host_ids[host_name] = self.add(Host, {'place_name': host_name, 'country_id': country_id})
+            self.add(GamesHost, {'games_id': games_id, 'host_id': self.host_ids[host_name]})
+
+    def write(self, conn, batch_size: int, report: Optional[LoadReport] = None):
+        """ Inserts the rows, parents before children, and clears them """
+        for model in LOAD_ORDER:
+            table_rows = self.rows[model.__tablename__]
+            with phase(report, f"insert {model.__tablename__}") as stats:
+                _insert_rows(conn, model.__table__, table_rows, batch_size)
+                stats.rows += len(table_rows)
+            self.rows[model.__tablename__] = []
+
+
+def _games_key(row: dict) -> str:
+    """ Returns the key identifying a row of the games sheet, e.g. 'summer-1960' """
+    return f"{str(row.get('type')).strip().lower()}-{row.get('year')}"
+
+
+def _team_key(row: dict) -> str:
+    """ Returns the key identifying a row of the team_codes sheet, i.e. the team code """
+    return str(row.get('Code')).upper()
+
+
+def _unique_key(key: str, seen) -> str:
+    """ Returns the key, with a '#2', '#3'... suffix if it is already in seen """
+    unique_key = key
+    n = 1
+    while unique_key in seen:
+        n += 1
+        unique_key = f"{key}#{n}"
+    return unique_key
+
+
+def _source_rows(df, key_func) -> dict[str, dict]:
+    """ Returns the rows of a sheet as {row_key: row}, repeated keys are given a '#2', '#3'... suffix """
+    rows = {}
+    for row in df.to_dict('records'):
+        rows[_unique_key(key_func(row), rows)] = row
+    return rows
+
+
+def _fingerprint(row: dict) -> str:
+    """ Returns a hash of the values in a sheet row """
+    values = [(column, None if pd.isna(value) else str(value)) for column, value in row.items()]
+    return hashlib.sha256(repr(values).encode()).hexdigest()
+
+
+def _fingerprint_rows(games_rows: dict, team_rows: dict, games_ids: list[int]) -> list[dict]:
+    """ Returns the SourceFingerprint rows for the sheets, games_ids are the Games ids in games sheet order """
+    fingerprints = [
+        {'sheet': 'team_codes', 'row_key': key, 'fingerprint': _fingerprint(row), 'games_id': None}
+        for key, row in team_rows.items()
+    ]
+    fingerprints += [
+        {'sheet': 'games', 'row_key': key, 'fingerprint': _fingerprint(row), 'games_id': games_id}
+        for (key, row), games_id in zip(games_rows.items(), games_ids)
+    ]
+    return fingerprints
+
+
+def bulk_add_data(engine, df_games, df_teams, batch_size: int = BULK_BATCH_SIZE, disabilities=None,
+                  report: Optional[LoadReport] = None):
+    """ Adds the data from the games and team_codes sheets in a single transaction
+
+    Produces the same table contents as add_data(engine) but builds every row in memory first, with ids
+    allocated in insert order, and then writes each table with multi-row INSERT statements. There is one
+    commit for the whole load rather than one per row.
+
+    Args:
+        engine: SQLAlchemy engine for the database
+        df_games (pd.DataFrame): normalised games sheet, see read_data
+        df_teams (pd.DataFrame): team_codes sheet, see read_data
+        batch_size: maximum rows per INSERT statement
+        disabilities (list[str]): unique disabilities in df_games, see prepare_data; found from df_games if None
+        report: LoadReport to record the phases in
+    """
+    with engine.connect() as conn:
+        _bulk_add_rows(conn, df_games, df_teams, batch_size, disabilities, report)
+        with phase(report, "commit"):
+            conn.commit()
+
+
+def _bulk_add_rows(conn, df_games, df_teams, batch_size: int, disabilities=None,
+                   report: Optional[LoadReport] = None):
+    """ Writes the rows of bulk_add_data on the connection, without committing """
+    if disabilities is None:
+        disabilities = unique_disabilities(df_games)
+    games_rows = _source_rows(df_games, _games_key)
+    team_rows = _source_rows(df_teams, _team_key)
+
+    with phase(report, "identity maps"):
+        rows = _LoadRows(
+            conn,
+            disability_ids=_existing_ids(conn, Disability.description, Disability.id),
+            country_ids=_existing_ids(conn, Country.country_name, Country.id),
+            team_codes=_existing_ids(conn, Team.name, Team.code),
+            host_ids=_existing_ids(conn, Host.place_name, Host.id),
+        )
+
+    # Disabilities, every unique value is inserted even if it is already in the table
+    with phase(report, "build disabilities") as stats:
+        for description in disabilities:
+            rows.disability_ids.setdefault(description, rows.add(Disability, {'description': description}))
+        stats.rows += len(disabilities)
+
+    # Countries and Teams
+    with phase(report, "build teams") as stats:
+        for row in team_rows.values():
+            rows.add_team(row)
+        stats.rows += len(team_rows)
+
+    # Hosts where the (short) country name is a known country, deduplicated on (place_name, country_id)
+    with phase(report, "build hosts") as stats:
+        seen = set()
+        for row in games_rows.values():
+            country_id = rows.country_ids.get(_host_country_name(_san(row.get('country'))))
+            if country_id is None:
+                continue
+            for host_name in _split(row.get('host')):
+                if (host_name, country_id) not in seen:
+                    seen.add((host_name, country_id))
+                    rows.add(Host, {'place_name': host_name, 'country_id': country_id})
+        for host in rows.rows[Host.__tablename__]:
+            rows.host_ids.setdefault(host['place_name'], host['id'])
+        stats.rows += len(rows.rows[Host.__tablename__])
+
+    # Games, GamesTeam, GamesDisability, GamesHost
+    with phase(report, "build games and links") as stats:
+        games_ids = [rows.add_games(row) for row in games_rows.values()]
+        stats.rows += len(games_ids)
+
+    with phase(report, "build fingerprints") as stats:
+        rows.rows[SourceFingerprint.__tablename__] = _fingerprint_rows(games_rows, team_rows, games_ids)
+        stats.rows += len(rows.rows[SourceFingerprint.__tablename__])
+
+    rows.write(conn, batch_size, report)
+    with phase(report, "games summary") as stats:
+        stats.rows += rebuild_games_summary(conn)
+
+
+def stream_add_data(engine, data_file=None, batch_size: int = BULK_BATCH_SIZE, report: Optional[LoadReport] = None):
+    """ Adds the data from the .xlsx file, reading and writing the rows in batches
+
+    Produces the same table contents as add_data(engine). The sheets are read in batches of rows with openpyxl in
+    read-only mode and each batch is written with multi-row INSERT statements before the next is read. Memory use
+    depends on batch_size and the number of distinct teams, hosts and disabilities, not on the number of rows.
+    The games sheet is read twice, first for the disabilities and hosts and then for the Games and their link
+    rows, so that ids are allocated in the same order as add_data. All tables are written in one transaction.
+
+    Args:
+        engine: SQLAlchemy engine for the database
+        data_file: path to the .xlsx file, defaults to paralympics_all_raw.xlsx
+        batch_size: number of rows read and written at a time
+        report: LoadReport to record the phases in, reading the workbook is recorded separately from building
+            and inserting the rows
+    """
+    if data_file is None:
+        data_file = DATA_FILE
+    games_converters = {col: to_int for col in GAMES_INT_COLUMNS}
+    games_converters.update({'start': to_date_string, 'end': to_date_string})
+
+    with engine.connect() as conn:
+        with phase(report, "identity maps"):
+            rows = _LoadRows(
+                conn,
+                disability_ids=_existing_ids(conn, Disability.description, Disability.id),
+                country_ids=_existing_ids(conn, Country.country_name, Country.id),
+                team_codes=_existing_ids(conn, Team.name, Team.code),
+                host_ids=_existing_ids(conn, Host.place_name, Host.id),
+            )
+
+        # Countries and Teams
+        team_keys = set()
+        for batch in _timed(report, "read team_codes", iter_sheet_batches(data_file, "team_codes", batch_size)):
+            with phase(report, "build teams") as stats:
+                for row in batch:
+                    rows.add_team(row)
+                    key = _unique_key(_team_key(row), team_keys)
+                    team_keys.add(key)
+                    rows.add(SourceFingerprint, {'sheet': 'team_codes', 'row_key': key,
+                                                 'fingerprint': _fingerprint(row), 'games_id': None})
+                stats.rows += len(batch)
+            rows.write(conn, batch_size, report)
+
+        # Disabilities, every unique value is inserted even if it is already in the table, and hosts where the
+        # (short) country name is a known country, deduplicated on (place_name, country_id)
+        descriptions = set()
+        seen = set()
+        games_batches = iter_sheet_batches(data_file, "games", batch_size, games_converters)
+        for batch in _timed(report, "read games", games_batches):
+            with phase(report, "build disabilities and hosts") as stats:
+                for row in batch:
+                    for description in _split(row.get('disabilities_included')):
+                        if description not in descriptions:
+                            descriptions.add(description)
+                            rows.disability_ids.setdefault(description,
+                                                           rows.add(Disability, {'description': description}))
+                    country_id = rows.country_ids.get(_host_country_name(row.get('country')))
+                    if country_id is None:
+                        continue
+                    for host_name in _split(row.get('host')):
+                        if (host_name, country_id) not in seen:
+                            seen.add((host_name, country_id))
+                            rows.add(Host, {'place_name': host_name, 'country_id': country_id})
+                for host in rows.rows[Host.__tablename__]:
+                    rows.host_ids.setdefault(host['place_name'], host['id'])
+                stats.rows += len(batch)
+            rows.write(conn, batch_size, report)
+
+        # Games, GamesTeam, GamesDisability, GamesHost
+        games_keys = set()
+        games_batches = iter_sheet_batches(data_file, "games", batch_size, games_converters)
+        for batch in _timed(report, "read games", games_batches):
+            with phase(report, "build games and links") as stats:
+                for row in batch:
+                    games_id = rows.add_games(row)
+                    key = _unique_key(_games_key(row), games_keys)
+                    games_keys.add(key)
+                    rows.add(SourceFingerprint, {'sheet': 'games', 'row_key': key, 'fingerprint': _fingerprint(row),
+                                                 'games_id': games_id})
+                stats.rows += len(batch)
+            rows.write(conn, batch_size, report)
+
+        with phase(report, "games summary") as stats:
+            stats.rows += rebuild_games_summary(conn)
+        with phase(report, "commit"):
+            conn.commit()
+
+
+def _timed(report: Optional[LoadReport], name: str, batches):
+    """ Yields the batches, recording the time spent reading them, but not processing them, as a phase """
+    batches = iter(batches)
+    while True:
+        with phase(report, name) as stats:
+            batch = next(batches, None)
+            if batch is None:
+                return
+            stats.rows += len(batch)
+        yield batch
+
+
+def refresh_data(engine, df_games=None, df_teams=None, batch_size: int = BULK_BATCH_SIZE) -> dict:
+    """ Updates the database to match the .xlsx file, changing only the rows that differ
+
+    Each row of the games and team_codes sheets is fingerprinted and compared with the fingerprints saved by the
+    last load or refresh. Teams and Games for new rows are inserted, those for changed rows are updated and those
+    for removed rows are deleted, along with their GamesTeam, GamesDisability and GamesHost rows. Hosts, countries
+    and disabilities that are no longer referenced are deleted. Unchanged rows are not touched, so appending one
+    Games edition writes only that Games and its links. Existing hosts keep the country they were created with.
+    The games_summary and games_search rows of the changed Games are refreshed in the same transaction.
+
+    A database that has data but no fingerprints, e.g. one loaded by an earlier version, is reloaded in full, in
+    one transaction.
+
+    Args:
+        engine: SQLAlchemy engine for the database
+        df_games (pd.DataFrame): normalised games sheet, read from the .xlsx file if not given
+        df_teams (pd.DataFrame): team_codes sheet, read from the .xlsx file if not given. If only one of the
+            sheets is given, only the other is read.
+        batch_size: maximum rows per INSERT statement
+
+    Returns:
+        dict of the number of rows inserted, updated and deleted for each sheet, e.g.
+        {'games': {'inserted': 1, 'updated': 0, 'deleted': 0}, 'team_codes': {...}}
+    """
+    if df_games is None and df_teams is None:
+        df_games, df_teams = read_data()
+    elif df_games is None:
+        df_games, _ = _prepare_games_sheet(DATA_FILE, use_cache=True)
+    elif df_teams is None:
+        df_teams = _prepare_teams_sheet(DATA_FILE, use_cache=True)
+    sources = {'games': _source_rows(df_games, _games_key), 'team_codes': _source_rows(df_teams, _team_key)}
+
+    with engine.connect() as conn:
+        stored = {sheet: {} for sheet in sources}
+        statement = select(SourceFingerprint.sheet, SourceFingerprint.row_key, SourceFingerprint.fingerprint,
+                           SourceFingerprint.games_id)
+        for sheet, key, fingerprint, games_id in conn.execute(statement):
+            stored.setdefault(sheet, {})[key] = (fingerprint, games_id)
+        has_data = conn.execute(select(Team.code).limit(1)).first() is not None
+
+    if has_data and not any(stored.values()):
+        # Dropped and reloaded in one transaction, so the data is unchanged if the load fails
+        with engine.connect() as conn:
+            _delete_data(conn)
+            _bulk_add_rows(conn, df_games, df_teams, batch_size)
+            conn.commit()
+        return {sheet: {'inserted': len(rows), 'updated': 0, 'deleted': 0} for sheet, rows in sources.items()}
+
+    changes = {}
+    fingerprints = {}
+    for sheet, source in sources.items():
+        fingerprints[sheet] = {key: _fingerprint(row) for key, row in source.items()}
+        changes[sheet] = {
+            'inserted': [key for key in source if key not in stored[sheet]],
+            'updated': [key for key in source if key in stored[sheet] and
+                        stored[sheet][key][0] != fingerprints[sheet][key]],
+            'deleted': [key for key in stored[sheet] if key not in source],
+        }
+
+    with engine.begin() as conn:
+        # Remove the fingerprints of the changed rows and the summary rows of the removed Games first as they
+        # reference the Games being deleted
+        delete_games_summary(conn, [stored['games'][key][1] for key in changes['games']['deleted']])
+        for sheet, sheet_changes in changes.items():
+            for batch in _batches(sheet_changes['updated'] + sheet_changes['deleted']):
+                conn.execute(delete(SourceFingerprint).where(SourceFingerprint.sheet == sheet,
+                                                             SourceFingerprint.row_key.in_(batch)))
+
+        games_ids, relinked_ids = _apply_changes(conn, sources, stored, changes, batch_size)
+
+        fingerprint_rows = [
+            {'sheet': sheet, 'row_key': key, 'fingerprint': fingerprints[sheet][key], 'games_id': games_ids.get(key)
+             if sheet == 'games' else None}
+            for sheet, sheet_changes in changes.items() for key in sheet_changes['inserted'] + sheet_changes['updated']
+        ]
+        _insert_rows(conn, SourceFingerprint.__table__, fingerprint_rows, batch_size)
+
+        # Only the summaries of the changed Games, the relinked Games have a changed number of teams
+        refresh_games_summary(conn, [games_ids[key] for key in changes['games']['inserted']], inserted=True)
+        refresh_games_summary(conn, [games_ids[key] for key in changes['games']['updated']])
+        refresh_games_summary(conn, relinked_ids, search=False)
+
+    return {sheet: {change: len(keys) for change, keys in sheet_changes.items()}
+            for sheet, sheet_changes in changes.items()}
+
+
+def _delete_unreferenced(conn, model, ids, reference_columns):
+    """ Deletes the rows with the given ids that are not referenced by any of the reference columns """
+    for batch in _batches([i for i in ids if i is not None]):
+        statement = delete(model).where(model.id.in_(batch))
+        for column in reference_columns:
+            statement = statement.where(~exists().where(column == model.id))
+        conn.execute(statement)
+
+
+def _apply_changes(conn, sources: dict, stored: dict, changes: dict,
+                   batch_size: int) -> tuple[dict[str, int], list[int]]:
+    """ Writes the changed Teams and Games for refresh_data
+
+    Returns:
+        dict of {row_key: games_id} for the inserted and updated rows of the games sheet
+        list of the ids of the unchanged Games whose GamesTeam were rewritten, as a team was added, changed or removed
+    """
+    games_source, team_source = sources['games'], sources['team_codes']
+    games_changes, team_changes = changes['games'], changes['team_codes']
+    updated_games = set(games_changes['updated'])
+
+    old_codes = team_changes['updated'] + team_changes['deleted']
+    old_games_ids = [stored['games'][key][1] for key in games_changes['updated'] + games_changes['deleted']]
+    new_games_rows = [games_source[key] for key in games_changes['inserted'] + games_changes['updated']]
+    new_teams = {key: _team_values(team_source[key]) for key in team_changes['inserted'] + team_changes['updated']}
+
+    # Unchanged games whose GamesTeam may change because a team with their country name was added, changed or removed
+    old_team_names, old_country_ids = set(), set()
+    for batch in _batches(old_codes):
+        for name, country_id in conn.execute(select(Team.name, Team.country_id).where(Team.code.in_(batch))):
+            old_team_names.add(name)
+            old_country_ids.add(country_id)
+    team_names = old_team_names | {values['name'] for values in new_teams.values()}
+    relinked = {
+        key: stored['games'][key][1] for key, row in games_source.items()
+        if key in stored['games'] and key not in updated_games and _san(row.get('country')) in team_names
+    }
+
+    # Identity maps for only the names used by the new and changed rows
+    games_countries = [_san(row.get('country')) for row in new_games_rows]
+    games_countries += [_san(games_source[key].get('country')) for key in relinked]
+    team_codes = _existing_ids(conn, Team.name, Team.code, games_countries)
+    rows = _LoadRows(
+        conn,
+        disability_ids=_existing_ids(conn, Disability.description, Disability.id,
+                                     [d for row in new_games_rows for d in _split(row.get('disabilities_included'))]),
+        country_ids=_existing_ids(conn, Country.country_name, Country.id,
+                                  games_countries + [_host_country_name(c) for c in games_countries] +
+                                  [values['name'] for values in new_teams.values()]),
+        team_codes={name: code for name, code in team_codes.items() if code not in old_codes},
+        host_ids=_existing_ids(conn, Host.place_name, Host.id,
+                               [h for row in new_games_rows for h in _split(row.get('host'))]),
+    )
+
+    # Remove the links of replaced and removed games, keeping the ids they referenced to remove orphans afterwards
+    old_host_ids, old_disability_ids = set(), set()
+    for batch in _batches(old_games_ids):
+        old_host_ids.update(conn.execute(select(GamesHost.host_id).where(GamesHost.games_id.in_(batch))).scalars())
+        old_disability_ids.update(conn.execute(select(GamesDisability.disability_id)
+                                               .where(GamesDisability.games_id.in_(batch))).scalars())
+        for model in (GamesTeam, GamesDisability, GamesHost):
+            conn.execute(delete(model).where(model.games_id.in_(batch)))
+    for batch in _batches(list(relinked.values())):
+        conn.execute(delete(GamesTeam).where(GamesTeam.games_id.in_(batch)))
+    for batch in _batches([stored['games'][key][1] for key in games_changes['deleted']]):
+        conn.execute(delete(Games).where(Games.id.in_(batch)))
+    for batch in _batches(team_changes['deleted']):
+        conn.execute(delete(Team).where(Team.code.in_(batch)))
+
+    # Insert the new rows
+    for key in team_changes['inserted']:
+        rows.add_team(team_source[key])
+    for key in team_changes['updated']:
+        new_teams[key]['country_id'] = rows.team_country_id(new_teams[key])
+        rows.team_codes.setdefault(new_teams[key]['name'], new_teams[key]['code'])
+    games_ids = {key: rows.add_games(games_source[key]) for key in games_changes['inserted']}
+    for key in games_changes['updated']:
+        games_ids[key] = stored['games'][key][1]
+        rows.add_games_links(games_ids[key], games_source[key])
+    for key, games_id in relinked.items():
+        rows.add_games_team(games_id, _san(games_source[key].get('country')))
+    rows.write(conn, batch_size)
+
+    # Update after the inserts so that any new countries exist before the teams reference them
+    for key in team_changes['updated']:
+        conn.execute(update(Team).where(Team.code == new_teams[key]['code']).values(**new_teams[key]))
+    for key in games_changes['updated']:
+        conn.execute(update(Games).where(Games.id == games_ids[key]).values(**_games_values(games_source[key])))
+
+    _delete_unreferenced(conn, Host, old_host_ids, [GamesHost.host_id])
+    _delete_unreferenced(conn, Disability, old_disability_ids, [GamesDisability.disability_id])
+    _delete_unreferenced(conn, Country, old_country_ids, [Team.country_id, Host.country_id])
+
+    return games_ids, list(relinked.values())
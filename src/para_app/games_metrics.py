@@ -0,0 +1,98 @@
+""" Duration and female:male ratio of many Games at once
+
+Games.calculate_duration and Games.calculate_fm_ratio work on one Games instance and raise a ValueError if it has
+no valid value. To compute them for the whole games table, or the Games matching some conditions, games_metrics
+reads only the columns they need with Core, so no Games instances are created. The dates are stored as ISO text, so
+SQLite computes the durations with julianday, and the ratios are computed for every row at once with NumPy.
+
+Rows without a valid value are flagged rather than raised: the metric is missing and the error column has the
+message of the ValueError the instance method raises. The messages come from calling the instance method on the
+flagged rows' values, so the validation is the same as for one Games.
+"""
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import Integer, String, case, cast, func, type_coerce
+from sqlmodel import select
+
+from para_app.columnar import result_columns
+from para_app.models import Games
+
+METRICS_COLUMNS = ["id", "year", "event_type", "duration", "duration_error", "fm_ratio", "fm_ratio_error"]
+
+
+def _stored_date(column):
+    """ Returns the Games date column as it is stored, ISO text, if it holds a valid date, otherwise NULL """
+    stored = type_coerce(column, String)
+    # date() only moves a day past the end of the month, e.g. 2000-02-31, into the next with a modifier
+    return case((func.date(stored, "+0 days") == stored, stored))
+
+
+# Days from start_date to end_date, computed by SQLite from the ISO dates, NULL unless both are valid dates
+_DAYS = cast(func.julianday(_stored_date(Games.end_date)) - func.julianday(_stored_date(Games.start_date)),
+             Integer).label("days")
+
+_GAMES_COLUMNS = [Games.id, Games.year, Games.event_type, Games.start_date, Games.end_date, Games.participants_m,
+                  Games.participants_f, _DAYS]
+
+
+def games_metrics(conn, *criteria) -> pd.DataFrame:
+    """ Returns the duration and female:male ratio of every Games, or of the Games matching the criteria
+
+        games_metrics(session.connection(), Games.event_type == "winter", Games.year >= 2000)
+
+    Args:
+        conn: SQLAlchemy Connection
+        *criteria: where clauses on the Games columns, e.g. Games.year >= 2000
+
+    Returns:
+        DataFrame ordered by id with the columns:
+            id, year, event_type
+            duration (Int64): days from start_date to end_date as calculate_duration, <NA> if invalid
+            duration_error (object): the ValueError message of calculate_duration, None if valid
+            fm_ratio (float64): participants_f / participants_m as calculate_fm_ratio, NaN if invalid
+            fm_ratio_error (object): the ValueError message of calculate_fm_ratio, None if valid
+    """
+    statement = select(*_GAMES_COLUMNS).where(*criteria).order_by(Games.id)
+    df = result_columns(conn.execute(statement), statement, "pandas")
+
+    duration = df["days"].to_numpy(dtype=np.float64, na_value=np.nan)
+    # NaN, a missing or invalid date, is not >= 0
+    with np.errstate(invalid="ignore"):
+        duration_valid = duration >= 0
+    duration[~duration_valid] = np.nan
+    df["duration_error"] = _flag(Games.calculate_duration, df, ["start_date", "end_date"], ~duration_valid, duration)
+    df["duration"] = pd.array(duration, dtype="Float64").astype("Int64")
+
+    m = df["participants_m"].to_numpy(dtype=np.float64, na_value=np.nan)
+    f = df["participants_f"].to_numpy(dtype=np.float64, na_value=np.nan)
+    with np.errstate(invalid="ignore"):
+        ratio_valid = (m > 0) & (f > 0)
+    fm_ratio = np.divide(f, m, out=np.full(len(df), np.nan), where=ratio_valid)
+    df["fm_ratio_error"] = _flag(Games.calculate_fm_ratio, df, ["participants_m", "participants_f"], ~ratio_valid,
+                                 fm_ratio)
+    df["fm_ratio"] = fm_ratio
+    return df[METRICS_COLUMNS]
+
+
+def _flag(method, df: pd.DataFrame, columns: list[str], invalid: np.ndarray, values: np.ndarray) -> pd.Series:
+    """ Returns the ValueError message of the Games method for each invalid row, None for the other rows
+
+    The method is called with the row's values of the columns. If it returns a value, e.g. for a date stored as
+    text other than ISO that strptime parses, the value is set in values and the row is not flagged.
+    """
+    errors = np.full(len(df), None, dtype=object)
+    for i in np.flatnonzero(invalid):
+        row = SimpleNamespace(**{name: _python_value(df[name].iat[i]) for name in columns})
+        try:
+            values[i] = method(row)
+        except ValueError as e:
+            errors[i] = str(e)
+    # Object rather than pandas' string dtype, so that valid rows are None as documented
+    return pd.Series(errors, index=df.index, dtype=object)
+
+
+def _python_value(value):
+    """ Returns None for pandas' missing values, as Games attributes have, otherwise the value """
+    return None if pd.isna(value) else value
@@ -0,0 +1,139 @@
+""" Full-text search over the Games highlights and host names
+
+games_search is an SQLite FTS5 virtual table with one row per Games, whose rowid is the Games id. It holds the
+highlights of the Games and its host names, as listed in games_summary, and is indexed for ranked keyword and prefix
+search. It cannot be a SQLModel model, so it is created and dropped with the model tables by listening to
+SQLModel.metadata.create_all and drop_all.
+
+The rows are written from games_summary, so the games_summary functions refresh them after they refresh the
+summary. As with those, the functions take a Connection or Session and do not commit.
+"""
+import re
+
+from sqlalchemy import (DDL, Integer, String, bindparam, column, delete, event, func, insert, literal_column, select,
+                        table)
+from sqlmodel import SQLModel
+
+from para_app.models import Games, GamesSummary
+
+# unicode61 folds case and accents rather than stemming, so that a prefix matches the words as they are written.
+# prefix='2 3' adds indexes of the 2 and 3 character prefixes, so short prefix queries do not read every term.
+CREATE_GAMES_SEARCH = DDL(
+    "CREATE VIRTUAL TABLE IF NOT EXISTS games_search USING fts5("
+    "highlights, hosts, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+)
+DROP_GAMES_SEARCH = DDL("DROP TABLE IF EXISTS games_search")
+event.listen(SQLModel.metadata, "after_create", CREATE_GAMES_SEARCH.execute_if(dialect="sqlite"))
+event.listen(SQLModel.metadata, "before_drop", DROP_GAMES_SEARCH.execute_if(dialect="sqlite"))
+
+# rank is the hidden FTS5 column with the bm25 score of a match, lower is better
+GAMES_SEARCH = table(
+    "games_search",
+    column("rowid", Integer),
+    column("highlights", String),
+    column("hosts", String),
+    column("rank"),
+)
+# The table name on the left of MATCH searches every column
+_MATCH = literal_column("games_search").op("MATCH")
+
+SEARCH_COLUMNS = ["rowid", "highlights", "hosts"]
+_SEARCH_ROWS = select(GamesSummary.games_id, Games.highlights, GamesSummary.hosts).join(
+    Games, Games.id == GamesSummary.games_id)
+
+REBUILD = [
+    delete(GAMES_SEARCH),
+    insert(GAMES_SEARCH).from_select(SEARCH_COLUMNS, _SEARCH_ROWS),
+]
+REFRESH = [
+    delete(GAMES_SEARCH).where(GAMES_SEARCH.c.rowid.in_(bindparam("games_ids", expanding=True))),
+    insert(GAMES_SEARCH).from_select(
+        SEARCH_COLUMNS, _SEARCH_ROWS.where(GamesSummary.games_id.in_(bindparam("games_ids", expanding=True)))
+    ),
+]
+
+# The Games matching the query, best match first, with the matched words of the highlights in [ ]
+SEARCH = (
+    select(
+        Games.id,
+        Games.year,
+        Games.event_type,
+        GAMES_SEARCH.c.hosts,
+        func.snippet(literal_column("games_search"), 0, "[", "]", "...", 12).label("highlights"),
+    )
+    .select_from(GAMES_SEARCH)
+    .join(Games, Games.id == GAMES_SEARCH.c.rowid)
+    .where(_MATCH(bindparam("query")))
+    .order_by(GAMES_SEARCH.c.rank)
+    .limit(bindparam("limit"))
+)
+
+_WORD = re.compile(r"\w+")
+
+
+def rebuild_games_search(conn) -> int:
+    """ Replaces the rows of games_search with a row for every row of games_summary
+
+    Args:
+        conn: SQLAlchemy Connection or Session
+
+    Returns:
+        number of rows written
+    """
+    conn.execute(REBUILD[0])
+    return conn.execute(REBUILD[1]).rowcount
+
+
+def delete_games_search(conn, games_ids: list[int]) -> int:
+    """ Deletes the games_search rows of the Games with the ids
+
+    Args:
+        conn: SQLAlchemy Connection or Session
+        games_ids: ids of the Games, e.g. of Games being deleted
+
+    Returns:
+        number of rows deleted
+    """
+    if not games_ids:
+        return 0
+    return conn.execute(REFRESH[0], {"games_ids": list(games_ids)}).rowcount
+
+
+def refresh_games_search(conn, games_ids: list[int], inserted: bool = False) -> int:
+    """ Rewrites the games_search rows of the Games with the ids from their games_summary rows
+
+    Args:
+        conn: SQLAlchemy Connection or Session
+        games_ids: ids of the Games whose highlights or hosts have changed
+        inserted: True if the Games have just been inserted, so they have no rows to delete first
+
+    Returns:
+        number of rows written
+    """
+    if not games_ids:
+        return 0
+    if not inserted:
+        delete_games_search(conn, games_ids)
+    return conn.execute(REFRESH[1], {"games_ids": list(games_ids)}).rowcount
+
+
+def match_query(text: str, prefix: bool = False) -> str:
+    """ Returns an FTS5 query that matches rows containing every word of the text
+
+    Each word is quoted so that FTS5 operators and punctuation in the text are searched for rather than parsed.
+
+    Args:
+        text: words to search for, e.g. 'wheelchair basketball'
+        prefix: True to match words that start with each word, e.g. 'wheel' matches 'wheelchair'
+
+    Returns:
+        the FTS5 query, or '' if the text has no words
+    """
+    star = "*" if prefix else ""
+    return " ".join(f'"{word}"{star}' for word in _WORD.findall(text))
+
+
+def search_is_missing(conn) -> bool:
+    """ True if games_summary has rows but games_search is empty, e.g. the data was loaded by an earlier version """
+    return (conn.execute(select(GamesSummary.games_id).limit(1)).first() is not None
+            and conn.execute(select(GAMES_SEARCH.c.rowid).limit(1)).first() is None)
@@ -1,15 +1,63 @@
 """ Example service for the Games model """
 from __future__ import annotations
 
-from typing import List, Sequence
+import functools
+from typing import List, Sequence, Union
 
+from sqlalchemy import bindparam, delete, inspect as sa_inspect
 from sqlmodel import Session, select
 
-from para_app.models import Games
+from para_app.database import _batches
+from para_app.games_search import GAMES_SEARCH
+from para_app.games_summary import refresh_games_summary
+from para_app.models import Games, GamesDisability, GamesHost, GamesSummary, GamesTeam, SourceFingerprint
+
+# Columns written by create_many_games, the id is set by the database
+GAMES_COLUMNS = [column.name for column in Games.__table__.columns if column.name != "id"]
+
+# Rows per INSERT statement of create_many_games. Each row has a parameter per column, and SQLite allows at most
+# 32766 parameters in a statement by default.
+GAMES_INSERT_BATCH_SIZE = 32766 // len(GAMES_COLUMNS)
+
+# Ids per IN list of read_games_many and delete_games_many, within SQLite's default limit of 32766 parameters
+IN_BATCH_SIZE = 30000
+
+READ_GAMES_MANY = select(Games).where(Games.id.in_(bindparam("games_ids", expanding=True))).order_by(Games.id)
+
+# The rows that reference the Games, deleted before them. Statements on the tables rather than the models, so
+# that a Session runs them without ORM processing.
+DELETE_GAMES_MANY = [
+    delete(model.__table__).where(model.__table__.c.games_id.in_(bindparam("games_ids", expanding=True)))
+    for model in (GamesHost, GamesDisability, GamesTeam, GamesSummary, SourceFingerprint)
+] + [
+    delete(GAMES_SEARCH).where(GAMES_SEARCH.c.rowid.in_(bindparam("games_ids", expanding=True))),
+    delete(Games.__table__).where(Games.__table__.c.id.in_(bindparam("games_ids", expanding=True))),
+]
+
+
+@functools.lru_cache
+def _insert_games_sql(rows: int) -> str:
+    """ Returns a multi-row INSERT of the rows into games that returns the ids, with ? parameters """
+    row = f"({', '.join('?' * len(GAMES_COLUMNS))})"
+    return f"INSERT INTO games ({', '.join(GAMES_COLUMNS)}) VALUES {', '.join([row] * rows)} RETURNING id"
+
+
+def _games_values(games: Games) -> list:
+    """ Returns the values of GAMES_COLUMNS of the Games """
+    if sa_inspect(games).key is None:
+        # A new Games holds the values that were set in its __dict__, the others are None, and reading them there
+        # is quicker than through the instrumented attributes
+        values = games.__dict__
+        return [values.get(name) for name in GAMES_COLUMNS]
+    return [getattr(games, name) for name in GAMES_COLUMNS]
 
 
 class GamesService:
-    """ Paralympic games CRUD services """
+    """ Paralympic games CRUD services
+
+    Writes refresh the games_summary and games_search rows of the games in the same transaction, so the summary
+    and full-text search see the new highlights.
+    """
 
     def __init__(self, session: Session):
         self.session = session
@@ -17,19 +65,64 @@ class GamesService:
     def create_games(self, games: Games) -> Games:
         """ Create one games """
         self.session.add(games)
+        self.session.flush()
+        refresh_games_summary(self.session, [games.id])
         self.session.commit()
         self.session.refresh(games)
         return games
 
-    def create_many_games(self, games: List[Games]) -> str:
-        """ Create many games """
-        self.session.add_all(games)
+    def create_many_games(self, games: Sequence[Union[Games, dict]], refresh_summary: bool = True) -> List[int]:
+        """ Create many games with multi-row INSERT statements that return the new ids
+
+        The rows are inserted GAMES_INSERT_BATCH_SIZE at a time by a statement with the rows' values as
+        parameters, rather than by adding Games to the session and flushing one INSERT per row. The Games are not
+        added to the session and their ids are not set, only the Games columns are written: not links to hosts,
+        disabilities or teams.
+
+        Args:
+            games: Games, or dicts of Games column values which are quicker to create in bulk. Values are not
+                validated, the database's check constraints still apply.
+            refresh_summary: False to leave out the games_summary and games_search rows of the new games, e.g. for
+                a bulk import that adds their links next. They are then written by refresh_games_summary or
+                rebuild_games_summary, and until then the games are not in query_games_summary or search.
+
+        Returns:
+            ids of the new games, in the order of games
+        """
+        conn = self.session.connection()
+        # The statement is run as it is, so the values are converted by the column types here, e.g. dates to ISO
+        processors = [
+            (i, processor) for i, name in enumerate(GAMES_COLUMNS)
+            if (processor := Games.__table__.c[name].type.bind_processor(conn.dialect)) is not None
+        ]
+        ids = []
+        for batch in _batches(list(games), GAMES_INSERT_BATCH_SIZE):
+            rows = [list(map(row.get, GAMES_COLUMNS)) if isinstance(row, dict) else _games_values(row)
+                    for row in batch]
+            for row in rows:
+                for i, processor in processors:
+                    row[i] = processor(row[i])
+            params = tuple(value for row in rows for value in row)
+            # SQLite gives new rows increasing rowids, so the ids in order are those of the rows in order
+            ids.extend(sorted(conn.exec_driver_sql(_insert_games_sql(len(batch)), params).scalars()))
+        if refresh_summary:
+            refresh_games_summary(self.session, ids, inserted=True, linked=False)
         self.session.commit()
-        return f"Multiple Paralympics created."
+        return ids
 
     def read_games(self, game_id: int) -> Games:
         """ Read one game """
-        games = self.session.get(Games, game_id).one()
+        games = self.session.get(Games, game_id)
+        return games
+
+    def read_games_many(self, game_ids: Sequence[int]) -> List[Games]:
+        """ Read the games with the ids, ordered by id, with one IN query per IN_BATCH_SIZE ids
+
+        Ids with no games are left out.
+        """
+        games = []
+        for batch in _batches(sorted(set(game_ids)), IN_BATCH_SIZE):
+            games.extend(self.session.exec(READ_GAMES_MANY, params={"games_ids": batch}).all())
         return games
 
     def read_all_games(self) -> Sequence[Games]:
@@ -40,14 +133,33 @@ class GamesService:
 
     def delete_games(self, game_id: int) -> str:
         """ Delete Paralympics games by id """
-        self.session.delete(game_id)
-        self.session.commit()
+        self.delete_games_many([game_id])
         return f"Games with id {game_id} deleted."
 
+    def delete_games_many(self, game_ids: Sequence[int]) -> int:
+        """ Delete the games with the ids, and the rows that reference them, in one transaction
+
+        Each table is deleted from with one IN statement per IN_BATCH_SIZE ids: the games' host, disability and
+        team links, games_summary and games_search rows and source fingerprints, then the games. A later
+        refresh_data adds games that are still in the .xlsx file back.
+
+        Returns:
+            number of games deleted
+        """
+        deleted = 0
+        for batch in _batches(sorted(set(game_ids)), IN_BATCH_SIZE):
+            params = {"games_ids": batch}
+            for statement in DELETE_GAMES_MANY[:-1]:
+                self.session.exec(statement, params=params)
+            deleted += self.session.exec(DELETE_GAMES_MANY[-1], params=params).rowcount
+        self.session.commit()
+        return deleted
+
     def update_games(self, games: Games) -> Games:
         """ Update games """
         self.session.add(games)
+        self.session.flush()
+        refresh_games_summary(self.session, [games.id])
         self.session.commit()
         self.session.refresh(games)
         return games
-
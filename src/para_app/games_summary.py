@@ -0,0 +1,166 @@
+""" Builds and refreshes the games_summary table
+
+games_summary has one row per Games with its hosts, host countries, disabilities and number of teams, see
+models.GamesSummary. Each row is computed in SQL by INSERT ... SELECT with a correlated subquery per column, so a
+refresh of a few Games only reads their link rows.
+
+The functions take a Connection or Session and do not commit, so the summary is written in the same transaction as
+the change to the data it summarises. They also rewrite the games_search rows of the Games, see
+para_app.games_search, as those are written from the summary.
+"""
+from typing import Iterable, Optional
+
+from sqlalchemy import bindparam, delete, func, insert, literal, null, select
+
+from para_app.games_search import delete_games_search, rebuild_games_search, refresh_games_search
+from para_app.models import Country, Disability, Games, GamesDisability, GamesHost, GamesSummary, GamesTeam, Host
+
+# Games ids per IN list of a refresh, within SQLite's default limit of 32766 parameters in a statement
+REFRESH_BATCH_SIZE = 30000
+
+SUMMARY_COLUMNS = ["games_id", "year", "event_type", "hosts", "countries", "disabilities", "teams"]
+
+
+def _list(values):
+    """ Returns a scalar subquery of the values of a correlated select joined with ', ' in the select's order
+
+    group_concat joins the rows in the order it reads them, so it reads them from an ordered subquery. This keeps
+    the lists in the same order, that of the link rows, whichever indexes the database has.
+    """
+    ordered = values.correlate(Games).subquery()
+    return select(func.group_concat(ordered.c.value, ", ")).scalar_subquery()
+
+
+_HOSTS = _list(
+    select(Host.place_name.label("value"))
+    .join(GamesHost, GamesHost.host_id == Host.id)
+    .where(GamesHost.games_id == Games.id)
+    .order_by(GamesHost.id)
+)
+# Each country once, in the order of its first host
+_COUNTRIES = _list(
+    select(Country.country_name.label("value"))
+    .join(Host, Host.country_id == Country.id)
+    .join(GamesHost, GamesHost.host_id == Host.id)
+    .where(GamesHost.games_id == Games.id)
+    .group_by(Country.id)
+    .order_by(func.min(GamesHost.id))
+)
+_DISABILITIES = _list(
+    select(Disability.description.label("value"))
+    .join(GamesDisability, GamesDisability.disability_id == Disability.id)
+    .where(GamesDisability.games_id == Games.id)
+    .order_by(GamesDisability.id)
+)
+_TEAMS = select(func.count()).select_from(GamesTeam).where(GamesTeam.games_id == Games.id).scalar_subquery()
+
+_SUMMARY_ROWS = select(Games.id, Games.year, Games.event_type, _HOSTS, _COUNTRIES, _DISABILITIES, _TEAMS)
+
+# Statements on the table rather than the model, so that a Session runs them as they are without ORM processing
+_TABLE = GamesSummary.__table__
+REBUILD = [
+    delete(_TABLE),
+    insert(_TABLE).from_select(SUMMARY_COLUMNS, _SUMMARY_ROWS),
+]
+REFRESH = [
+    delete(_TABLE).where(_TABLE.c.games_id.in_(bindparam("games_ids", expanding=True))),
+    insert(_TABLE).from_select(
+        SUMMARY_COLUMNS, _SUMMARY_ROWS.where(Games.id.in_(bindparam("games_ids", expanding=True)))
+    ),
+]
+
+# The summary of Games without hosts, disabilities or teams, which reads only the games table
+INSERT_UNLINKED = insert(_TABLE).from_select(
+    SUMMARY_COLUMNS,
+    select(Games.id, Games.year, Games.event_type, null(), null(), null(), literal(0))
+    .where(Games.id.in_(bindparam("games_ids", expanding=True))),
+)
+
+HOSTS_GAMES_IDS = select(GamesHost.games_id).where(GamesHost.host_id.in_(bindparam("host_ids", expanding=True)))
+DISABILITIES_GAMES_IDS = (
+    select(GamesDisability.games_id)
+    .where(GamesDisability.disability_id.in_(bindparam("disability_ids", expanding=True)))
+)
+
+
+def rebuild_games_summary(conn) -> int:
+    """ Replaces the rows of games_summary with a row for every Games
+
+    Args:
+        conn: SQLAlchemy Connection or Session
+
+    Returns:
+        number of rows written
+    """
+    conn.execute(REBUILD[0])
+    rows = conn.execute(REBUILD[1]).rowcount
+    rebuild_games_search(conn)
+    return rows
+
+
+def refresh_games_summary(conn, games_ids: Iterable[int], search: bool = True, inserted: bool = False,
+                          linked: bool = True) -> int:
+    """ Recomputes the games_summary rows of the Games with the ids
+
+    Args:
+        conn: SQLAlchemy Connection or Session
+        games_ids: ids of the Games whose highlights, hosts, disabilities or teams have changed
+        search: False to leave the games_search rows as they are, when only the disabilities or teams have
+            changed, as games_search does not hold them
+        inserted: True if the Games have just been inserted, so they have no rows to delete first
+        linked: False if the Games have no hosts, disabilities or teams, e.g. inserted without links, so the
+            summary is written without reading the link tables
+
+    Returns:
+        number of rows written
+    """
+    games_ids = sorted(set(games_ids))
+    rows = 0
+    for start in range(0, len(games_ids), REFRESH_BATCH_SIZE):
+        batch = games_ids[start:start + REFRESH_BATCH_SIZE]
+        params = {"games_ids": batch}
+        if not inserted:
+            conn.execute(REFRESH[0], params)
+        rows += conn.execute(REFRESH[1] if linked else INSERT_UNLINKED, params).rowcount
+        if search:
+            refresh_games_search(conn, batch, inserted)
+    return rows
+
+
+def delete_games_summary(conn, games_ids: Iterable[int]) -> int:
+    """ Deletes the games_summary and games_search rows of the Games with the ids, e.g. before the Games are deleted
+
+    Args:
+        conn: SQLAlchemy Connection or Session
+        games_ids: ids of the Games
+
+    Returns:
+        number of games_summary rows deleted
+    """
+    games_ids = sorted(set(games_ids))
+    rows = 0
+    for start in range(0, len(games_ids), REFRESH_BATCH_SIZE):
+        batch = games_ids[start:start + REFRESH_BATCH_SIZE]
+        rows += conn.execute(REFRESH[0], {"games_ids": batch}).rowcount
+        delete_games_search(conn, batch)
+    return rows
+
+
+def games_ids_for(conn, host_ids: Optional[Iterable[int]] = None,
+                  disability_ids: Optional[Iterable[int]] = None) -> set[int]:
+    """ Returns the ids of the Games linked to any of the hosts or disabilities
+
+    Call before deleting the hosts or disabilities, as the links are deleted with them.
+    """
+    games_ids = set()
+    if host_ids:
+        games_ids.update(conn.execute(HOSTS_GAMES_IDS, {"host_ids": list(host_ids)}).scalars())
+    if disability_ids:
+        games_ids.update(conn.execute(DISABILITIES_GAMES_IDS, {"disability_ids": list(disability_ids)}).scalars())
+    return games_ids
+
+
+def summary_is_missing(conn) -> bool:
+    """ True if there are Games but games_summary is empty, e.g. the data was loaded by an earlier version """
+    return (conn.execute(select(Games.id).limit(1)).first() is not None
+            and conn.execute(select(GamesSummary.games_id).limit(1)).first() is None)
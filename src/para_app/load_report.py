@@ -0,0 +1,111 @@
+""" Measurements of the phases of a database load
+
+add_data and drop_data return a LoadReport with the wall time, rows processed, SQL statements and commits of each
+phase, e.g. reading the workbook, inserting the teams or writing the link tables. Use to_json() to keep a record
+of load performance over time.
+"""
+import json
+import time
+from contextlib import contextmanager, nullcontext
+from dataclasses import asdict, dataclass
+from typing import Optional
+
+from sqlalchemy import event
+
+
+@dataclass
+class PhaseStats:
+    """ Measurements of one phase of a load
+
+    Attributes:
+        name (str): name of the phase, e.g. "teams"
+        seconds (float): wall time in seconds
+        rows (int): number of rows processed
+        statements (int): number of SQL statements executed
+        commits (int): number of transactions committed
+    """
+    name: str
+    seconds: float = 0.0
+    rows: int = 0
+    statements: int = 0
+    commits: int = 0
+
+
+class LoadReport:
+    """ Collects the PhaseStats of each phase of a load
+
+    Use as a context manager: while it is open, the SQL statements and commits on the engine are counted against
+    the phase that is running. A phase that runs more than once, e.g. once per batch, adds up its measurements.
+
+    Attributes:
+        operation (str): what was run, e.g. "add_data"
+        phases (dict[str, PhaseStats]): stats for each phase in the order the phases first ran
+    """
+
+    def __init__(self, engine, operation: str):
+        self.engine = engine
+        self.operation = operation
+        self.phases: dict[str, PhaseStats] = {}
+        self._current: Optional[PhaseStats] = None
+
+    def __enter__(self):
+        event.listen(self.engine, "before_cursor_execute", self._count_statement)
+        event.listen(self.engine, "commit", self._count_commit)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        event.remove(self.engine, "before_cursor_execute", self._count_statement)
+        event.remove(self.engine, "commit", self._count_commit)
+
+    def _count_statement(self, conn, cursor, statement, parameters, context, executemany):
+        if self._current is not None:
+            self._current.statements += 1
+
+    def _count_commit(self, conn):
+        if self._current is not None:
+            self._current.commits += 1
+
+    @contextmanager
+    def phase(self, name: str):
+        """ Measures a phase, yielding its PhaseStats so that the rows processed can be added """
+        stats = self.phases.setdefault(name, PhaseStats(name))
+        previous, self._current = self._current, stats
+        start = time.perf_counter()
+        try:
+            yield stats
+        finally:
+            stats.seconds += time.perf_counter() - start
+            self._current = previous
+
+    @property
+    def total(self) -> PhaseStats:
+        """ Sum of all the phases """
+        total = PhaseStats("total")
+        for stats in self.phases.values():
+            total.seconds += stats.seconds
+            total.rows += stats.rows
+            total.statements += stats.statements
+            total.commits += stats.commits
+        return total
+
+    def to_dict(self) -> dict:
+        return {
+            "operation": self.operation,
+            "total": asdict(self.total),
+            "phases": [asdict(stats) for stats in self.phases.values()],
+        }
+
+    def to_json(self, indent: Optional[int] = 2) -> str:
+        return json.dumps(self.to_dict(), indent=indent)
+
+    def __str__(self) -> str:
+        lines = [f"{self.operation}: {'phase':<30} {'seconds':>9} {'rows':>9} {'statements':>10} {'commits':>8}"]
+        for stats in [*self.phases.values(), self.total]:
+            lines.append(f"{'':{len(self.operation) + 2}}{stats.name:<30} {stats.seconds:>9.4f} {stats.rows:>9} "
+                         f"{stats.statements:>10} {stats.commits:>8}")
+        return "\n".join(lines)
+
+
+def phase(report: Optional[LoadReport], name: str):
+    """ Returns report.phase(name), or a context that measures nothing if there is no report """
+    return report.phase(name) if report is not None else nullcontext(PhaseStats(name))
@@ -3,11 +3,57 @@
 Follows on from week 8 activity with validators and methods added to Games
 
 """
-from datetime import datetime
+import re
+from datetime import date, datetime
 from typing import Optional
 
 from pydantic import field_validator
-from sqlmodel import CheckConstraint, Field, Relationship, SQLModel
+from sqlalchemy import String, TypeDecorator
+from sqlmodel import CheckConstraint, Field, Index, Relationship, SQLModel
+
+_DAY_MONTH_YEAR = re.compile(r"(\d{2})-(\d{2})-(\d{4})")
+_ISO_DATE = re.compile(r"(\d{4})-(\d{2})-(\d{2})")
+
+
+class DateString(TypeDecorator):
+    """ A 'dd-mm-YYYY' date string in Python that is stored as ISO 'YYYY-MM-DD' text
+
+    ISO dates sort in date order, so an index on the column can serve date ranges and ORDER BY, and SQLite's date
+    functions such as julianday can read them. Query parameters are converted in the same way, and can also be date
+    objects. Strings that are not dates are stored and returned as they are, so calculate_duration still reports
+    them as invalid.
+    """
+    impl = String
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if isinstance(value, datetime):
+            value = value.date()
+        if isinstance(value, date):
+            return value.isoformat()
+        if not isinstance(value, str):
+            return value
+        try:
+            match = _DAY_MONTH_YEAR.fullmatch(value)
+            if match:
+                day, month, year = map(int, match.groups())
+                return date(year, month, day).isoformat()
+            # Other strings that calculate_duration accepts, e.g. '1-2-2000'
+            return datetime.strptime(value, "%d-%m-%Y").date().isoformat()
+        except ValueError:
+            return value
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        match = _ISO_DATE.fullmatch(value)
+        if match is None:
+            return value
+        try:
+            date(*map(int, match.groups()))
+        except ValueError:
+            return value
+        return f"{value[8:10]}-{value[5:7]}-{value[0:4]}"
 
 
 class GamesHost(SQLModel, table=True):
@@ -16,6 +62,12 @@ class GamesHost(SQLModel, table=True):
     games_id: int = Field(default=None, foreign_key="games.id")
     host_id: int = Field(default=None, foreign_key="host.id")
 
+    # Link tables are joined from either side, so each has an index led by each foreign key
+    __table_args__ = (
+        Index("ix_games_host_games_id_host_id", "games_id", "host_id"),
+        Index("ix_games_host_host_id_games_id", "host_id", "games_id"),
+    )
+
 
 class GamesDisability(SQLModel, table=True):
     __tablename__ = "games_disability"
@@ -23,6 +75,11 @@ class GamesDisability(SQLModel, table=True):
     games_id: int = Field(default=None, foreign_key="games.id")
     disability_id: int = Field(default=None, foreign_key="disability.id")
 
+    __table_args__ = (
+        Index("ix_games_disability_games_id_disability_id", "games_id", "disability_id"),
+        Index("ix_games_disability_disability_id_games_id", "disability_id", "games_id"),
+    )
+
 
 class GamesTeam(SQLModel, table=True):
     __tablename__ = "games_team"
@@ -30,14 +87,19 @@ class GamesTeam(SQLModel, table=True):
     games_id: int = Field(default=None, foreign_key="games.id")
     team_id: str = Field(default=None, foreign_key="team.code")
 
+    __table_args__ = (
+        Index("ix_games_team_games_id_team_id", "games_id", "team_id"),
+        Index("ix_games_team_team_id_games_id", "team_id", "games_id"),
+    )
+
 
 class Games(SQLModel, table=True):
     __tablename__ = "games"
     id: Optional[int] = Field(default=None, primary_key=True)
     event_type: str
     year: int
-    start_date: Optional[str]
-    end_date: Optional[str]
+    start_date: Optional[str] = Field(default=None, sa_type=DateString)
+    end_date: Optional[str] = Field(default=None, sa_type=DateString)
     countries: Optional[int]
     events: Optional[int]
     sports: Optional[int]
@@ -53,7 +115,10 @@ class Games(SQLModel, table=True):
 
     __table_args__ = (
         CheckConstraint("event_type IN ('winter', 'summer')"),
-        CheckConstraint("year BETWEEN 1960 AND 9999")
+        CheckConstraint("year BETWEEN 1960 AND 9999"),
+        Index("ix_games_year", "year"),
+        Index("ix_games_event_type_year", "event_type", "year"),
+        Index("ix_games_start_date", "start_date"),
     )
 
     # Validators more typically on the Pydantic schema
@@ -131,13 +196,15 @@ class Team(SQLModel, table=True):
     region: Optional[str]
     member_type: str
     notes: Optional[str]
-    country_id: Optional[str] = Field(default=None, foreign_key="country.id")
+    country_id: Optional[str] = Field(default=None, foreign_key="country.id", index=True)
 
     games: list["Games"] = Relationship(back_populates="teams", link_model=GamesTeam)
 
     __table_args__ = (
         CheckConstraint("member_type IN ('country', 'team', 'dissolved', 'construct')"),
-        CheckConstraint("region IN ('Asia', 'Europe', 'Africa', 'America', 'Oceania')")
+        CheckConstraint("region IN ('Asia', 'Europe', 'Africa', 'America', 'Oceania')"),
+        Index("ix_team_region_name", "region", "name"),
+        Index("ix_team_name", "name"),
     )
 
     @field_validator("member_type", mode="after")
@@ -167,7 +234,7 @@ class Team(SQLModel, table=True):
 class Disability(SQLModel, table=True):
     __tablename__ = "disability"
     id: Optional[int] = Field(default=None, primary_key=True)
-    description: str
+    description: str = Field(index=True)
 
     games: list["Games"] = Relationship(back_populates="disabilities", link_model=GamesDisability)
 
@@ -176,7 +243,7 @@ class Host(SQLModel, table=True):
     __tablename__ = "host"
     id: Optional[int] = Field(default=None, primary_key=True)
     place_name: str = Field(unique=True)
-    country_id: Optional[int] = Field(default=None, foreign_key="country.id")
+    country_id: Optional[int] = Field(default=None, foreign_key="country.id", index=True)
 
     games: list["Games"] = Relationship(back_populates="hosts", link_model=GamesHost)
 
@@ -184,4 +251,39 @@ class Host(SQLModel, table=True):
 class Country(SQLModel, table=True):
     __tablename__ = "country"
     id: Optional[int] = Field(default=None, primary_key=True)
-    country_name: str
+    country_name: str = Field(index=True)
+
+
+class SourceFingerprint(SQLModel, table=True):
+    """ Hash of each row of the source .xlsx sheets, used to refresh the database incrementally
+
+    row_key identifies the row in its sheet, e.g. 'summer-1960' in games or 'GBR' in team_codes.
+    games_id is the id of the Games created from a games sheet row.
+    """
+    __tablename__ = "source_fingerprint"
+    sheet: str = Field(primary_key=True)
+    row_key: str = Field(primary_key=True)
+    fingerprint: str
+    games_id: Optional[int] = Field(default=None, foreign_key="games.id", index=True)
+
+
+class GamesSummary(SQLModel, table=True):
+    """ One row per Games with its hosts, host countries, disabilities and number of teams
+
+    A denormalised copy of the games, games_host, host, country, games_disability, disability and games_team tables
+    so that listings read one table rather than joining and grouping them. The lists are comma separated and are
+    None when the Games has no hosts or disabilities. It is rebuilt when the data is loaded and refreshed by the
+    QueryService host and disability writes, see para_app.games_summary.
+    """
+    __tablename__ = "games_summary"
+    games_id: int = Field(primary_key=True, foreign_key="games.id")
+    year: int
+    event_type: str
+    hosts: Optional[str]
+    countries: Optional[str]
+    disabilities: Optional[str]
+    teams: int = 0
+
+    __table_args__ = (
+        Index("ix_games_summary_year_event_type", "year", "event_type"),
+    )
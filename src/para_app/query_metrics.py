@@ -0,0 +1,360 @@
+""" Latency metrics and a slow-query log for the database
+
+QueryMetrics listens to the SQLAlchemy events of an engine and records a latency histogram for each SQL statement,
+each QueryService method and each connection checkout from the pool, with the rows the statements and methods
+returned or changed. Statements and method calls that take longer than a threshold are written to the slow-query
+log, the 'para_app.slow_queries' logger, with their bound parameters or arguments.
+
+A statement is timed until the database returns from executing it. For a query, SQLite returns once the first row
+is ready and finds the rest as they are fetched, so the time to fetch and convert the rows is in the time of the
+method that ran it.
+
+    metrics = QueryMetrics(engine, slow_threshold=0.05)
+    queries = metrics.instrument(QueryService(engine))
+    metrics.start()
+    ...
+    print(metrics)
+    metrics.dump("metrics.json")
+
+It can also be used as a context manager, which calls start() and stop().
+"""
+import bisect
+import functools
+import inspect
+import json
+import logging
+import re
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from types import GeneratorType
+from typing import Optional
+
+from sqlalchemy import event
+
+slow_query_log = logging.getLogger("para_app.slow_queries")
+
+# Upper bounds of the histogram buckets in seconds, there is a further bucket for longer times
+LATENCY_BUCKETS = [0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0]
+
+# Lists of placeholders, e.g. the (?, ?, ?) of an expanding IN, which are counted as one statement whatever their length
+_PLACEHOLDER_LIST = re.compile(r"\(\?(?:, \?)+\)")
+
+
+@dataclass
+class LatencyHistogram:
+    """ Latency measurements of one statement, method or operation
+
+    Attributes:
+        count (int): number of times it ran
+        seconds (float): total time in seconds
+        max_seconds (float): longest time in seconds
+        rows (int): total rows returned or changed, where known
+        buckets (list[int]): number of times that took up to each bound in LATENCY_BUCKETS, and longer
+    """
+    count: int = 0
+    seconds: float = 0.0
+    max_seconds: float = 0.0
+    rows: int = 0
+    buckets: list[int] = field(default_factory=lambda: [0] * (len(LATENCY_BUCKETS) + 1))
+
+    def record(self, seconds: float, rows: int = 0):
+        self.count += 1
+        self.seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+        self.rows += rows
+        self.buckets[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+
+    @property
+    def mean_seconds(self) -> float:
+        return self.seconds / self.count if self.count else 0.0
+
+    def percentile(self, q: float) -> float:
+        """ Returns the upper bound of the bucket holding the q-th percentile, or max_seconds for the last bucket """
+        target = q / 100 * self.count
+        seen = 0
+        for bound, count in zip(LATENCY_BUCKETS, self.buckets):
+            seen += count
+            if count and seen >= target:
+                return min(bound, self.max_seconds)
+        return self.max_seconds
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "mean_ms": round(self.mean_seconds * 1000, 3),
+            "p50_ms": round(self.percentile(50) * 1000, 3),
+            "p95_ms": round(self.percentile(95) * 1000, 3),
+            "p99_ms": round(self.percentile(99) * 1000, 3),
+            "max_ms": round(self.max_seconds * 1000, 3),
+            "rows": self.rows,
+            "buckets": {f"le_{bound * 1000:g}ms": count for bound, count in zip(LATENCY_BUCKETS, self.buckets)}
+            | {"longer": self.buckets[-1]},
+        }
+
+
+@dataclass
+class SlowQuery:
+    """ A statement or QueryService method call that took longer than the slow-query threshold
+
+    Attributes:
+        statement (str | None): SQL statement, None for a method call
+        parameters: bound parameters of the statement, or (args, kwargs) of the method call
+        seconds (float): time in seconds
+        rows (int): rows changed by the statement or returned by the method, -1 for a query statement
+        method (str | None): QueryService method that ran the statement, or that was called
+    """
+    statement: Optional[str]
+    parameters: object
+    seconds: float
+    rows: int
+    method: Optional[str] = None
+
+
+class QueryMetrics:
+    """ Records the latency of the statements, QueryService methods and connection checkouts of an engine
+
+    Attributes:
+        engine: SQLAlchemy engine that is measured
+        slow_threshold (float): statements and method calls that take longer than this many seconds are logged
+        statements (dict[str, LatencyHistogram]): by SQL statement
+        methods (dict[str, LatencyHistogram]): by QueryService method name
+        checkouts (LatencyHistogram): time to check a connection out of the pool, including opening a new one. A
+            connection already in the pool is recorded as 0, as the pool has no event before a checkout, so time
+            waiting for a connection from a full pool is not included.
+        slow_queries (deque[SlowQuery]): the most recent slow statements and method calls
+    """
+
+    def __init__(self, engine, slow_threshold: float = 0.1, max_slow_queries: int = 100):
+        """
+        Args:
+            engine: SQLAlchemy engine, or AsyncEngine, to measure
+            slow_threshold: seconds above which a statement or method call is slow
+            max_slow_queries: number of recent slow queries kept in slow_queries, all are logged
+        """
+        # Events are listened for on the Engine that an AsyncEngine runs on
+        self.engine = getattr(engine, "sync_engine", engine)
+        self.slow_threshold = slow_threshold
+        self.statements: dict[str, LatencyHistogram] = {}
+        self.methods: dict[str, LatencyHistogram] = {}
+        self.checkouts = LatencyHistogram()
+        self.slow_queries: deque[SlowQuery] = deque(maxlen=max_slow_queries)
+        self._lock = threading.Lock()
+        # The QueryService method running in each thread, so statements can be attributed to it
+        self._local = threading.local()
+        self._started = False
+
+    def start(self):
+        """ Starts recording the engine's statements and checkouts """
+        if self._started:
+            return
+        for name, listener in self._listeners():
+            event.listen(self.engine, name, listener)
+        self._started = True
+
+    def stop(self):
+        """ Stops recording, the measurements so far are kept """
+        if not self._started:
+            return
+        for name, listener in self._listeners():
+            event.remove(self.engine, name, listener)
+        self._started = False
+
+    def _listeners(self) -> list:
+        """ Returns the (event name, listener) of each engine event recorded. The pool events are listened for on
+        the engine, so they are kept by the new pool after engine.dispose(). """
+        return [
+            ("before_cursor_execute", self._before_execute),
+            ("after_cursor_execute", self._after_execute),
+            ("handle_error", self._execute_error),
+            ("do_connect", self._before_connect),
+            ("checkout", self._checkout),
+        ]
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def _before_connect(self, dialect, connection_record, cargs, cparams):
+        # The connection record is that of the checkout the new connection is opened for
+        connection_record.info["connect_start"] = time.perf_counter()
+
+    def _checkout(self, dbapi_connection, connection_record, connection_proxy):
+        start = connection_record.info.pop("connect_start", None)
+        elapsed = time.perf_counter() - start if start is not None else 0.0
+        with self._lock:
+            self.checkouts.record(elapsed)
+
+    def _before_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    def _execute_error(self, context):
+        # A statement that fails has no after_cursor_execute, so its start time is removed here
+        if context.connection is not None and context.execution_context is not None:
+            starts = context.connection.info.get("query_start")
+            if starts:
+                starts.pop()
+
+    def _after_execute(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start"].pop()
+        rows = cursor.rowcount
+        key = _statement_key(statement)
+        with self._lock:
+            self.statements.setdefault(key, LatencyHistogram()).record(elapsed, max(rows, 0))
+        if elapsed > self.slow_threshold:
+            method = getattr(self._local, "method", None)
+            self.slow_queries.append(SlowQuery(statement, parameters, elapsed, rows, method))
+            slow_query_log.warning("Slow query %.1f ms in %s: %s parameters: %r", elapsed * 1000, method or "-",
+                                   " ".join(statement.split()), parameters)
+
+    def instrument(self, queries):
+        """ Records the latency and rows of each public method of a QueryService or AsyncQueryService
+
+        The methods are wrapped on the instance, which is returned. The iter_ methods are timed until their
+        results have been read to the end.
+        """
+        for name in dir(type(queries)):
+            if name.startswith("_") or name in ("unit_of_work", "invalidate_cache", "dispose"):
+                continue
+            method = getattr(queries, name)
+            if callable(method):
+                setattr(queries, name, self._timed_method(name, method))
+        return queries
+
+    def _timed_method(self, name: str, method):
+        # Statements are not attributed to the methods of an AsyncQueryService, as its calls interleave in a thread
+        if inspect.iscoroutinefunction(method):
+            @functools.wraps(method)
+            async def timed_coroutine(*args, **kwargs):
+                start = time.perf_counter()
+                result = await method(*args, **kwargs)
+                self._record_method(name, start, result, args, kwargs)
+                return result
+
+            return timed_coroutine
+
+        if inspect.isasyncgenfunction(method):
+            @functools.wraps(method)
+            async def timed_async_generator(*args, **kwargs):
+                start, rows = time.perf_counter(), 0
+                try:
+                    async for row in method(*args, **kwargs):
+                        rows += 1
+                        yield row
+                finally:
+                    self._record_method(name, start, rows, args, kwargs)
+
+            return timed_async_generator
+
+        @functools.wraps(method)
+        def timed(*args, **kwargs):
+            previous, self._local.method = getattr(self._local, "method", None), name
+            start = time.perf_counter()
+            try:
+                result = method(*args, **kwargs)
+            finally:
+                self._local.method = previous
+            if isinstance(result, GeneratorType):
+                return self._timed_generator(name, start, result, args, kwargs)
+            self._record_method(name, start, result, args, kwargs)
+            return result
+
+        return timed
+
+    def _timed_generator(self, name: str, start: float, results, args, kwargs):
+        """ Yields the results of an iter_ method, attributing the statements run for each row to the method """
+        rows = 0
+        try:
+            while True:
+                previous, self._local.method = getattr(self._local, "method", None), name
+                try:
+                    row = next(results)
+                except StopIteration:
+                    return
+                finally:
+                    self._local.method = previous
+                rows += 1
+                yield row
+        finally:
+            self._record_method(name, start, rows, args, kwargs)
+
+    def _record_method(self, name: str, start: float, result, args: tuple, kwargs: dict):
+        """ Records a method call that started at start, result is its result or the number of rows it yielded """
+        elapsed = time.perf_counter() - start
+        rows = _row_count(result)
+        with self._lock:
+            self.methods.setdefault(name, LatencyHistogram()).record(elapsed, rows)
+        if elapsed > self.slow_threshold:
+            self.slow_queries.append(SlowQuery(None, (args, kwargs), elapsed, rows, name))
+            slow_query_log.warning("Slow method %.1f ms: %s args: %r kwargs: %r", elapsed * 1000, name, args, kwargs)
+
+    def reset(self):
+        """ Clears the measurements """
+        with self._lock:
+            self.statements.clear()
+            self.methods.clear()
+            self.checkouts = LatencyHistogram()
+            self.slow_queries.clear()
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {
+                "slow_threshold_ms": self.slow_threshold * 1000,
+                "checkouts": self.checkouts.to_dict(),
+                "methods": {name: stats.to_dict() for name, stats in sorted(self.methods.items())},
+                "statements": {statement: stats.to_dict() for statement, stats in
+                               sorted(self.statements.items(), key=lambda item: -item[1].seconds)},
+                "slow_queries": [{"method": slow.method, "ms": round(slow.seconds * 1000, 3), "rows": slow.rows,
+                                  "statement": slow.statement, "parameters": repr(slow.parameters)}
+                                 for slow in self.slow_queries],
+            }
+
+    def dump(self, path=None) -> dict:
+        """ Returns the measurements as a dict, and writes them to path as JSON if it is given """
+        metrics = self.to_dict()
+        if path is not None:
+            with open(path, "w") as f:
+                json.dump(metrics, f, indent=2)
+        return metrics
+
+    def __str__(self) -> str:
+        lines = [f"{'method / statement':<60} {'count':>7} {'mean ms':>9} {'p95 ms':>9} {'max ms':>9} {'rows':>8}"]
+        groups = [("checkout", {"checkout": self.checkouts}), ("methods", self.methods),
+                  ("statements", dict(sorted(self.statements.items(), key=lambda item: -item[1].seconds)))]
+        for title, histograms in groups:
+            lines.append(title)
+            for name, stats in histograms.items():
+                label = name if len(name) <= 58 else name[:55] + "..."
+                lines.append(f"  {label:<58} {stats.count:>7} {stats.mean_seconds * 1000:>9.3f} "
+                             f"{stats.percentile(95) * 1000:>9.3f} {stats.max_seconds * 1000:>9.3f} {stats.rows:>8}")
+        lines.append(f"{len(self.slow_queries)} slow statements and method calls over "
+                     f"{self.slow_threshold * 1000:g} ms")
+        return "\n".join(lines)
+
+
+@functools.lru_cache(maxsize=1024)
+def _statement_key(statement: str) -> str:
+    """ Returns the statement on one line with its lists of placeholders shortened """
+    return _PLACEHOLDER_LIST.sub("(?, ...)", " ".join(statement.split()))
+
+
+def _row_count(result) -> int:
+    """ Returns the number of rows in a method's result, e.g. a list, Page, DataFrame or dict of column arrays, or
+    1 for one object. A method that returns an int returns a number of rows, e.g. delete_hosts. """
+    if result is None:
+        return 0
+    if isinstance(result, int):
+        return result
+    if isinstance(result, dict):
+        return len(next(iter(result.values()), ()))
+    items = getattr(result, "items", None)
+    if isinstance(items, list):
+        return len(items)
+    try:
+        return len(result)
+    except TypeError:
+        return 1
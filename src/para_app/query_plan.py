@@ -0,0 +1,213 @@
+""" Checks the SQLite query plans of the QueryService statements for full table scans
+
+check_query_plans calls each QueryService method with example arguments, records the SQL it runs and then runs
+EXPLAIN QUERY PLAN for each statement. A step such as 'SCAN games_host' reads every row of the table, whereas
+'SEARCH games_host USING INDEX ...' and 'SCAN games USING INDEX ...' use an index.
+
+The writes are made in a unit of work that is rolled back, so the database is not changed.
+
+Run on paralympics.db with: python -m para_app.query_plan
+"""
+import re
+import sys
+from dataclasses import dataclass, field
+from types import GeneratorType
+
+from sqlalchemy import event
+from sqlmodel import SQLModel
+
+from para_app.database import create_db_and_tables, engine as default_engine
+from para_app.models import Host, Team
+from para_app.query_service import QueryService
+
+# Example arguments for each QueryService read method, the iter_ methods are read to the end
+READ_CALLS = [
+    ("read_hosts", {}),
+    ("read_host", {"host_id": 1}),
+    ("read_hosts_by_ids", {"host_ids": [1, 2, 3]}),
+    ("query_games_year_type", {}),
+    ("query_games_type_with_host", {"event_type": "winter"}),
+    ("query_disabilities", {}),
+    ("query_games_after_year", {"year": 2000}),
+    ("query_games_between_dates", {"start": "01-01-2000", "end": "31-12-2004"}),
+    ("query_games_by_start", {}),
+    ("query_region_teams", {"region": "Oceania"}),
+    ("query_host_country", {"country": "Italy"}),
+    ("query_games_host_country", {}),
+    ("query_disabilities_by_games", {}),
+    ("query_games_summary", {}),
+    ("query_teams_year", {"year": 2016, "event_type": "summer"}),
+    ("query_games_disability", {"disability": "Amputee"}),
+    ("search", {"text": "wheelchair"}),
+    ("search", {"text": "innsbr", "prefix": True}),
+    ("export", {"query": "query_games_type_with_host", "output": "numpy", "event_type": "winter"}),
+    ("games_metrics", {}),
+    ("iter_hosts", {}),
+    ("iter_disabilities", {}),
+    ("iter_games_host_country", {}),
+    ("page_hosts", {"after_id": 10}),
+    ("page_games", {}),
+    ("page_games", {"after": (2000, 0)}),
+    ("page_games_host_country", {}),
+    ("page_games_host_country", {"after": (2000, 0, 0)}),
+]
+
+# Tables that a method reads in full because it returns all of their rows, so a scan is expected
+EXPECTED_SCANS = {
+    "query_disabilities": {"disability"},
+    "query_games_host_country": {"games", "games_host"},
+    "iter_disabilities": {"disability"},
+    "iter_games_host_country": {"games", "games_host"},
+    "games_metrics": {"games"},
+}
+
+# A step that reads every row of a table without an index, e.g. 'SCAN games' but not 'SCAN games USING INDEX ...'.
+# SQLite before 3.36 writes 'SCAN TABLE games', with 'AS games_1' for an alias.
+_FULL_SCAN = re.compile(r"^SCAN (?:TABLE )?(\w+)(?: AS \w+)?$")
+# A subquery in the FROM clause, e.g. 'CO-ROUTINE anon_2', whose rows are read with 'SCAN anon_2' rather than a table.
+# SQLite before 3.36 numbers them, e.g. 'CO-ROUTINE 1' read with 'SCAN SUBQUERY 1', which is not a _FULL_SCAN.
+_SUBQUERY = re.compile(r"^(?:CO-ROUTINE|MATERIALIZE) (?:SUBQUERY )?(\w+)$")
+
+
+@dataclass
+class QueryPlan:
+    """ The query plan of a statement run by a QueryService method
+
+    Attributes:
+        method (str): name of the QueryService method
+        statement (str): SQL statement
+        steps (list[str]): detail column of each row of EXPLAIN QUERY PLAN
+        full_scans (list[str]): tables read in full, other than those expected for the method
+    """
+    method: str
+    statement: str
+    steps: list[str] = field(default_factory=list)
+    full_scans: list[str] = field(default_factory=list)
+
+
+class _Rollback(Exception):
+    """ Raised to roll back the unit of work of the example writes """
+
+
+def check_query_plans(engine) -> list[QueryPlan]:
+    """ Returns the query plan of each statement run by the QueryService methods
+
+    Args:
+        engine: SQLAlchemy engine for a database with the tables, the data may be empty
+
+    Returns:
+        list of QueryPlan in the order the statements ran
+    """
+    queries = QueryService(engine)
+    captured = []
+    method = [None]
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if method[0] is not None:
+            # A multi-row INSERT ... RETURNING has the parameters of all its rows in one tuple, although executemany
+            # is True, an executemany has a list of them
+            many = executemany and isinstance(parameters, list)
+            captured.append((method[0], statement, parameters[0] if many else parameters))
+
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        for name, kwargs in READ_CALLS:
+            method[0] = name
+            result = getattr(queries, name)(**kwargs)
+            if isinstance(result, GeneratorType):
+                list(result)
+        try:
+            with queries.unit_of_work():
+                method[0] = "create_host"
+                host = queries.create_host(place_name="Query plan check", country_name="Great Britain")
+                method[0] = "update_host"
+                host.place_name = "Query plan check (updated)"
+                queries.update_host(host)
+                method[0] = "delete_host"
+                queries.delete_host(host.id)
+                method[0] = "create_hosts"
+                hosts = queries.create_hosts([("Query plan check 1", "Great Britain"), ("Query plan check 2", "Italy")])
+                method[0] = "update_hosts"
+                for host in hosts:
+                    host.place_name += " (updated)"
+                queries.update_hosts(hosts)
+                method[0] = "delete_hosts"
+                queries.delete_hosts([host.id for host in hosts])
+                method[0] = "update_disability"
+                queries.update_disability("Les Autres", "Other")
+                method[0] = "update_where"
+                queries.update_where(Host, {"place_name": "Query plan check"}, id=1)
+                queries.update_where(Team, {"notes": "Query plan check"}, region="Oceania")
+                method[0] = None
+                raise _Rollback
+        except _Rollback:
+            pass
+    finally:
+        method[0] = None
+        event.remove(engine, "before_cursor_execute", capture)
+
+    plans = []
+    with engine.connect() as conn:
+        for name, statement, parameters in captured:
+            plan = QueryPlan(name, statement)
+            plan.steps = [row[-1] for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)]
+            plan.full_scans = [table for table in full_scans(plan.steps)
+                               if table not in EXPECTED_SCANS.get(name, set())]
+            plans.append(plan)
+    return plans
+
+
+def full_scans(steps: list[str]) -> list[str]:
+    """ Returns the tables read in full by the steps of a query plan, as written by any SQLite 3 version
+
+    Args:
+        steps: detail column of each row of EXPLAIN QUERY PLAN
+
+    Returns:
+        table names, in the order of the steps
+    """
+    subqueries = set()
+    tables = []
+    for detail in steps:
+        subquery = _SUBQUERY.match(detail)
+        if subquery:
+            subqueries.add(subquery.group(1))
+        match = _FULL_SCAN.match(detail)
+        if match and match.group(1) not in subqueries:
+            tables.append(_table_name(match.group(1)))
+    return tables
+
+
+def _table_name(name: str) -> str:
+    """ Returns the table name for a name in a query plan, which from SQLite 3.36 is the alias, such as
+    games_host_1, of a join made through a relationship """
+    if name not in SQLModel.metadata.tables:
+        table = re.sub(r"_\d+$", "", name)
+        if table in SQLModel.metadata.tables:
+            return table
+    return name
+
+
+def format_report(plans: list[QueryPlan]) -> str:
+    """ Returns the plans as text, marking the statements with full table scans """
+    lines = []
+    for plan in plans:
+        status = f"FULL SCAN of {', '.join(plan.full_scans)}" if plan.full_scans else "ok"
+        lines.append(f"{plan.method}: {status}")
+        lines.append(f"    {' '.join(plan.statement.split())}")
+        lines.extend(f"    - {step}" for step in plan.steps)
+    scans = sum(1 for plan in plans if plan.full_scans)
+    lines.append(f"{len(plans)} statements, {scans} with full table scans")
+    return "\n".join(lines)
+
+
+def main() -> int:
+    """ Prints the report for paralympics.db and returns 1 if any statement has a full table scan """
+    create_db_and_tables()
+    plans = check_query_plans(default_engine)
+    print(format_report(plans))
+    return 1 if any(plan.full_scans for plan in plans) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
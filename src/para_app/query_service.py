@@ -20,11 +20,191 @@ Developers using frameworks such as FastAPI often use an architecture that separ
 This activity is only using SQLModel, though you can use Pydantic schemas in coursework 2 if you wish.
 Do not use FastAPI for this coursework please, that is in COMP0034.
 """
-from typing import Sequence
+import functools
+import threading
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass, field
+from datetime import date
+from typing import Any, Iterator, Optional, Sequence, Union
 
-from sqlmodel import Session, func, select
+from sqlalchemy import bindparam, delete, insert, update
+from sqlmodel import Session, select, tuple_
 
-from para_app.models import Country, Disability, Games, GamesHost, Host, Team
+from para_app.columnar import result_columns
+from para_app.database import create_db_engine
+from para_app.games_metrics import games_metrics
+from para_app.games_search import SEARCH, match_query
+from para_app.games_summary import games_ids_for, refresh_games_summary
+from para_app.models import Country, Disability, Games, GamesDisability, GamesHost, GamesSummary, GamesTeam, Host, Team
+from para_app.result_cache import ResultCache
+
+
+def cached(*models):
+    """ Keeps the results of a QueryService read method in the service's cache, if it has one
+
+    Results are keyed on the method name and arguments and are invalidated by writes to the tables of the models.
+
+    Args:
+        *models: the models whose tables the query reads
+    """
+    tables = frozenset(model.__tablename__ for model in models)
+
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            if self.cache is None or self.in_unit_of_work:
+                return method(self, *args, **kwargs)
+            key = (method.__name__, args, tuple(sorted(kwargs.items())))
+            return self.cache.get_or_load(key, tables, lambda: method(self, *args, **kwargs))
+
+        return wrapper
+
+    return decorator
+
+
+# Rows fetched from the database at a time by the iter_ methods
+STREAM_BATCH_SIZE = 1000
+
+# Rows per page for the page_ methods
+PAGE_SIZE = 100
+
+# Maximum rows returned by search
+SEARCH_LIMIT = 20
+
+# Cursor for the first page of results ordered by Games.year: the year check constraint starts at 1960, and a range
+# condition lets SQLite read the games in year order through ix_games_year rather than sorting the whole result.
+FIRST_YEAR_CURSOR = 1959
+
+
+def keyset_page(statement, keys: list):
+    """ Returns the statement for a page of its results ordered by the key columns
+
+    The page has the rows whose keys are greater than the bound parameters after_0, after_1, ..., one per key, and
+    at most the bound parameter limit rows.
+
+    Args:
+        statement: select statement
+        keys: columns that order the results and are unique together
+    """
+    after = [bindparam(f"after_{i}") for i in range(len(keys))]
+    condition = tuple_(*keys) > tuple_(*after) if len(keys) > 1 else keys[0] > after[0]
+    return statement.where(condition).order_by(*keys).limit(bindparam("limit"))
+
+
+# The statements are built once, and each call binds its arguments to their parameters. SQLAlchemy keeps the SQL
+# compiled from a statement in the engine's compiled cache, under a cache key that is only computed once for a
+# statement that is reused, so a call neither builds nor compiles a statement.
+READ_HOSTS = select(Host).order_by(Host.place_name)
+READ_HOST = select(Host).where(Host.id == bindparam("host_id"))
+COUNTRY_ID = select(Country.id).where(Country.country_name == bindparam("country_name"))
+HOSTS_BY_IDS = select(Host).where(Host.id.in_(bindparam("host_ids", expanding=True))).order_by(Host.id)
+COUNTRY_IDS = (
+    select(Country.country_name, Country.id)
+    .where(Country.country_name.in_(bindparam("country_names", expanding=True)))
+)
+INSERT_HOSTS = insert(Host).returning(Host.id)
+UPDATE_HOSTS = update(Host)
+DELETE_HOSTS_GAMES_HOST = delete(GamesHost).where(GamesHost.host_id.in_(bindparam("host_ids", expanding=True)))
+DELETE_HOSTS = delete(Host).where(Host.id.in_(bindparam("host_ids", expanding=True)))
+GAMES_YEAR_TYPE = select(Games.year, Games.event_type).order_by(Games.year)
+GAMES_TYPE_WITH_HOST = (
+    select(Host.place_name, Games.year)
+    .join(Host, Games.hosts)  # using Games.hosts relationship
+    .where(Games.event_type == bindparam("event_type"))
+    .order_by(Games.year)
+)
+DISABILITIES = select(Disability)
+GAMES_AFTER_YEAR = select(Games).where(Games.year > bindparam("year")).order_by(Games.year)
+# Games dates are stored as ISO text, which sorts in date order, so these read the Games in order of start_date
+# through ix_games_start_date. The parameters take the Games.start_date type, so 'dd-mm-YYYY' strings are converted.
+GAMES_BETWEEN_DATES = (
+    select(Games)
+    .where(Games.start_date.between(bindparam("start"), bindparam("end")))
+    .order_by(Games.start_date, Games.id)
+)
+GAMES_BY_START = select(Games).where(Games.start_date.is_not(None)).order_by(Games.start_date, Games.id)
+REGION_TEAMS = select(Team).where(Team.region == bindparam("region"))
+HOST_COUNTRY = (
+    select(Host.place_name, Games.year)
+    .join(Games, Host.games)
+    .join(Country, Host.country_id == Country.id)
+    .where(Country.country_name == bindparam("country"))
+)
+GAMES_HOST_COUNTRY = (
+    select(Games.year, Games.event_type, Host.place_name, Country.country_name)
+    .join(Host, Games.hosts)
+    .join(Country, Host.country_id == Country.id)
+)
+GAMES_SUMMARY = select(GamesSummary).order_by(GamesSummary.year, GamesSummary.event_type)
+DISABILITIES_BY_GAMES = (
+    select(GamesSummary.year, GamesSummary.event_type, GamesSummary.disabilities)
+    .where(GamesSummary.disabilities.is_not(None))
+    .order_by(GamesSummary.year, GamesSummary.event_type)
+)
+TEAMS_YEAR = (
+    select(Team.name)
+    .join(Team, Games.teams)
+    .where(Games.event_type == bindparam("event_type"), Games.year == bindparam("year"))
+)
+GAMES_DISABILITY = (
+    select(Games.year, Games.event_type, Disability.description)
+    .join(Disability, Games.disabilities)
+    .where(Disability.description == bindparam("disability"))
+)
+HOSTS_PAGE = keyset_page(select(Host), [Host.id])
+GAMES_PAGE = keyset_page(select(Games), [Games.year, Games.id])
+GAMES_HOST_COUNTRY_PAGE = keyset_page(
+    select(Games.year, Games.event_type, Host.place_name, Country.country_name,
+           Games.id.label("games_id"), GamesHost.host_id)
+    .join(GamesHost, GamesHost.games_id == Games.id)
+    .join(Host, Host.id == GamesHost.host_id)
+    .join(Country, Host.country_id == Country.id),
+    [Games.year, Games.id, GamesHost.host_id]
+)
+
+# Statements of the read methods that export() can run, with the same parameter names as the methods
+EXPORTS = {
+    "read_hosts": READ_HOSTS,
+    "read_host": READ_HOST,
+    "query_games_year_type": GAMES_YEAR_TYPE,
+    "query_games_type_with_host": GAMES_TYPE_WITH_HOST,
+    "query_disabilities": DISABILITIES,
+    "query_games_after_year": GAMES_AFTER_YEAR,
+    "query_games_between_dates": GAMES_BETWEEN_DATES,
+    "query_games_by_start": GAMES_BY_START,
+    "query_region_teams": REGION_TEAMS,
+    "query_host_country": HOST_COUNTRY,
+    "query_games_host_country": GAMES_HOST_COUNTRY,
+    "query_disabilities_by_games": DISABILITIES_BY_GAMES,
+    "query_games_summary": GAMES_SUMMARY,
+    "query_teams_year": TEAMS_YEAR,
+    "query_games_disability": GAMES_DISABILITY,
+}
+
+
+# Columns that update_where can set, by model
+UPDATABLE_COLUMNS = {
+    Disability: ["description"],
+    Host: ["place_name", "country_id"],
+    Team: ["name", "region", "member_type", "notes", "country_id"],
+}
+# The games_ids_for argument that finds the Games whose games_summary rows list the updated rows
+SUMMARY_GAMES_IDS = {
+    Disability: "disability_ids",
+    Host: "host_ids",
+}
+
+
+@dataclass
+class Page:
+    """ A page of results from keyset pagination
+
+    Attributes:
+        items (list): rows of the page
+        next_after: cursor to pass as after= to get the next page, None if this is the last page
+    """
+    items: list = field(default_factory=list)
+    next_after: Any = None
 
 
 class QueryService:
@@ -53,13 +233,84 @@ class QueryService:
             11. **Update** the disability description 'Les Autres' to 'Other'
     """
 
-    def __init__(self, eng):
-        self.engine = eng
+    def __init__(self, eng=None, profile: str = "default", cache: Optional[ResultCache] = None):
+        """
+        Args:
+            eng: SQLAlchemy engine for the database
+            profile: PRAGMA profile, see para_app.database.PRAGMA_PROFILES, used to create an engine for
+                paralympics.db when eng is None. "read-serving" switches the database file to WAL journaling,
+                which is saved in the file and adds -wal and -shm files next to it, so it is opt-in.
+            cache: cache for the results of the read methods, e.g. ResultCache(max_entries=256, ttl=60). Cached
+                results are shared between calls so should not be changed, other than to pass to update_host.
+                Call invalidate_cache() after the data is changed other than through this service, e.g. reloaded.
+        """
+        self.engine = eng if eng is not None else create_db_engine(profile=profile)
+        self.cache = cache
+        # The session of the unit of work in progress in each thread
+        self._scope = threading.local()
+
+    @contextmanager
+    def unit_of_work(self):
+        """ Runs the QueryService calls in the with block in one session and transaction
+
+        By default each method opens its own session and commits its own writes. Inside unit_of_work() the calls
+        share one session and connection, writes are flushed rather than committed, and the transaction is
+        committed when the block ends or rolled back if it raises. Objects returned in the block stay usable
+        after it, as they are not expired on commit. Nested calls join the unit of work already in progress.
+
+        The cache is not used for reads in the block, as they can see writes that are not yet committed.
+
+            with queries.unit_of_work():
+                host = queries.create_host(place_name="Potters Bar", country_name="Great Britain")
+                queries.delete_host(host.id)
+        """
+        if self.in_unit_of_work:
+            yield self
+            return
+        written = self._scope.written = set()
+        with Session(self.engine, expire_on_commit=False) as session:
+            self._scope.session = session
+            try:
+                yield self
+                session.commit()
+            except BaseException:
+                session.rollback()
+                raise
+            finally:
+                self._scope.session = None
+                if self.cache is not None and written:
+                    self.cache.invalidate(*written)
+
+    @property
+    def in_unit_of_work(self) -> bool:
+        """ True if the current thread is in a unit_of_work() block """
+        return getattr(self._scope, "session", None) is not None
+
+    def _session(self):
+        """ Returns a context giving the unit of work's session, or a new session if there is no unit of work """
+        if self.in_unit_of_work:
+            return nullcontext(self._scope.session)
+        return Session(self.engine)
+
+    def _commit(self, session: Session):
+        """ Commits the session, or flushes it if it belongs to a unit of work that commits at the end """
+        if self.in_unit_of_work:
+            session.flush()
+        else:
+            session.commit()
 
+    def invalidate_cache(self, *models):
+        """ Removes the cached results that read the tables of the models, or all cached results if none are given """
+        tables = [model.__tablename__ for model in models]
+        if self.in_unit_of_work:
+            self._scope.written.update(tables)
+        if self.cache is not None:
+            self.cache.invalidate(*tables)
+
+    @cached(Host)
     def read_hosts(self) -> Sequence[Host]:
-        with Session(self.engine) as session:
-            statement = select(Host).order_by(Host.place_name)
-            hosts = session.exec(statement).all()
+        with self._session() as session:
+            hosts = session.exec(READ_HOSTS).all()
             return hosts
 
     def create_host(self, place_name: str, country_name: str) -> Host:
@@ -68,49 +319,132 @@ class QueryService:
         Country has id, country_name
         UK is listed as 'Great Britain' in the country table
         """
-        with Session(self.engine) as session:
+        with self._session() as session:
             # Find the country_id
-            statement = select(Country.id).where(Country.country_name == country_name)
-            country_id = session.exec(statement).first()
+            country_id = session.exec(COUNTRY_ID, params={"country_name": country_name}).first()
             new_host = Host(place_name=place_name, country_id=country_id)
             session.add(new_host)
-            session.commit()
+            self._commit(session)
             session.refresh(new_host)
-            return new_host
+        self.invalidate_cache(Host)
+        return new_host
 
+    @cached(Host)
     def read_host(self, host_id: int) -> Host:
-        with Session(self.engine) as session:
-            statement = select(Host).where(Host.id == host_id)
-            host = session.exec(statement).first()
+        with self._session() as session:
+            host = session.exec(READ_HOST, params={"host_id": host_id}).first()
             # Alternatives:
-            # host = session.exec(statement).one()  # .one() throws error if more than 1 result
+            # .one() throws error if more than 1 result
+            # host = session.exec(READ_HOST, params={"host_id": host_id}).one()
             # host = session.get(Host, host_id)  # Shortcut for getting a row by its id
             return host
 
     def update_host(self, updated_host: Host) -> Host:
-        with Session(self.engine) as session:
+        with self._session() as session:
             session.add(updated_host)
-            session.commit()
+            session.flush()
+            # The host's place name and country are listed in the games_summary rows of its games
+            refresh_games_summary(session, games_ids_for(session, host_ids=[updated_host.id]))
+            self._commit(session)
             session.refresh(updated_host)
-            return updated_host
+        self.invalidate_cache(Host, GamesSummary)
+        return updated_host
 
     def delete_host(self, host_id: int) -> None:
         """ Find the host that matches the host_id, then delete it """
-        with Session(self.engine) as session:
-            host = session.exec(select(Host).where(Host.id == host_id)).first()
+        with self._session() as session:
+            host = session.exec(READ_HOST, params={"host_id": host_id}).first()
+            games_ids = games_ids_for(session, host_ids=[host_id])
             session.delete(host)
-            session.commit()
+            session.flush()
+            refresh_games_summary(session, games_ids)
+            self._commit(session)
+        self.invalidate_cache(Host, GamesSummary)
+
+    # Batch CRUD
+    # The batch methods take or return many hosts in a few statements: one IN query for the country ids, one
+    # executemany per table for the writes, one commit and one IN query to read the hosts back.
+
+    def create_hosts(self, hosts: Sequence[tuple[str, str]]) -> list[Host]:
+        """ Creates many hosts, as create_host
+
+        Args:
+            hosts: (place_name, country_name) of each host, a country_name not in the database gives no country_id
+
+        Returns:
+            list of the new Host, in the order of hosts
+        """
+        if not hosts:
+            return []
+        with self._session() as session:
+            country_names = sorted({country_name for _, country_name in hosts})
+            country_ids = dict(session.exec(COUNTRY_IDS, params={"country_names": country_names}).all())
+            values = [{"place_name": place_name, "country_id": country_ids.get(country_name)}
+                      for place_name, country_name in hosts]
+            # SQLAlchemy inserts the rows in multi-row INSERT ... RETURNING statements, which do not return the ids in
+            # a set order. SQLite gives the rows of an insert increasing ids, so ordering by id gives the hosts order.
+            host_ids = session.exec(INSERT_HOSTS, params=values).scalars().all()
+            self._commit(session)
+            new_hosts = list(session.exec(HOSTS_BY_IDS, params={"host_ids": host_ids}))
+        self.invalidate_cache(Host)
+        return new_hosts
+
+    def read_hosts_by_ids(self, host_ids: Sequence[int]) -> list[Host]:
+        """ Returns the hosts with the ids, ordered by id, ids that are not in the database are ignored """
+        if not host_ids:
+            return []
+        with self._session() as session:
+            return list(session.exec(HOSTS_BY_IDS, params={"host_ids": list(host_ids)}))
+
+    def update_hosts(self, updated_hosts: Sequence[Host]) -> list[Host]:
+        """ Saves the place_name and country_id of many hosts, as update_host
+
+        Args:
+            updated_hosts: hosts with an id that is in the database
 
+        Returns:
+            list of the updated Host read back from the database, ordered by id
+        """
+        if not updated_hosts:
+            return []
+        values = [{"id": host.id, "place_name": host.place_name, "country_id": host.country_id}
+                  for host in updated_hosts]
+        with self._session() as session:
+            session.exec(UPDATE_HOSTS, params=values)
+            refresh_games_summary(session, games_ids_for(session, host_ids=[host.id for host in updated_hosts]))
+            self._commit(session)
+            # populate_existing replaces the values of hosts the unit of work's session already holds
+            hosts = list(session.exec(HOSTS_BY_IDS, params={"host_ids": [host.id for host in updated_hosts]},
+                                      execution_options={"populate_existing": True}))
+        self.invalidate_cache(Host, GamesSummary)
+        return hosts
+
+    def delete_hosts(self, host_ids: Sequence[int]) -> int:
+        """ Deletes the hosts with the ids and their links to games, as delete_host
+
+        Returns:
+            number of hosts deleted
+        """
+        if not host_ids:
+            return 0
+        params = {"host_ids": list(host_ids)}
+        with self._session() as session:
+            games_ids = games_ids_for(session, host_ids=host_ids)
+            session.exec(DELETE_HOSTS_GAMES_HOST, params=params)
+            deleted = session.exec(DELETE_HOSTS, params=params).rowcount
+            refresh_games_summary(session, games_ids)
+            self._commit(session)
+        self.invalidate_cache(Host, GamesHost, GamesSummary)
+        return deleted
+
+    @cached(Games)
     def query_games_year_type(self) -> Sequence:
         # 1. List all Paralympics (games) with their year and type. Order by year.
-        statement = (
-            select(Games.year, Games.event_type)
-            .order_by(Games.year)
-        )
-        with Session(self.engine) as session:
-            results = session.exec(statement).all()
+        with self._session() as session:
+            results = session.exec(GAMES_YEAR_TYPE).all()
             return results
 
+    @cached(Games, GamesHost, Host)
     def query_games_type_with_host(self, event_type: str) -> Sequence:
         """ 2. List all winter Paralympics (games) with the host city name and year.
             SQL equivalent:
@@ -121,114 +455,313 @@ class QueryService:
                 WHERE games.event_type = ?
                 ORDER BY games.year
         """
-        statement = (
-            select(Host.place_name, Games.year)
-            .join(Host, Games.hosts)  # using Games.hosts relationship
-            .where(Games.event_type == event_type)
-            .order_by(Games.year)
-        )
-        alternative_join_statement = (
-            select(Host.place_name, Games.year)
-            .join(GamesHost, Games.id == GamesHost.games_id)  # using `JOIN ... ON ...`
-            .join(Host, Host.id == GamesHost.host_id)
-            .where(Games.event_type == event_type)
-            .order_by(Games.year)
-        )
-        with Session(self.engine) as session:
-            results = session.exec(statement).all()
+        with self._session() as session:
+            results = session.exec(GAMES_TYPE_WITH_HOST, params={"event_type": event_type}).all()
             return results
 
+    @cached(Disability)
     def query_disabilities(self) -> Sequence:
         # 3. Find all disabilities recorded in the database.
-        statement = select(Disability)
-        with Session(self.engine) as session:
-            results = session.exec(statement).all()
+        with self._session() as session:
+            results = session.exec(DISABILITIES).all()
             return results
 
+    @cached(Games)
     def query_games_after_year(self, year: int) -> Sequence:
         # 4. Get all Paralympics (Games) that took place after the year 2000.
-        statement = select(Games).where(Games.year > 2000).order_by(Games.year)
-        with Session(self.engine) as session:
-            results = session.exec(statement).all()
+        with self._session() as session:
+            results = session.exec(GAMES_AFTER_YEAR, params={"year": year}).all()
+            return results
+
+    @cached(Games)
+    def query_games_between_dates(self, start: Union[str, date], end: Union[str, date]) -> Sequence[Games]:
+        """ Returns the Paralympics (games) that start between two dates, inclusive, ordered by start_date
+
+        Args:
+            start: earliest start date, as a 'dd-mm-YYYY' string like Games.start_date or a date
+            end: latest start date, as a 'dd-mm-YYYY' string like Games.start_date or a date
+        """
+        with self._session() as session:
+            results = session.exec(GAMES_BETWEEN_DATES, params={"start": start, "end": end}).all()
+            return results
+
+    @cached(Games)
+    def query_games_by_start(self) -> Sequence[Games]:
+        """ Returns the Paralympics (games) that have a start_date, ordered by start_date """
+        with self._session() as session:
+            results = session.exec(GAMES_BY_START).all()
             return results
 
+    @cached(Team)
     def query_region_teams(self, region: str) -> Sequence:
         # 5. Find all teams from a specific region (e.g. Oceania).
-        statement = select(Team).where(Team.region == region)
-        with Session(self.engine) as session:
-            results = session.exec(statement).all()
+        with self._session() as session:
+            results = session.exec(REGION_TEAMS, params={"region": region}).all()
             return results
 
+    @cached(Host, GamesHost, Games, Country)
     def query_host_country(self, country: str) -> Sequence:
         # 6. List all hosts located in a specific country (e.g., 'Italy') and the year they held the Paralympics.
-        statement = (
-            select(Host.place_name, Games.year)
-            .join(Games, Host.games)
-            .join(Country, Host.country_id == Country.id)
-            .where(Country.country_name == country)
-        )
-        with Session(self.engine) as session:
-            results = session.exec(statement).all()
+        with self._session() as session:
+            results = session.exec(HOST_COUNTRY, params={"country": country}).all()
             return results
 
+    @cached(Games, GamesHost, Host, Country)
     def query_games_host_country(self) -> Sequence:
         # 7. Show all Paralympics (games) along with their host city and host country.
-        statement = (
-            select(Games.year, Games.event_type, Host.place_name, Country.country_name)
-            .join(Host, Games.hosts)
-            .join(Country, Host.country_id == Country.id)
-        )
-        with Session(self.engine) as session:
-            results = session.exec(statement).all()
+        with self._session() as session:
+            results = session.exec(GAMES_HOST_COUNTRY).all()
             return results
 
+    @cached(GamesSummary)
     def query_disabilities_by_games(self) -> Sequence:
         # 8. List all disabilities associated with each Paralympics (games).
-        statement = (
-            select(
-                Games.year,
-                Games.event_type,
-                func.group_concat(Disability.description, ', ').label("disabilities")
-            )
-            .join(Disability, Games.disabilities)
-            .group_by(Games.year, Games.event_type)
-        )
-        with Session(self.engine) as session:
-            results = session.exec(statement).all()
+        # Read from games_summary, which holds each games' disabilities, rather than joining and grouping
+        with self._session() as session:
+            results = session.exec(DISABILITIES_BY_GAMES).all()
+            return results
+
+    @cached(GamesSummary)
+    def query_games_summary(self) -> Sequence[GamesSummary]:
+        """ Returns every Paralympics (games) with its hosts, host countries, disabilities and number of teams,
+        ordered by year, from the games_summary table """
+        with self._session() as session:
+            results = session.exec(GAMES_SUMMARY).all()
             return results
 
+    @cached(Team, GamesTeam, Games)
     def query_teams_year(self, year: int, event_type: str) -> Sequence:
         # 9. Find all teams that participated in a year and event_type (e.g., winter 2016).
-        statement = (
-            select(Team.name)
-            .join(Team, Games.teams)
-            .where(Games.event_type == event_type and Games.year == year)
-        )
-        with Session(self.engine) as session:
-            results = session.exec(statement).all()
+        with self._session() as session:
+            results = session.exec(TEAMS_YEAR, params={"year": year, "event_type": event_type}).all()
             return results
 
+    @cached(Games, GamesDisability, Disability)
     def query_games_disability(self, disability: str) -> Sequence:
         # 10. Find all the Paralympics that have competitors who are 'Amputees'
+        with self._session() as session:
+            results = session.exec(GAMES_DISABILITY, params={"disability": disability}).all()
+            return results
+
+    @cached(Games, GamesSummary)
+    def search(self, text: str, prefix: bool = False, limit: int = SEARCH_LIMIT) -> Sequence:
+        """ Returns the Paralympics (games) whose highlights or host names contain every word of the text
+
+        Uses the games_search full-text index, see para_app.games_search, so the highlights are not read into Python.
+
+            queries.search("wheelchair basketball")
+            queries.search("innsbr", prefix=True)
+
+        Args:
+            text: words to search for, case and accents are ignored
+            prefix: True to also match words that start with each word of the text
+            limit: maximum number of results
+
+        Returns:
+            Rows of id, year, event_type, hosts and a snippet of the highlights with the matched words in [ ],
+            best match first by bm25 rank. Empty if the text has no words.
+        """
+        query = match_query(text, prefix)
+        if not query:
+            return []
+        with self._session() as session:
+            results = session.exec(SEARCH, params={"query": query, "limit": limit}).all()
+            return results
+
+    def update_where(self, model, values: dict, **where) -> int:
+        """ Sets the values on every row of the model's table that matches where, in one UPDATE statement
+
+        No rows are loaded or refreshed. The primary keys of the updated rows are returned by the UPDATE, so the
+        games_summary and games_search rows of their Games are refreshed in the same transaction, and the cached
+        results that read the table are invalidated.
+
+            queries.update_where(Team, {"region": "Europe"}, region=None, member_type="country")
+
+        Args:
+            model: Disability, Host or Team
+            values: new value of each column to change, column name -> value
+            **where: column name -> value that the rows must have, at least one is required
+
+        Returns:
+            number of rows updated
+
+        Raises:
+            ValueError: if the model or a column of values cannot be updated, a where column is not a column of
+                the model, or where is empty
+        """
+        if model not in UPDATABLE_COLUMNS:
+            raise ValueError(f"{model.__name__} is not in {[m.__name__ for m in UPDATABLE_COLUMNS]}")
+        allowed = UPDATABLE_COLUMNS[model]
+        for name in values:
+            if name not in allowed:
+                raise ValueError(f"{name} is not in {allowed}")
+        columns = list(model.__table__.columns.keys())
+        for name in where:
+            if name not in columns:
+                raise ValueError(f"{name} is not in {columns}")
+        if not values or not where:
+            raise ValueError("values and where must each name at least one column")
+
+        primary_key = model.__table__.primary_key.columns[0]
         statement = (
-            select(Games.year, Games.event_type, Disability.description)
-            .join(Disability, Games.disabilities)
-            .where(Disability.description == disability)
+            update(model)
+            .where(*(getattr(model, name) == value for name, value in where.items()))
+            .values(values)
+            .returning(primary_key)
         )
-        with Session(self.engine) as session:
-            results = session.exec(statement).all()
-            return results
+        with self._session() as session:
+            keys = session.exec(statement).scalars().all()
+            if keys and model in SUMMARY_GAMES_IDS:
+                # games_search lists the host names but not the disabilities
+                refresh_games_summary(session, games_ids_for(session, **{SUMMARY_GAMES_IDS[model]: keys}),
+                                      search=model is Host)
+            self._commit(session)
+        if model in SUMMARY_GAMES_IDS:
+            self.invalidate_cache(model, GamesSummary)
+        else:
+            self.invalidate_cache(model)
+        return len(keys)
 
-    def update_disability(self, disability_description: str) -> Disability:
+    def update_disability(self, description: str, new_description: str) -> int:
         # 11. **Update** all instances of the disability 'Les Autres' to 'Other'
-        with Session(self.engine) as session:
-            # Find the disabiity
-            statement = select("complete this!")
-            disability = session.exec(statement).one()
-            # Make the change to disability.description
-            disability.description = disability_description
-            # Commit
-            session.commit()
-            # Refresh
-            session.refresh(disability)
-            return disability
+        # One UPDATE ... WHERE for all the matching rows, rather than loading, changing and refreshing each one
+        return self.update_where(Disability, {"description": new_description}, description=description)
+
+    def export(self, query: str, output: str = "pandas", **params):
+        """ Returns the results of a read method as columns rather than model instances or Rows
+
+        The method's statement is run with Core on the session's connection, so no model instances are created,
+        and each column is converted to one array, see para_app.columnar. Results are not cached.
+
+            df = queries.export("query_games_type_with_host", event_type="winter")
+            columns = queries.export("query_games_after_year", output="numpy", year=2000)
+
+        Args:
+            query: name of a read method in EXPORTS
+            output: 'pandas' for a DataFrame, 'numpy' for a dict of column name -> array
+            **params: the arguments of the read method, by name
+
+        Returns:
+            pd.DataFrame or dict[str, np.ndarray]
+
+        Raises:
+            ValueError: if the query or output is not supported
+        """
+        if query not in EXPORTS:
+            raise ValueError(f"{query} is not in {list(EXPORTS)}")
+        statement = EXPORTS[query]
+        with self._session() as session:
+            return result_columns(session.connection().execute(statement, params), statement, output)
+
+    def games_metrics(self, *criteria):
+        """ Returns the duration and female:male ratio of every Paralympics (games), or those matching the criteria
+
+        Computed for all the rows at once rather than with the Games methods one instance at a time, see
+        para_app.games_metrics. Rows without a valid value have the Games method's error message instead.
+        Results are not cached.
+
+            df = queries.games_metrics(Games.event_type == "winter")
+
+        Args:
+            *criteria: where clauses on the Games columns, e.g. Games.year >= 2000
+
+        Returns:
+            pd.DataFrame of id, year, event_type, duration, duration_error, fm_ratio and fm_ratio_error
+        """
+        with self._session() as session:
+            return games_metrics(session.connection(), *criteria)
+
+    # Streaming and keyset pagination
+    # The iter_ methods yield the rows as they are fetched, batch_size at a time, rather than returning a list. The
+    # session stays open until the iteration finishes. The page_ methods return a page of rows after a cursor, so
+    # each page is a short query that is as quick for the last page as for the first.
+
+    def _stream(self, statement, batch_size: int) -> Iterator:
+        """ Yields the results of the statement, fetching batch_size rows at a time """
+        with self._session() as session:
+            yield from session.exec(statement, execution_options={"yield_per": batch_size})
+
+    def _page(self, statement, after: tuple, limit: int, cursor) -> Page:
+        """ Returns the page of results of a statement from keyset_page with keys greater than after
+
+        Args:
+            statement: statement returned by keyset_page
+            after: key values of the last row of the previous page
+            limit: maximum rows in the page
+            cursor: returns the key values of a result row
+
+        Raises:
+            ValueError: if limit is less than 1, as the cursor is that of the last row of the page
+        """
+        if limit < 1:
+            raise ValueError(f"limit {limit} must be at least 1")
+        params = {f"after_{i}": value for i, value in enumerate(after)}
+        with self._session() as session:
+            rows = session.exec(statement, params={**params, "limit": limit + 1}).all()
+        if len(rows) > limit:
+            return Page(list(rows[:limit]), cursor(rows[limit - 1]))
+        return Page(list(rows))
+
+    def iter_hosts(self, batch_size: int = STREAM_BATCH_SIZE) -> Iterator[Host]:
+        """ Yields all hosts ordered by place name, as read_hosts """
+        yield from self._stream(READ_HOSTS, batch_size)
+
+    def iter_disabilities(self, batch_size: int = STREAM_BATCH_SIZE) -> Iterator[Disability]:
+        """ Yields all disabilities, as query_disabilities """
+        yield from self._stream(DISABILITIES, batch_size)
+
+    def iter_games_host_country(self, batch_size: int = STREAM_BATCH_SIZE) -> Iterator:
+        """ Yields the year, event type, host and host country of all Paralympics, as query_games_host_country """
+        yield from self._stream(GAMES_HOST_COUNTRY, batch_size)
+
+    @cached(Host)
+    def page_hosts(self, after_id: int = 0, limit: int = PAGE_SIZE) -> Page:
+        """ Returns a page of hosts ordered by id
+
+        Args:
+            after_id: id of the last host of the previous page, 0 for the first page
+            limit: maximum hosts in the page
+
+        Returns:
+            Page of Host whose next_after is the after_id of the next page
+
+        Raises:
+            ValueError: if limit is less than 1
+        """
+        return self._page(HOSTS_PAGE, (after_id,), limit, lambda host: host.id)
+
+    @cached(Games)
+    def page_games(self, after: tuple[int, int] = (FIRST_YEAR_CURSOR, 0), limit: int = PAGE_SIZE) -> Page:
+        """ Returns a page of Paralympics (games) ordered by year and then id
+
+        Args:
+            after: (year, id) of the last games of the previous page, the default is before the first games
+            limit: maximum games in the page
+
+        Returns:
+            Page of Games whose next_after is the (year, id) cursor of the next page
+
+        Raises:
+            ValueError: if limit is less than 1
+        """
+        return self._page(GAMES_PAGE, after, limit, lambda games: (games.year, games.id))
+
+    @cached(Games, GamesHost, Host, Country)
+    def page_games_host_country(self, after: tuple[int, int, int] = (FIRST_YEAR_CURSOR, 0, 0),
+                                limit: int = PAGE_SIZE) -> Page:
+        """ Returns a page of the Paralympics (games) with their host city and host country, ordered by year
+
+        The rows have the year, event_type, place_name and country_name, as query_games_host_country, followed by
+        the games_id and host_id that make up the cursor.
+
+        Args:
+            after: (year, games_id, host_id) of the last row of the previous page, the default is before the first
+            limit: maximum rows in the page
+
+        Returns:
+            Page of rows whose next_after is the (year, games_id, host_id) cursor of the next page
+
+        Raises:
+            ValueError: if limit is less than 1
+        """
+        return self._page(GAMES_HOST_COUNTRY_PAGE, after, limit, lambda row: (row.year, row.games_id, row.host_id))
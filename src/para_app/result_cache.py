@@ -0,0 +1,86 @@
+""" In-process cache of query results
+
+QueryService can keep the results of its read methods in a ResultCache so that repeated calls do not run the SQL
+again. Each entry records the tables its query read, and a write to a table invalidates every entry that read it.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Hashable, Iterable, Optional
+
+
+class ResultCache:
+    """ Least recently used cache of query results with an optional time to live
+
+    Attributes:
+        max_entries (int): number of results kept, the least recently used is removed when it is full
+        ttl (float | None): seconds a result is kept for, or None to keep it until it is invalidated or removed
+        hits (int): number of lookups that found a result
+        misses (int): number of lookups that ran the query
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl: Optional[float] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Args:
+            max_entries: number of results kept
+            ttl: seconds a result is kept for, None for no expiry
+            clock: returns the current time in seconds, replace for testing
+        """
+        if max_entries < 1:
+            raise ValueError("max_entries must be at least 1")
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[Hashable, tuple] = OrderedDict()
+        self._lock = threading.Lock()
+        # Incremented by invalidate, so a result loaded while a write was invalidating is not cached
+        self._generation = 0
+
+    def get_or_load(self, key: Hashable, tables: Iterable[str], load: Callable):
+        """ Returns the cached result for key, or calls load() and caches its result
+
+        Args:
+            key: identifies the query and its arguments
+            tables: names of the tables the query reads
+            load: runs the query and returns its result
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (entry[1] is None or entry[1] > self.clock()):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+            generation = self._generation
+
+        result = load()
+        expires = None if self.ttl is None else self.clock() + self.ttl
+        with self._lock:
+            if generation != self._generation:
+                return result
+            self._entries[key] = (result, expires, frozenset(tables))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return result
+
+    def invalidate(self, *tables: str):
+        """ Removes the results that read any of the tables, or all results if no tables are given """
+        with self._lock:
+            self._generation += 1
+            if not tables:
+                self._entries.clear()
+                return
+            for key in [key for key, entry in self._entries.items() if not entry[2].isdisjoint(tables)]:
+                del self._entries[key]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def info(self) -> dict:
+        """ Returns the hits, misses and number of entries """
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self), "max_entries": self.max_entries,
+                "ttl": self.ttl}
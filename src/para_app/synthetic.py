@@ -0,0 +1,352 @@
+""" Generates synthetic paralympics data at scale, for testing and benchmarking the loaders and QueryService
+
+The shipped workbook has a few dozen Games. SyntheticSize sets how many Games, Teams, Hosts and Disabilities to
+generate and how many link rows each Games has, and the data is generated from a seed, so the same size and seed
+always give the same rows. The data can be written as:
+
+- a workbook with the same sheets and columns as paralympics_all_raw.xlsx, to load with stream_add_data
+- a database, written directly without the loaders, e.g. for QueryService benchmarks with 50M link rows
+
+Rows are generated in chunks of CHUNK_SIZE Games, each from its own random generator seeded with (seed, chunk),
+so memory use does not grow with the number of Games.
+
+All values are valid against the constraints in para_app.models: event_type is 'summer' or 'winter', years are
+from 1960, regions and member types are from the allowed values, host place names are unique and every foreign
+key refers to a generated row.
+"""
+import argparse
+import string
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Iterator
+
+import numpy as np
+from openpyxl import Workbook
+from sqlalchemy import insert
+from sqlmodel import SQLModel
+
+from para_app.database import create_db_engine
+from para_app.games_summary import rebuild_games_summary
+from para_app.models import Country, Disability, Games, GamesDisability, GamesHost, GamesSummary, GamesTeam, Host, Team
+
+# Number of Games generated at a time
+CHUNK_SIZE = 10_000
+
+# Years are kept within the range pandas can hold as datetime64[ns], which the workbook loaders use for dates
+FIRST_YEAR = 1960
+LAST_YEAR = 2260
+
+EVENT_TYPES = ['summer', 'winter']
+REGIONS = ['Asia', 'Europe', 'Africa', 'America', 'Oceania']
+MEMBER_TYPES = ['country', 'team', 'dissolved', 'construct']
+
+# Probability of each member type, most teams are countries as in the shipped workbook
+MEMBER_TYPE_WEIGHTS = [0.9, 0.04, 0.04, 0.02]
+
+# Words used for the highlights text
+WORDS = ['record', 'athletes', 'first', 'games', 'medal', 'world', 'opening', 'ceremony', 'wheelchair', 'relay',
+         'swimming', 'skiing', 'archery', 'village', 'stadium', 'debut', 'team', 'final', 'gold', 'crowd']
+
+GAMES_COLUMNS = ['type', 'year', 'country', 'host', 'start', 'end', 'disabilities_included', 'countries', 'events',
+                 'sports', 'participants_m', 'participants_f', 'participants', 'highlights', 'URL']
+TEAM_COLUMNS = ['Code', 'TeamName', 'Region', 'SubRegion', 'MemberType', 'Notes']
+
+# Seeds of the separate random streams, combined with the seed and chunk number
+_TEAMS_STREAM = 1
+_HOSTS_STREAM = 2
+_GAMES_STREAM = 3
+
+
+@dataclass
+class SyntheticSize:
+    """ Number of rows to generate
+
+    Each Games has exactly hosts_per_games GamesHost, disabilities_per_games GamesDisability and teams_per_games
+    GamesTeam rows, so there are games * (hosts_per_games + disabilities_per_games + teams_per_games) link rows.
+    Hosts are generated in groups of hosts_per_games in the same country and each Games is held at one group.
+
+    A games sheet row names one team, its country, so a workbook has one GamesTeam per Games whatever
+    teams_per_games is. Only the hosts and disabilities used by a Games are in a workbook.
+
+    Attributes:
+        games (int): number of Games
+        teams (int): number of Teams, about 90% are countries and each country has a Country row
+        hosts (int): number of Hosts, at least hosts_per_games
+        disabilities (int): number of Disabilities, at least disabilities_per_games
+        hosts_per_games (int): GamesHost rows per Games
+        disabilities_per_games (int): GamesDisability rows per Games
+        teams_per_games (int): GamesTeam rows per Games, at most teams
+    """
+    games: int = 1000
+    teams: int = 200
+    hosts: int = 500
+    disabilities: int = 10
+    hosts_per_games: int = 1
+    disabilities_per_games: int = 3
+    teams_per_games: int = 1
+
+    def __post_init__(self):
+        for name, value in vars(self).items():
+            if value < 0:
+                raise ValueError(f"{name} must be non-negative")
+        if self.teams < 1:
+            raise ValueError("teams must be at least 1")
+        for name, total in [('hosts_per_games', 'hosts'), ('disabilities_per_games', 'disabilities'),
+                            ('teams_per_games', 'teams')]:
+            if getattr(self, name) > getattr(self, total):
+                raise ValueError(f"{name} must not be more than {total}")
+        if self.hosts_per_games < 1 and self.hosts > 0:
+            raise ValueError("hosts_per_games must be at least 1 when there are hosts")
+
+    @property
+    def link_rows(self) -> int:
+        """ Number of GamesHost, GamesDisability and GamesTeam rows in a generated database """
+        return self.games * (self.hosts_per_games + self.disabilities_per_games + self.teams_per_games)
+
+
+class _Teams:
+    """ The generated teams and the countries and host groups that the Games refer to """
+
+    def __init__(self, size: SyntheticSize, seed: int):
+        rng = np.random.default_rng([seed, _TEAMS_STREAM])
+        n = size.teams
+        width = max(3, _letters_needed(n))
+        self.codes = [_team_code(i, width) for i in range(n)]
+        self.names = [f"Team {i + 1}" for i in range(n)]
+        self.regions = [REGIONS[i] for i in rng.integers(0, len(REGIONS), n)]
+        self.member_types = [MEMBER_TYPES[i] for i in rng.choice(len(MEMBER_TYPES), n, p=MEMBER_TYPE_WEIGHTS)]
+        self.member_types[0] = 'country'  # Games need at least one country
+
+        # Country ids in team order, as the loaders allocate them
+        self.country_ids = [None] * n
+        country_teams = []
+        for i, member_type in enumerate(self.member_types):
+            if member_type == 'country':
+                country_teams.append(i)
+                self.country_ids[i] = len(country_teams)
+        self.country_teams = np.array(country_teams)
+
+        # Each group of hosts_per_games hosts is in the country of one team
+        rng = np.random.default_rng([seed, _HOSTS_STREAM])
+        self.host_groups = size.hosts // size.hosts_per_games if size.hosts_per_games else 0
+        self.group_teams = self.country_teams[rng.integers(0, len(country_teams), max(self.host_groups, 1))]
+
+    def host_team(self, host_index: int, size: SyntheticSize) -> int:
+        """ Returns the index of the team whose country a host is in """
+        return int(self.group_teams[(host_index // size.hosts_per_games) % len(self.group_teams)])
+
+    def team_rows(self) -> Iterator[dict]:
+        """ Yields the rows of the team_codes sheet """
+        for code, name, region, member_type in zip(self.codes, self.names, self.regions, self.member_types):
+            yield {'Code': code, 'TeamName': name, 'Region': region, 'SubRegion': None, 'MemberType': member_type,
+                   'Notes': None}
+
+
+def _letters_needed(n: int) -> int:
+    """ Returns the number of letters needed for n distinct codes """
+    width = 1
+    while 26 ** width < n:
+        width += 1
+    return width
+
+
+def _team_code(i: int, width: int) -> str:
+    """ Returns the i-th uppercase code of the given width, e.g. AAA, AAB... """
+    letters = []
+    for _ in range(width):
+        i, remainder = divmod(i, 26)
+        letters.append(string.ascii_uppercase[remainder])
+    return ''.join(reversed(letters))
+
+
+def _host_name(i: int) -> str:
+    return f"Host {i + 1}"
+
+
+def _disability_name(i: int) -> str:
+    return f"Disability {i + 1}"
+
+
+def _games_chunks(size: SyntheticSize, seed: int, teams: _Teams) -> Iterator[dict]:
+    """ Yields the generated Games values in chunks of CHUNK_SIZE as dicts of column arrays
+
+    The host, disability and team columns hold indexes into the generated hosts, disabilities and teams.
+    """
+    for chunk, first in enumerate(range(0, size.games, CHUNK_SIZE)):
+        n = min(CHUNK_SIZE, size.games - first)
+        rng = np.random.default_rng([seed, _GAMES_STREAM, chunk])
+        year = rng.integers(FIRST_YEAR, LAST_YEAR + 1, n)
+        participants_m = rng.integers(50, 5000, n)
+        participants_f = rng.integers(50, 5000, n)
+
+        if teams.host_groups:
+            groups = rng.integers(0, teams.host_groups, n)
+            country_team = teams.group_teams[groups]
+            hosts = groups[:, None] * size.hosts_per_games + np.arange(size.hosts_per_games)
+        else:
+            country_team = teams.country_teams[rng.integers(0, len(teams.country_teams), n)]
+            hosts = np.empty((n, 0), dtype=int)
+        # Consecutive disabilities and teams from a random start, so the values in a Games are distinct
+        disabilities = ((rng.integers(0, max(size.disabilities, 1), n)[:, None] +
+                         np.arange(size.disabilities_per_games)) % max(size.disabilities, 1))
+        team_indexes = (country_team[:, None] + np.arange(size.teams_per_games)) % size.teams
+
+        yield {
+            'id': np.arange(first + 1, first + n + 1),
+            'event_type': np.array(EVENT_TYPES)[rng.integers(0, 2, n)],
+            'year': year,
+            'start_day': rng.integers(0, 350, n),
+            'length': rng.integers(7, 15, n),
+            'countries': rng.integers(1, size.teams + 1, n),
+            'events': rng.integers(10, 600, n),
+            'sports': rng.integers(1, 30, n),
+            'participants_m': participants_m,
+            'participants_f': participants_f,
+            'highlights': rng.integers(0, len(WORDS), (n, 8)),
+            'country_team': country_team,
+            'hosts': hosts,
+            'disabilities': disabilities,
+            'teams': team_indexes,
+        }
+
+
+def _start_end(year: int, start_day: int, length: int) -> tuple[date, date]:
+    start = date(int(year), 1, 1) + timedelta(days=int(start_day))
+    return start, start + timedelta(days=int(length))
+
+
+def _games_rows(chunk: dict, teams: _Teams) -> Iterator[dict]:
+    """ Yields the rows of the games sheet for a chunk """
+    for i in range(len(chunk['id'])):
+        start, end = _start_end(chunk['year'][i], chunk['start_day'][i], chunk['length'][i])
+        yield {
+            'type': str(chunk['event_type'][i]).capitalize(),
+            'year': int(chunk['year'][i]),
+            'country': teams.names[chunk['country_team'][i]],
+            'host': ', '.join(_host_name(h) for h in chunk['hosts'][i]) or None,
+            'start': start,
+            'end': end,
+            'disabilities_included': ', '.join(_disability_name(d) for d in chunk['disabilities'][i]) or None,
+            'countries': int(chunk['countries'][i]),
+            'events': int(chunk['events'][i]),
+            'sports': int(chunk['sports'][i]),
+            'participants_m': int(chunk['participants_m'][i]),
+            'participants_f': int(chunk['participants_f'][i]),
+            'participants': int(chunk['participants_m'][i] + chunk['participants_f'][i]),
+            'highlights': ' '.join(WORDS[w] for w in chunk['highlights'][i]).capitalize(),
+            'URL': f"https://example.org/games/{chunk['id'][i]}",
+        }
+
+
+def write_workbook(path, size: SyntheticSize, seed: int = 0):
+    """ Writes a workbook with games and team_codes sheets in the format of paralympics_all_raw.xlsx
+
+    The workbook is written in openpyxl's write-only mode, so rows are not held in memory. Load it with
+    stream_add_data(engine, data_file=path).
+
+    Args:
+        path: path of the .xlsx file to write
+        size: number of rows to generate
+        seed: seed of the random values
+    """
+    teams = _Teams(size, seed)
+    wb = Workbook(write_only=True)
+    games_sheet = wb.create_sheet("games")
+    games_sheet.append(GAMES_COLUMNS)
+    for chunk in _games_chunks(size, seed, teams):
+        for row in _games_rows(chunk, teams):
+            games_sheet.append([row[column] for column in GAMES_COLUMNS])
+    teams_sheet = wb.create_sheet("team_codes")
+    teams_sheet.append(TEAM_COLUMNS)
+    for row in teams.team_rows():
+        teams_sheet.append([row[column] for column in TEAM_COLUMNS])
+    wb.save(path)
+
+
+def write_database(engine, size: SyntheticSize, seed: int = 0) -> dict[str, int]:
+    """ Writes the generated rows to an empty database in a single transaction
+
+    The rows are inserted directly rather than through the loaders, a chunk of Games and their link rows at a
+    time, and games_summary is then built from them. No source fingerprints are written, so refresh_data would
+    reload such a database in full. For large sizes, use an engine from create_db_engine(url, profile="bulk-load").
+
+    Args:
+        engine: SQLAlchemy engine for a database with empty tables
+        size: number of rows to generate
+        seed: seed of the random values
+
+    Returns:
+        dict of the number of rows written to each table
+    """
+    teams = _Teams(size, seed)
+    counts = {model.__tablename__: 0 for model in (Disability, Country, Team, Host, Games, GamesTeam,
+                                                   GamesDisability, GamesHost)}
+
+    def write(conn, model, rows: list[dict]):
+        if rows:
+            conn.execute(insert(model), rows)
+            counts[model.__tablename__] += len(rows)
+
+    with engine.begin() as conn:
+        write(conn, Disability, [{'id': i + 1, 'description': _disability_name(i)} for i in range(size.disabilities)])
+        write(conn, Country, [{'id': country_id, 'country_name': teams.names[i]}
+                              for i, country_id in enumerate(teams.country_ids) if country_id is not None])
+        write(conn, Team, [{'code': row['Code'], 'name': row['TeamName'], 'region': row['Region'],
+                            'member_type': row['MemberType'], 'notes': None, 'country_id': country_id}
+                           for row, country_id in zip(teams.team_rows(), teams.country_ids)])
+        write(conn, Host, [{'id': i + 1, 'place_name': _host_name(i),
+                            'country_id': teams.country_ids[teams.host_team(i, size)]} for i in range(size.hosts)])
+
+        link_id = {model: 1 for model in (GamesTeam, GamesDisability, GamesHost)}
+        for chunk in _games_chunks(size, seed, teams):
+            games_rows = []
+            for row, games_id in zip(_games_rows(chunk, teams), chunk['id'].tolist()):
+                games_rows.append({
+                    'id': games_id, 'event_type': row['type'].lower(), 'year': row['year'],
+                    'start_date': row['start'], 'end_date': row['end'],
+                    'countries': row['countries'], 'events': row['events'], 'sports': row['sports'],
+                    'participants_m': row['participants_m'], 'participants_f': row['participants_f'],
+                    'participants': row['participants'], 'highlights': row['highlights'], 'url': row['URL'],
+                })
+            write(conn, Games, games_rows)
+
+            for model, column, values in [(GamesTeam, 'team_id', [[teams.codes[t] for t in row]
+                                                                  for row in chunk['teams'].tolist()]),
+                                          (GamesDisability, 'disability_id', (chunk['disabilities'] + 1).tolist()),
+                                          (GamesHost, 'host_id', (chunk['hosts'] + 1).tolist())]:
+                rows = []
+                for games_id, row_values in zip(chunk['id'].tolist(), values):
+                    for value in row_values:
+                        rows.append({'id': link_id[model], 'games_id': games_id, column: value})
+                        link_id[model] += 1
+                write(conn, model, rows)
+        counts[GamesSummary.__tablename__] = rebuild_games_summary(conn)
+    return counts
+
+
+def main(argv=None):
+    """ Writes a synthetic workbook and/or database from the command line
+
+    e.g. python -m para_app.synthetic --games 1000000 --disabilities-per-games 47 --db synthetic.db
+    """
+    parser = argparse.ArgumentParser(description=main.__doc__.splitlines()[0])
+    for name, default in vars(SyntheticSize()).items():
+        parser.add_argument(f"--{name.replace('_', '-')}", type=int, default=default)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--xlsx", help="path of the workbook to write")
+    parser.add_argument("--db", help="path of the SQLite database to write, must not exist")
+    args = vars(parser.parse_args(argv))
+    seed, xlsx, db = args.pop("seed"), args.pop("xlsx"), args.pop("db")
+    size = SyntheticSize(**args)
+
+    if xlsx:
+        write_workbook(xlsx, size, seed)
+    if db:
+        db_engine = create_db_engine(f"sqlite:///{db}", profile="bulk-load")
+        SQLModel.metadata.create_all(db_engine)
+        print(write_database(db_engine, size, seed))
+        db_engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
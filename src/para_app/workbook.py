@@ -0,0 +1,167 @@
+""" Reads sheets from the paralympics .xlsx workbook
+
+Parsing .xlsx with openpyxl is the slowest part of loading the database, so the parsed sheets are cached in a
+file per sheet next to the workbook, e.g. paralympics_all_raw.xlsx.games.cache
+
+The cache is a pickle of the DataFrames, which pandas stores as column blocks, so it loads in milliseconds and
+keeps the dtypes exactly as parsed. It is used while the workbook's modification time and size are unchanged. If
+those change, the SHA-256 hash of the workbook is compared with the hash saved in the cache, so a workbook that
+has only been touched or copied is not parsed again.
+
+For workbooks too large to hold as DataFrames, iter_sheet_batches streams a sheet as batches of rows instead.
+"""
+import hashlib
+import math
+import os
+import pickle
+from datetime import date
+from pathlib import Path
+from typing import Callable, Iterator, Optional
+
+import pandas as pd
+from openpyxl import load_workbook
+
+CACHE_SUFFIX = ".cache"
+
+
+def file_sha256(path) -> str:
+    """ Returns the SHA-256 hex digest of a file's contents """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def cache_path(path, sheet_name: str) -> Path:
+    """ Returns the path of the cache file for a sheet of a workbook """
+    path = Path(path)
+    return path.with_name(f"{path.name}.{sheet_name}{CACHE_SUFFIX}")
+
+
+def read_sheets(path, sheet_names: list[str], use_cache: bool = True) -> dict[str, pd.DataFrame]:
+    """ Reads sheets from a workbook, using the cached parsed sheets when the workbook is unchanged
+
+    Each sheet is cached in its own file so that sheets can be read, e.g. by separate processes, independently.
+
+    Args:
+        path: path to the .xlsx file
+        sheet_names: names of the sheets to read
+        use_cache: if False, always parse the workbook and do not read or write the cache
+
+    Returns:
+        dict of sheet name to DataFrame, read with keep_default_na=True
+    """
+    path = Path(path)
+    if not use_cache:
+        return _parse(path, sheet_names)
+
+    stat = path.stat()
+    sha256 = None
+    sheets = {}
+    for name in sheet_names:
+        cached = _load_cache(cache_path(path, name))
+        if cached is None:
+            continue
+        if cached["mtime_ns"] == stat.st_mtime_ns and cached["size"] == stat.st_size:
+            sheets[name] = cached["sheet"]
+            continue
+        sha256 = sha256 or file_sha256(path)
+        if cached["sha256"] == sha256:
+            _save_cache(path, name, sha256, stat, cached["sheet"])
+            sheets[name] = cached["sheet"]
+
+    missing = [name for name in sheet_names if name not in sheets]
+    if missing:
+        sha256 = sha256 or file_sha256(path)
+        for name, sheet in _parse(path, missing).items():
+            _save_cache(path, name, sha256, stat, sheet)
+            sheets[name] = sheet
+    return {name: sheets[name] for name in sheet_names}
+
+
+def _parse(path: Path, sheet_names: list[str]) -> dict[str, pd.DataFrame]:
+    """ Parses the sheets with one pass over the workbook """
+    return pd.read_excel(path, sheet_name=list(sheet_names), keep_default_na=True)
+
+
+def _load_cache(cache_file: Path):
+    """ Returns the cache contents, or None if there is no usable cache """
+    try:
+        with open(cache_file, "rb") as f:
+            return pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+        return None
+
+
+def _save_cache(path: Path, sheet_name: str, sha256: str, stat: os.stat_result, sheet: pd.DataFrame):
+    """ Writes the cache atomically; the cache is skipped if the directory is not writable """
+    cache_file = cache_path(path, sheet_name)
+    tmp_file = cache_file.with_name(f"{cache_file.name}.{os.getpid()}.tmp")
+    contents = {"sha256": sha256, "mtime_ns": stat.st_mtime_ns, "size": stat.st_size, "sheet": sheet}
+    try:
+        with open(tmp_file, "wb") as f:
+            pickle.dump(contents, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_file, cache_file)
+    except OSError:
+        tmp_file.unlink(missing_ok=True)
+
+
+def iter_sheet_batches(path, sheet_name: str, batch_size: int,
+                       converters: Optional[dict[str, Callable]] = None) -> Iterator[list[dict]]:
+    """ Yields the rows of a sheet as lists of at most batch_size dicts
+
+    The workbook is read in openpyxl's read-only mode, which parses rows as they are iterated, so only the current
+    batch is held in memory. The first row gives the column names. Empty cells are None and blank rows are skipped.
+
+    Args:
+        path: path to the .xlsx file
+        sheet_name: name of the sheet to read
+        batch_size: maximum number of rows per batch
+        converters: functions applied to the values of the named columns, e.g. {'year': to_int}
+    """
+    converters = converters or {}
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = wb[sheet_name].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = [f"Unnamed: {i}" if name is None else str(name) for i, name in enumerate(header)]
+        column_converters = [converters.get(column) for column in columns]
+        batch = []
+        for values in rows:
+            values = [None if value == '' else value for value in values]
+            if all(value is None for value in values):
+                continue
+            batch.append({
+                column: convert(value) if convert else value
+                for column, convert, value in zip(columns, column_converters, values)
+            })
+            if len(batch) == batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+    finally:
+        wb.close()
+
+
+def to_int(value) -> Optional[int]:
+    """ Converts a cell value to an int, or None if it is not a number, as pd.to_numeric(errors='coerce') """
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return int(number) if math.isfinite(number) else None
+
+
+def to_date_string(value, date_format: str = '%d-%m-%Y') -> Optional[str]:
+    """ Formats a date cell value as a string, or None if it is not a date, as pd.to_datetime(errors='coerce') """
+    if value is None:
+        return None
+    if not isinstance(value, date):
+        value = pd.to_datetime(value, errors='coerce')
+        if pd.isna(value):
+            return None
+    return value.strftime(date_format)
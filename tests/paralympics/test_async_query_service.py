@@ -0,0 +1,114 @@
+""" Tests for the async_query_service.py module in src/para_app
+
+The async engine needs a database file, so the data is loaded into a file in a temporary directory. pytest does
+not run coroutines itself, so each test runs its coroutine with asyncio.run.
+
+Tests included:
+
+    - The async methods return the same results as the QueryService methods
+    - Concurrent requests each get the full result
+    - A unit of work commits at the end, or rolls back if the block raises
+    - The concurrency benchmark times each mode
+
+"""
+import asyncio
+
+import pytest
+from sqlmodel import SQLModel
+
+from para_app.async_query_service import AsyncQueryService, create_async_db_engine
+from para_app.benchmarks import concurrency_benchmark
+from para_app.database import add_data, create_db_engine
+from para_app.query_service import QueryService
+
+
+@pytest.fixture(scope="function")
+def db_path(tmp_path):
+    """ Yields the path of a database file with the tables and data """
+    path = tmp_path / "paralympics.db"
+    engine = create_db_engine(f"sqlite:///{path}")
+    SQLModel.metadata.create_all(engine)
+    add_data(engine, bulk=True)
+    engine.dispose()
+    yield path
+
+
+def run_async(db_path, test):
+    """ Runs test(queries) with an AsyncQueryService for the database and returns its result """
+
+    async def main():
+        queries = AsyncQueryService(create_async_db_engine(f"sqlite+aiosqlite:///{db_path}"))
+        try:
+            return await test(queries)
+        finally:
+            await queries.dispose()
+
+    return asyncio.run(main())
+
+
+def test_async_matches_sync(db_path):
+    """
+    Given a database with data
+    When read methods of the async and the sync query services are called
+    Then they should return the same results
+    """
+    sync_queries = QueryService(create_db_engine(f"sqlite:///{db_path}"))
+
+    async def test(queries):
+        assert await queries.read_hosts() == sync_queries.read_hosts()
+        assert await queries.query_games_type_with_host("winter") == sync_queries.query_games_type_with_host("winter")
+        assert await queries.query_games_disability("Amputee") == sync_queries.query_games_disability("Amputee")
+        assert (await queries.page_games(limit=5)) == sync_queries.page_games(limit=5)
+        assert [row async for row in queries.iter_games_host_country(batch_size=4)] == list(
+            sync_queries.query_games_host_country())
+
+    run_async(db_path, test)
+
+
+def test_async_concurrent_requests(db_path):
+    """
+    Given a database with data
+    When 20 query_host_country requests are awaited together
+    Then each should return the hosts in Italy
+    """
+
+    async def test(queries):
+        results = await asyncio.gather(*(queries.query_host_country("Italy") for _ in range(20)))
+        assert len(results) == 20
+        assert all(result == results[0] and "Rome" in str(result) for result in results)
+
+    run_async(db_path, test)
+
+
+def test_async_unit_of_work(db_path):
+    """
+    Given a database with data
+    When a host is created in a unit of work that ends and another in a unit of work that raises
+    Then only the first host should be in the database
+    """
+
+    async def test(queries):
+        async with queries.unit_of_work():
+            await queries.create_host(place_name="Cape Town", country_name="South Africa")
+        with pytest.raises(RuntimeError):
+            async with queries.unit_of_work():
+                await queries.create_host(place_name="Durban", country_name="South Africa")
+                raise RuntimeError("abandon the unit of work")
+        hosts = str(await queries.read_hosts())
+        assert "Cape Town" in hosts
+        assert "Durban" not in hosts
+
+    run_async(db_path, test)
+
+
+def test_concurrency_benchmark(db_path):
+    """
+    Given a database with data
+    When the concurrency benchmark is run with a few requests
+    Then there should be a time for each mode and the event loop lag for the event loop modes
+    """
+    results = concurrency_benchmark(db_path, requests=10, concurrency=2, method="query_region_teams",
+                                    args=("Europe",))
+    assert set(results) == {"sync", "threads", "sync in event loop", "async"}
+    assert all(result["seconds"] > 0 for result in results.values())
+    assert "max_loop_lag_ms" in results["async"]
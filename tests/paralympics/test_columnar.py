@@ -0,0 +1,94 @@
+""" Tests for the columnar.py module in src/para_app and QueryService.export
+
+Tests included:
+
+    - export returns the same values as the read method, as a DataFrame or NumPy arrays
+    - Integer columns with NULLs are nullable in pandas and NaN in NumPy
+    - An unknown query or output raises a ValueError
+
+"""
+import numpy as np
+import pandas as pd
+import pytest
+from sqlmodel import Session
+
+from para_app.models import Games
+from para_app.query_service import QueryService
+
+
+def test_export_matches_read_method(engine_fixture, db_with_data):
+    """
+    Given a query service
+    When query_games_type_with_host is exported as a DataFrame and as NumPy arrays
+    Then both should have the same columns and values as the rows the method returns
+    """
+    qs = QueryService(engine_fixture)
+    rows = qs.query_games_type_with_host("winter")
+    df = qs.export("query_games_type_with_host", event_type="winter")
+    columns = qs.export("query_games_type_with_host", output="numpy", event_type="winter")
+
+    assert list(df.columns) == ["place_name", "year"] == list(columns)
+    assert list(df.itertuples(index=False, name=None)) == [tuple(row) for row in rows]
+    assert df["year"].dtype == np.int64
+    assert columns["year"].dtype == np.int64
+    assert columns["year"].tolist() == [row.year for row in rows]
+    assert columns["place_name"].tolist() == [row.place_name for row in rows]
+
+
+def test_export_model_columns(engine_fixture, db_with_data):
+    """
+    Given a query service
+    When query_games_after_year, which selects Games, is exported
+    Then there should be a column for each Games field with a row for each Games the method returns
+    """
+    qs = QueryService(engine_fixture)
+    games = qs.query_games_after_year(2000)
+    df = qs.export("query_games_after_year", year=2000)
+    assert list(df.columns) == list(Games.model_fields)
+    assert df["id"].tolist() == [g.id for g in games]
+    assert [None if pd.isna(value) else value for value in df["participants"]] == [g.participants for g in games]
+
+
+def test_export_nullable_integers(engine_fixture, db_with_data):
+    """
+    Given Games where some have no number of participants
+    When the Games are exported
+    Then participants should be Int64 with <NA> in pandas, and float64 with NaN in NumPy, for those Games
+    """
+    with Session(engine_fixture) as session:
+        games = session.get(Games, 1)
+        games.participants = None
+        session.add(games)
+        session.commit()
+    qs = QueryService(engine_fixture)
+    missing = sum(1 for games in qs.query_games_after_year(1959) if games.participants is None)
+    df = qs.export("query_games_after_year", year=1959)
+    columns = qs.export("query_games_after_year", output="numpy", year=1959)
+    assert missing >= 1
+    assert str(df["participants"].dtype) == "Int64"
+    assert df["participants"].isna().sum() == missing
+    assert columns["participants"].dtype == np.float64
+    assert np.isnan(columns["participants"]).sum() == missing
+
+
+@pytest.mark.parametrize("query, output", [("drop_data", "pandas"), ("read_hosts", "csv")])
+def test_export_invalid(engine_fixture, query, output):
+    """
+    Given a query service
+    When export is called with a query that is not a read method in EXPORTS, or an unknown output
+    Then a ValueError should be raised
+    """
+    with pytest.raises(ValueError):
+        QueryService(engine_fixture).export(query, output=output)
+
+
+def test_export_empty(engine_fixture):
+    """
+    Given an empty database
+    When read_hosts is exported
+    Then the DataFrame should have the Host columns and no rows
+    """
+    df = QueryService(engine_fixture).export("read_hosts")
+    assert isinstance(df, pd.DataFrame)
+    assert list(df.columns) == ["id", "place_name", "country_id"]
+    assert len(df) == 0
@@ -0,0 +1,300 @@
+""" Tests for the database.py module in src/para_app
+
+The engine_fixture provides an empty in-memory database with the tables created.
+
+Tests included:
+
+    - Bulk load produces the same table contents as the default row by row load
+    - Default load resolves foreign keys without a select per row
+    - Streamed load produces the same table contents as the bulk load
+    - Preparing the sheets in parallel gives the same data as preparing them one after the other
+    - Rebuilding swaps in a complete database while open connections keep reading the old one
+    - Engines apply the PRAGMAs of their profile to each connection
+    - An unknown PRAGMA profile raises a ValueError
+    - Refresh with an unchanged workbook changes nothing
+    - Refresh after games and teams are added, changed and removed matches a full load of the new data
+    - Refresh with only the games sheet given reads the team_codes sheet and keeps the given games
+    - A full reload by refresh that fails leaves the data as it was
+    - add_data reports the rows, statements and commits of each phase
+    - drop_data reports the rows deleted from each table
+    - migrate_games_dates converts dd-mm-YYYY dates to ISO and leaves invalid dates as they are
+
+"""
+import json
+import sqlite3
+
+import pandas as pd
+import pytest
+from sqlalchemy import StaticPool, event, text
+from sqlmodel import SQLModel, create_engine, delete, select
+
+from para_app import database
+from para_app.database import (add_data, bulk_add_data, create_db_engine, drop_data, migrate_games_dates, prepare_data,
+                               read_data, rebuild_database, refresh_data)
+from para_app.games_search import GAMES_SEARCH
+from para_app.models import Country, Disability, Games, GamesSummary, Host, SourceFingerprint, Team
+
+
+def new_engine(profile: str = "default"):
+    """ Creates a second empty in-memory database with the tables """
+    engine = create_db_engine("sqlite:///:memory:", profile=profile, connect_args={"check_same_thread": False},
+                              poolclass=StaticPool)
+    SQLModel.metadata.create_all(engine)
+    return engine
+
+
+def table_rows(engine) -> dict:
+    """ Returns all rows of every table in the database, including games_search, keyed by table name """
+    with engine.connect() as conn:
+        rows = {name: conn.execute(select(table)).all() for name, table in SQLModel.metadata.tables.items()}
+        search = GAMES_SEARCH.c
+        rows["games_search"] = conn.execute(
+            select(search.rowid, search.highlights, search.hosts).order_by(search.rowid)).all()
+        return rows
+
+
+def test_bulk_add_data_matches_add_data(engine_fixture):
+    """
+    Given two empty databases
+    When add_data is called on one and add_data with bulk=True and a small batch_size on the other
+    Then every table should contain the same rows in both databases
+    """
+    bulk_engine = new_engine()
+    add_data(engine_fixture)
+    add_data(bulk_engine, bulk=True, batch_size=7)
+    expected = table_rows(engine_fixture)
+    assert len(expected["games"]) > 30
+    assert table_rows(bulk_engine) == expected
+
+
+def test_add_data_resolves_foreign_keys_without_selects(engine_fixture):
+    """
+    Given an empty database
+    When add_data is called
+    Then only the selects that build the identity maps should be issued, not one per row
+    """
+    statements = []
+    event.listen(engine_fixture, "before_cursor_execute",
+                 lambda conn, cursor, statement, *args: statements.append(statement))
+    add_data(engine_fixture)
+    selects = [s for s in statements if s.lstrip().upper().startswith("SELECT")]
+    assert len(selects) <= 4
+
+
+def test_stream_add_data_matches_bulk_add_data(engine_fixture):
+    """
+    Given two empty databases
+    When add_data is called with bulk=True on one and with stream=True and a small batch_size on the other
+    Then every table, including the source fingerprints, should contain the same rows in both databases
+    """
+    stream_engine = new_engine()
+    add_data(engine_fixture, bulk=True)
+    add_data(stream_engine, stream=True, batch_size=4)
+    assert table_rows(stream_engine) == table_rows(engine_fixture)
+
+
+def test_prepare_data_parallel():
+    """
+    Given the workbook
+    When prepare_data is called with parallel=True
+    Then the games, teams and disabilities should be the same as from prepare_data without parallel
+    """
+    df_games, df_teams, disabilities = prepare_data()
+    parallel_games, parallel_teams, parallel_disabilities = prepare_data(parallel=True)
+    pd.testing.assert_frame_equal(parallel_games, df_games)
+    pd.testing.assert_frame_equal(parallel_teams, df_teams)
+    assert parallel_disabilities == disabilities
+
+
+def test_rebuild_database(engine_fixture, tmp_path):
+    """
+    Given a database file with empty tables and an open connection to it
+    When rebuild_database is called for the file
+    Then new connections should see all the data, the open connection should still see the old empty tables,
+        and no temporary files should be left
+    """
+    db_path = tmp_path / "paralympics.db"
+    SQLModel.metadata.create_all(create_engine(f"sqlite:///{db_path}"))
+    old_conn = sqlite3.connect(db_path)
+
+    rebuild_database(db_path)
+
+    add_data(engine_fixture, bulk=True)
+    assert table_rows(create_engine(f"sqlite:///{db_path}")) == table_rows(engine_fixture)
+    assert old_conn.execute("SELECT COUNT(*) FROM games").fetchone() == (0,)
+    old_conn.close()
+    assert [p.name for p in tmp_path.iterdir()] == ["paralympics.db"]
+
+
+def natural_rows(engine) -> dict:
+    """ Returns the rows of the database using names rather than ids, so databases with different ids compare """
+    with engine.connect() as conn:
+        return {
+            "games": sorted(conn.execute(select(Games.event_type, Games.year, Games.start_date, Games.highlights))
+                            .all()),
+            "teams": sorted(conn.execute(select(Team.code, Team.name, Team.region, Country.country_name)
+                                         .outerjoin(Country, Team.country_id == Country.id)).all()),
+            "hosts": sorted(conn.execute(select(Games.year, Games.event_type, Host.place_name, Country.country_name)
+                                         .join(Host, Games.hosts).outerjoin(Country, Host.country_id == Country.id))
+                            .all(), key=str),
+            "disabilities": sorted(conn.execute(select(Games.year, Games.event_type, Disability.description)
+                                                .join(Disability, Games.disabilities)).all()),
+            "games_teams": sorted(conn.execute(select(Games.year, Games.event_type, Team.code)
+                                               .join(Team, Games.teams)).all()),
+            "unused": conn.execute(select(Host.place_name).where(~Host.games.any())).all(),
+            "summary": sorted(conn.execute(select(GamesSummary.year, GamesSummary.event_type, GamesSummary.hosts,
+                                                  GamesSummary.countries, GamesSummary.disabilities,
+                                                  GamesSummary.teams)).all(), key=str),
+            "search": sorted(conn.execute(select(Games.year, Games.event_type, GAMES_SEARCH.c.highlights,
+                                                 GAMES_SEARCH.c.hosts)
+                                          .join(GAMES_SEARCH, GAMES_SEARCH.c.rowid == Games.id)).all(), key=str),
+        }
+
+
+def test_refresh_data_unchanged(engine_fixture):
+    """
+    Given a database loaded from the workbook
+    When refresh_data is called with the same workbook
+    Then no rows should be inserted, updated or deleted
+    """
+    add_data(engine_fixture, bulk=True)
+    before = table_rows(engine_fixture)
+    counts = refresh_data(engine_fixture)
+    assert counts == {sheet: {"inserted": 0, "updated": 0, "deleted": 0} for sheet in ("games", "team_codes")}
+    assert table_rows(engine_fixture) == before
+
+
+def test_refresh_data_changes_match_full_load():
+    """
+    Given a database that enforces foreign keys loaded from the workbook
+    When a games row is appended, one changed and one removed, a team is added, one renamed and one removed,
+        and refresh_data is called
+    Then the counts of changed rows should be returned and the data, summary and search rows should match a full
+        load of the changed sheets, with only the summary rows of the changed Games written
+    """
+    engine = new_engine(profile="read-serving")
+    add_data(engine)
+    df_games, df_teams = read_data()
+    new_games = df_games.iloc[[0]].copy()
+    new_games[["year", "host", "country", "disabilities_included"]] = [2036, "Nuuk", "Greenland", "Amputee, Other"]
+    df_games.loc[df_games["year"] == 2012, "host"] = "London, Greenwich"
+    df_games = df_games[df_games["year"] != 1968]
+    df_games = pd.concat([df_games, new_games], ignore_index=True)
+    new_team = df_teams.iloc[[0]].copy()
+    new_team[["Code", "TeamName"]] = ["GRL", "Greenland"]
+    df_teams.loc[df_teams["Code"] == "ALB", "TeamName"] = "Republic of Albania"
+    df_teams = df_teams[df_teams["Code"] != "AFG"]
+    df_teams = pd.concat([df_teams, new_team], ignore_index=True)
+
+    summary_statements = []
+    event.listen(engine, "before_cursor_execute", lambda *args: summary_statements.append(args[2])
+                 if args[2].startswith(("INSERT INTO games_summary", "DELETE FROM games_summary")) else None)
+    counts = refresh_data(engine, df_games, df_teams)
+
+    assert summary_statements and all("WHERE" in statement for statement in summary_statements)
+    expected_engine = new_engine()
+    bulk_add_data(expected_engine, df_games, df_teams)
+    assert counts == {"games": {"inserted": 1, "updated": 1, "deleted": 1},
+                      "team_codes": {"inserted": 1, "updated": 1, "deleted": 1}}
+    assert natural_rows(engine) == natural_rows(expected_engine)
+
+
+def test_refresh_data_one_sheet(engine_fixture):
+    """
+    Given a database loaded from the workbook
+    When refresh_data is called with only a games sheet without the 1968 games
+    Then the team_codes sheet should be read from the workbook, and only the 1968 games deleted
+    """
+    add_data(engine_fixture, bulk=True)
+    df_games, _ = read_data()
+    counts = refresh_data(engine_fixture, df_games=df_games[df_games["year"] != 1968])
+    assert counts == {"games": {"inserted": 0, "updated": 0, "deleted": 1},
+                      "team_codes": {"inserted": 0, "updated": 0, "deleted": 0}}
+
+
+def test_refresh_data_full_reload_failure(engine_fixture, monkeypatch):
+    """
+    Given a database with data but no fingerprints, which refresh_data reloads in full
+    When writing the reloaded rows fails
+    Then the error should be raised and the database should have the data it had before
+    """
+    add_data(engine_fixture, bulk=True)
+    with engine_fixture.begin() as conn:
+        conn.execute(delete(SourceFingerprint))
+    before = table_rows(engine_fixture)
+
+    def fail(*args, **kwargs):
+        raise RuntimeError("write failed")
+
+    monkeypatch.setattr(database._LoadRows, "write", fail)
+    with pytest.raises(RuntimeError):
+        refresh_data(engine_fixture)
+    assert table_rows(engine_fixture) == before
+
+
+def test_create_db_engine_applies_profile(tmp_path):
+    """
+    Given a database file
+    When an engine is created with the "read-serving" profile and a connection is opened
+    Then the connection should use WAL journaling and enforce foreign keys
+    """
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'paralympics.db'}", profile="read-serving")
+    with engine.connect() as conn:
+        assert conn.exec_driver_sql("PRAGMA journal_mode").scalar() == "wal"
+        assert conn.exec_driver_sql("PRAGMA foreign_keys").scalar() == 1
+
+
+def test_create_db_engine_unknown_profile():
+    """
+    Given a profile name that is not in PRAGMA_PROFILES
+    When create_db_engine is called
+    Then a ValueError should be raised
+    """
+    with pytest.raises(ValueError):
+        create_db_engine("sqlite:///:memory:", profile="fast")
+
+
+def test_add_data_report(engine_fixture):
+    """
+    Given an empty database
+    When add_data is called with bulk=True
+    Then the report should have a phase for reading the workbook and for inserting each table, with the rows
+    inserted, and the load should be committed once
+    """
+    report = add_data(engine_fixture, bulk=True)
+    rows = table_rows(engine_fixture)
+    assert "read workbook" in report.phases
+    assert report.phases["insert games"].rows == len(rows["games"])
+    assert report.phases["insert games"].statements >= 1
+    assert report.total.commits == 1
+    assert json.loads(report.to_json())["operation"] == "add_data"
+
+
+def test_drop_data_report(engine_fixture):
+    """
+    Given a database with data
+    When drop_data is called
+    Then the report should have the number of rows deleted from each table
+    """
+    add_data(engine_fixture, bulk=True)
+    rows = table_rows(engine_fixture)
+    report = drop_data(engine_fixture)
+    deleted = {name.removeprefix("delete "): stats.rows for name, stats in report.phases.items() if name != "commit"}
+    assert deleted == {name: len(rows[name]) for name in deleted}
+    assert deleted["games"] > 30
+    assert report.total.commits == 1
+
+
+def test_migrate_games_dates(engine_fixture):
+    """
+    Given games rows written by an earlier version, with dates as dd-mm-YYYY text, and an invalid date
+    When migrate_games_dates is called twice
+    Then the valid dates should be converted to ISO once and the invalid date left as it is
+    """
+    with engine_fixture.begin() as conn:
+        conn.execute(text("INSERT INTO games (event_type, year, start_date, end_date) VALUES "
+                          "('summer', 2000, '18-10-2000', '29-10-2000'), ('winter', 2002, '31-02-2002', NULL)"))
+        assert migrate_games_dates(conn) == 2
+        assert migrate_games_dates(conn) == 0
+        rows = conn.execute(text("SELECT start_date, end_date FROM games ORDER BY id")).all()
+    assert [tuple(row) for row in rows] == [("2000-10-18", "2000-10-29"), ("31-02-2002", None)]
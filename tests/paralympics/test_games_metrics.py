@@ -0,0 +1,87 @@
+""" Tests for the games_metrics.py module in src/para_app and QueryService.games_metrics
+
+Tests included:
+
+    - The duration and fm_ratio of every Games are the values of calculate_duration and calculate_fm_ratio
+    - Games without a valid duration or ratio are flagged with the error message of the instance method
+    - Criteria select a subset of the Games
+
+"""
+import pandas as pd
+import pytest
+from sqlmodel import Session, select
+
+from para_app.models import Games
+from para_app.query_service import QueryService
+
+
+def instance_metric(games: Games, method: str) -> tuple:
+    """ Returns (value, None) of the Games method, or (None, message) if it raises a ValueError """
+    try:
+        return getattr(games, method)(), None
+    except ValueError as e:
+        return None, str(e)
+
+
+def row_metric(row, column: str) -> tuple:
+    """ Returns (value, error) of a metric in a games_metrics row, with None for a missing value """
+    value = getattr(row, column)
+    return None if pd.isna(value) else value, getattr(row, f"{column}_error")
+
+
+def test_metrics_match_instance_methods(engine_fixture, db_with_data):
+    """
+    Given a database loaded with add_data, where some Games have no participants
+    When games_metrics is called
+    Then each row should have the duration and fm_ratio, or error message, of the Games' instance methods
+    """
+    df = QueryService(engine_fixture).games_metrics()
+    with Session(engine_fixture) as session:
+        games = session.exec(select(Games).order_by(Games.id)).all()
+    assert len(df) == len(games)
+    assert df["fm_ratio_error"].notna().any()
+    for g, row in zip(games, df.itertuples()):
+        assert row.id == g.id
+        assert row_metric(row, "duration") == instance_metric(g, "calculate_duration")
+        assert row_metric(row, "fm_ratio") == instance_metric(g, "calculate_fm_ratio")
+    assert str(df["duration"].dtype) == "Int64"
+
+
+@pytest.mark.parametrize("start_date, end_date, participants_m, participants_f", [
+    ("01-02-2000", "05-02-2000", 0, 2),
+    ("1-2-2000", "5-2-2000", -1, 2),
+    ("31-02-2000", "05-03-2000", 5, None),
+    ("10-02-2000", "05-02-2000", 3, 3),
+    ("01-02-2000 ", "05-02-2000", 4, 4),
+    ("2000-02-01", "2000-02-05", 1, 1),
+    (None, "05-02-2000", None, None),
+    ("29-02-2000", "01-03-2000", 2, 1),
+])
+def test_invalid_rows_flagged(engine_fixture, start_date, end_date, participants_m, participants_f):
+    """
+    Given a Games with dates or participants that may not be valid for the instance methods
+    When games_metrics is called
+    Then the metrics or error messages should be those of the instance methods rather than an error raised
+    """
+    games = Games(event_type="summer", year=2000, start_date=start_date, end_date=end_date,
+                  participants_m=participants_m, participants_f=participants_f)
+    with Session(engine_fixture) as session:
+        session.add(games)
+        session.commit()
+        session.refresh(games)
+    row = next(QueryService(engine_fixture).games_metrics().itertuples())
+    assert row_metric(row, "duration") == instance_metric(games, "calculate_duration")
+    assert row_metric(row, "fm_ratio") == instance_metric(games, "calculate_fm_ratio")
+
+
+def test_metrics_criteria(engine_fixture, db_with_data):
+    """
+    Given a database loaded with add_data
+    When games_metrics is called with criteria on event_type and year
+    Then only the Games matching all the criteria should be returned, ordered by id
+    """
+    df = QueryService(engine_fixture).games_metrics(Games.event_type == "winter", Games.year >= 2000)
+    assert len(df) > 0
+    assert set(df["event_type"]) == {"winter"}
+    assert (df["year"] >= 2000).all()
+    assert df["id"].is_monotonic_increasing
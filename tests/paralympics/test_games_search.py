@@ -0,0 +1,80 @@
+""" Tests for the games_search.py module in src/para_app and QueryService.search
+
+Tests included:
+
+    - search finds Games by a word of their highlights or a host name, with the matched words marked in the snippet
+    - A prefix search matches the start of words, a keyword search only whole words
+    - Host and Games writes are searchable straight away
+    - FTS5 operators and punctuation in the text are searched for rather than parsed
+
+"""
+import pytest
+from sqlmodel import Session
+
+from para_app.games_service import GamesService
+from para_app.models import Games
+from para_app.query_service import QueryService
+
+
+def test_search_highlights_and_hosts(engine_fixture, db_with_data):
+    """
+    Given a database loaded with add_data
+    When search is called with a word of the highlights and with a host name
+    Then the Games with that word or host should be returned, with the matched words in [ ] in the snippet
+    """
+    qs = QueryService(engine_fixture)
+    results = qs.search("wheelchair")
+    assert results
+    assert all("[Wheelchair]" in row.highlights or "[wheelchair]" in row.highlights for row in results)
+    with Session(engine_fixture) as session:
+        assert all("wheelchair" in session.get(Games, row.id).highlights.lower() for row in results)
+
+    rome = qs.search("rome")
+    assert [(row.year, row.event_type, row.hosts) for row in rome] == [(1960, "summer", "Rome")]
+    assert len(qs.search("wheelchair", limit=2)) == 2
+
+
+def test_prefix_search(engine_fixture, db_with_data):
+    """
+    Given a database loaded with add_data
+    When the start of a host name is searched for with and without prefix=True
+    Then only the prefix search should return the Games held there
+    """
+    qs = QueryService(engine_fixture)
+    assert qs.search("innsbr") == []
+    results = qs.search("innsbr", prefix=True)
+    assert results
+    assert {row.hosts for row in results} == {"Innsbruck"}
+
+
+def test_writes_are_searchable(engine_fixture, db_with_data):
+    """
+    Given a host and a Games in the database
+    When the host is renamed with update_host and the Games highlights are changed with GamesService
+    Then search should find them by the new words and not the old ones
+    """
+    qs = QueryService(engine_fixture)
+    host = qs.read_hosts()[0]
+    old_name = host.place_name
+    host.place_name = "Zanzibar"
+    qs.update_host(host)
+    assert qs.search(old_name) == []
+    assert qs.search("zanzibar")
+
+    with Session(engine_fixture) as session:
+        games = session.get(Games, 1)
+        games.highlights = "Quokka mascot unveiled"
+        GamesService(session).update_games(games)
+    assert [row.id for row in qs.search("quokka")] == [1]
+
+
+@pytest.mark.parametrize("text", ['"wheelchair', "wheelchair OR", "NEAR(wheelchair)", "wheel-chair*", "  "])
+def test_search_operators_not_parsed(engine_fixture, db_with_data, text):
+    """
+    Given text with FTS5 operators, quotes or punctuation
+    When it is searched for
+    Then only its words should be matched rather than the text raising a syntax error
+    """
+    results = QueryService(engine_fixture).search(text)
+    assert isinstance(results, list)
+    assert all("[" in row.highlights or row.hosts for row in results)
@@ -0,0 +1,128 @@
+""" Tests for the games_service.py module in src/para_app
+
+Tests included:
+
+    - create_many_games inserts Games and dicts in multi-row statements and returns their ids in order
+    - read_games_many returns the Games with the ids in one IN query
+    - delete_games_many deletes the Games and the rows that reference them
+    - read_games and delete_games work on one Games
+    - create_many_games with refresh_summary=False leaves the summary to be refreshed later
+    - Loaded Games are created with the values of all their columns
+
+"""
+import math
+
+from sqlalchemy import event
+from sqlmodel import Session, func, select
+
+from para_app import games_service
+from para_app.games_service import GamesService
+from para_app.games_summary import refresh_games_summary
+from para_app.models import Games, GamesDisability, GamesHost, GamesSummary, GamesTeam
+from para_app.query_service import QueryService
+
+
+def new_games(n: int) -> list[dict]:
+    """ Returns n dicts of Games column values """
+    return [{"event_type": "summer", "year": 2100 + i, "highlights": f"Synthetic games number{i}"} for i in range(n)]
+
+
+def test_create_many_games(engine_fixture, db_with_data, monkeypatch):
+    """
+    Given 25 Games as dicts and one as a Games, and a batch size of 10 rows
+    When create_many_games is called
+    Then 3 INSERT statements should be run, the ids returned in order, and the Games summarised and searchable
+    """
+    monkeypatch.setattr(games_service, "GAMES_INSERT_BATCH_SIZE", 10)
+    rows = new_games(25) + [Games(event_type="winter", year=2200, highlights="Quokka mascot")]
+    inserts = []
+    event.listen(engine_fixture, "before_cursor_execute",
+                 lambda *args: inserts.append(args[2]) if args[2].startswith("INSERT INTO games ") else None)
+    with Session(engine_fixture) as session:
+        ids = GamesService(session).create_many_games(rows)
+    assert len(inserts) == math.ceil(len(rows) / 10)
+    assert len(ids) == len(rows) and ids == sorted(ids)
+
+    with Session(engine_fixture) as session:
+        created = GamesService(session).read_games_many(ids)
+        assert [(g.id, g.year, g.event_type) for g in created] == [
+            (games_id, row["year"] if isinstance(row, dict) else row.year,
+             row["event_type"] if isinstance(row, dict) else row.event_type) for games_id, row in zip(ids, rows)]
+        assert session.get(GamesSummary, ids[-1]).year == 2200
+    assert [row.id for row in QueryService(engine_fixture).search("quokka")] == [ids[-1]]
+    assert [row.id for row in QueryService(engine_fixture).search("number3")] == [ids[3]]
+
+
+def test_read_games_many(engine_fixture, db_with_data):
+    """
+    Given Games ids in any order, repeated, and an id with no Games
+    When read_games_many is called
+    Then the Games should be read with one query and returned once each, ordered by id
+    """
+    selects = []
+    event.listen(engine_fixture, "before_cursor_execute", lambda *args: selects.append(args[2]))
+    with Session(engine_fixture) as session:
+        games = GamesService(session).read_games_many([5, 2, 9, 2, 100000])
+    assert [g.id for g in games] == [2, 5, 9]
+    assert len(selects) == 1
+
+
+def test_delete_games_many(engine_fixture, db_with_data):
+    """
+    Given Games that have hosts, disabilities and teams
+    When delete_games_many is called with their ids
+    Then the Games, their links and summary rows should be deleted, and the number of Games returned
+    """
+    with Session(engine_fixture) as session:
+        ids = session.exec(select(Games.id).order_by(Games.id).limit(5)).all()
+        assert GamesService(session).delete_games_many(ids) == 5
+    with Session(engine_fixture) as session:
+        for model in (GamesHost, GamesDisability, GamesTeam, GamesSummary):
+            assert session.exec(select(func.count()).select_from(model).where(model.games_id.in_(ids))).one() == 0
+        assert GamesService(session).read_games_many(ids) == []
+        assert GamesService(session).delete_games_many(ids) == 0
+    assert not {row.id for row in QueryService(engine_fixture).search("wheelchair")} & set(ids)
+
+
+def test_read_and_delete_games(engine_fixture, db_with_data):
+    """
+    Given a Games id
+    When read_games and then delete_games are called
+    Then the Games should be returned, then deleted
+    """
+    with Session(engine_fixture) as session:
+        service = GamesService(session)
+        assert service.read_games(1).id == 1
+        assert service.delete_games(1) == "Games with id 1 deleted."
+        assert service.read_games(1) is None
+
+
+def test_create_many_games_deferred_summary(engine_fixture):
+    """
+    Given Games to import
+    When create_many_games is called with refresh_summary=False, and refresh_games_summary afterwards
+    Then there should be no summary or search rows for the Games until the refresh, which adds them
+    """
+    with Session(engine_fixture) as session:
+        ids = GamesService(session).create_many_games(new_games(3), refresh_summary=False)
+        assert session.exec(select(func.count()).select_from(GamesSummary)).one() == 0
+        assert QueryService(engine_fixture).search("number1") == []
+        refresh_games_summary(session, ids, inserted=True)
+        session.commit()
+        assert [row.games_id for row in QueryService(engine_fixture).query_games_summary()] == ids
+    assert [row.id for row in QueryService(engine_fixture).search("number1")] == [ids[1]]
+
+
+def test_create_many_games_from_loaded_games(engine_fixture, db_with_data):
+    """
+    Given Games loaded from the database and then expired
+    When create_many_games is called with them
+    Then the new Games should have the values of every column of the loaded Games, not only those in memory
+    """
+    with Session(engine_fixture) as session:
+        loaded = session.exec(select(Games).order_by(Games.id).limit(2)).all()
+        expected = [(g.year, g.event_type, g.start_date, g.highlights, g.participants) for g in loaded]
+        session.expire_all()
+        ids = GamesService(session).create_many_games(loaded)
+        created = GamesService(session).read_games_many(ids)
+        assert [(g.year, g.event_type, g.start_date, g.highlights, g.participants) for g in created] == expected
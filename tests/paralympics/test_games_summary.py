@@ -0,0 +1,103 @@
+""" Tests for the games_summary.py module in src/para_app
+
+Tests included:
+
+    - add_data builds a games_summary row for each Games with its hosts, countries, disabilities and teams
+    - update_host and delete_host refresh the summary rows of the host's games
+    - update_hosts and delete_hosts refresh the summary rows of the hosts' games
+    - A refreshed summary matches a rebuilt one
+
+"""
+from sqlmodel import Session, func, select
+
+from para_app.games_summary import rebuild_games_summary, refresh_games_summary
+from para_app.models import Games, GamesSummary, Host
+from para_app.query_service import QueryService
+
+
+def summary_rows(engine) -> list:
+    """ Returns the rows of games_summary ordered by games_id """
+    with engine.connect() as conn:
+        return conn.execute(select(GamesSummary.__table__).order_by(GamesSummary.games_id)).all()
+
+
+def games_for_host(engine, place_name: str) -> list[GamesSummary]:
+    """ Returns the summary rows that list the host """
+    return [row for row in QueryService(engine).query_games_summary() if place_name in (row.hosts or "")]
+
+
+def test_summary_built_by_add_data(engine_fixture, db_with_data):
+    """
+    Given a database loaded with add_data
+    When the games_summary rows are read
+    Then there should be one for each Games, with the hosts, host countries and disabilities of the Games
+    """
+    qs = QueryService(engine_fixture)
+    summary = qs.query_games_summary()
+    with Session(engine_fixture) as session:
+        assert len(summary) == session.exec(select(func.count()).select_from(Games)).one()
+        games = session.get(Games, summary[0].games_id)
+        assert summary[0].hosts == ", ".join(host.place_name for host in games.hosts)
+        assert summary[0].disabilities == ", ".join(disability.description for disability in games.disabilities)
+        assert summary[0].teams == len(games.teams)
+    assert [(row.year, row.event_type) for row in summary] == sorted((row.year, row.event_type) for row in summary)
+    assert ("Rome", "Italy") in {(row.hosts, row.countries) for row in summary}
+    assert [tuple(row) for row in qs.query_disabilities_by_games()] == [
+        (row.year, row.event_type, row.disabilities) for row in summary if row.disabilities is not None]
+
+
+def test_update_and_delete_host_refresh_summary(engine_fixture, db_with_data):
+    """
+    Given a host of one of the Paralympics
+    When the host's place name is changed with update_host and then it is deleted with delete_host
+    Then the summary should list the new place name, and then no longer list the host
+    """
+    qs = QueryService(engine_fixture)
+    host = qs.read_hosts()[0]
+    old_name = host.place_name
+    games_ids = {row.games_id for row in games_for_host(engine_fixture, old_name)}
+    assert games_ids
+
+    host.place_name = "Renamed host"
+    qs.update_host(host)
+    assert games_for_host(engine_fixture, old_name) == []
+    assert {row.games_id for row in games_for_host(engine_fixture, "Renamed host")} == games_ids
+
+    qs.delete_host(host.id)
+    assert games_for_host(engine_fixture, "Renamed host") == []
+
+
+def test_batch_host_writes_refresh_summary(engine_fixture, db_with_data):
+    """
+    Given the hosts of the Paralympics
+    When they are renamed with update_hosts and then deleted with delete_hosts
+    Then the summary should list the new names, and then list no hosts
+    """
+    qs = QueryService(engine_fixture)
+    hosts = qs.read_hosts()
+    for host in hosts:
+        host.place_name = f"{host.place_name} (renamed)"
+    qs.update_hosts(hosts)
+    assert all(row.hosts is None or row.hosts.endswith("(renamed)") for row in qs.query_games_summary())
+
+    qs.delete_hosts([host.id for host in hosts])
+    assert {(row.hosts, row.countries) for row in qs.query_games_summary()} == {(None, None)}
+
+
+def test_refresh_matches_rebuild(engine_fixture, db_with_data):
+    """
+    Given a database whose hosts are renamed directly in the host table
+    When the summary is refreshed for every Games, and then rebuilt
+    Then the refreshed and rebuilt summaries should be the same
+    """
+    with Session(engine_fixture) as session:
+        for host in session.exec(select(Host)):
+            host.place_name = host.place_name.upper()
+        session.commit()
+    with engine_fixture.begin() as conn:
+        refresh_games_summary(conn, conn.execute(select(Games.id)).scalars())
+    refreshed = summary_rows(engine_fixture)
+    with engine_fixture.begin() as conn:
+        rebuild_games_summary(conn)
+    assert summary_rows(engine_fixture) == refreshed
+    assert any(row.hosts == "ROME" for row in refreshed)
@@ -14,9 +14,13 @@ Tests included:
     - Calculate duration where the start_date and end_date are not present
     - Calculate the mf ratio where the participants_m and participants_f are present
     - Calculate the mf ratio where the participants_m and participants_f are not present
+    - Games dates are stored as ISO text and read back as dd-mm-YYYY
 
 """
+from datetime import date
+
 import pytest
+from sqlalchemy import text
 from sqlalchemy.exc import IntegrityError
 
 from para_app.models import Games
@@ -112,3 +116,26 @@ def test_calculate_ratio_values_missing():
     test_games = Games(event_type="summer", year=2020, participants_f=12)
     with pytest.raises(ValueError):
         test_games.calculate_fm_ratio()
+
+
+@pytest.mark.parametrize("start_date, stored, read", [
+    ("01-02-2000", "2000-02-01", "01-02-2000"),
+    ("1-2-2000", "2000-02-01", "01-02-2000"),
+    (date(2000, 2, 1), "2000-02-01", "01-02-2000"),
+    ("31-02-2000", "31-02-2000", "31-02-2000"),
+    (None, None, None),
+])
+def test_games_dates_stored_as_iso(session_fixture, start_date, stored, read):
+    """
+    Given a Games with a start_date as dd-mm-YYYY text, a date, an invalid date or None
+    When the Games is committed and read back
+    Then a valid date should be stored as ISO text and read as dd-mm-YYYY, and an invalid one kept as it is
+    """
+    games = Games(event_type="summer", year=2000, start_date=start_date)
+    session_fixture.add(games)
+    session_fixture.commit()
+    raw = session_fixture.connection().execute(text("SELECT start_date FROM games WHERE id = :id"),
+                                               {"id": games.id}).scalar()
+    assert raw == stored
+    session_fixture.expire_all()
+    assert session_fixture.get(Games, games.id).start_date == read
@@ -0,0 +1,149 @@
+""" Tests for the query_metrics.py module in src/para_app
+
+Tests included:
+
+    - The statements, QueryService methods and checkouts are recorded with their rows
+    - Statements over the threshold are logged to the slow-query log with their parameters and method
+    - Nothing is recorded after stop()
+    - dump writes the metrics as JSON
+    - Checkouts are still recorded after the engine's pool is disposed, with the time to open new connections
+    - A failed statement does not leave its start time to be taken for the next statement
+
+"""
+import json
+import logging
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.exc import OperationalError
+
+from para_app.query_metrics import LatencyHistogram, QueryMetrics
+from para_app.query_service import QueryService
+
+
+def test_metrics_recorded(engine_fixture, db_with_data):
+    """
+    Given an instrumented query service
+    When read methods are called while the metrics are recording
+    Then each method and statement should have a histogram with the number of calls and the method rows
+    """
+    metrics = QueryMetrics(engine_fixture)
+    qs = metrics.instrument(QueryService(engine_fixture))
+    with metrics:
+        hosts = qs.read_hosts()
+        qs.read_hosts()
+        hosts_by_id = qs.read_hosts_by_ids([1, 2, 3])
+        qs.read_hosts_by_ids([4, 5])
+        iterated = list(qs.iter_hosts(batch_size=5))
+
+    assert metrics.methods["read_hosts"].count == 2
+    assert metrics.methods["read_hosts"].rows == 2 * len(hosts)
+    assert metrics.methods["read_hosts_by_ids"].rows == len(hosts_by_id) + 2
+    assert metrics.methods["iter_hosts"].rows == len(iterated)
+    # The IN lists of different lengths are counted as one statement
+    in_statements = [statement for statement in metrics.statements if "host.id IN" in statement]
+    assert len(in_statements) == 1
+    assert metrics.statements[in_statements[0]].count == 2
+    assert metrics.checkouts.count >= 5
+    assert sum(metrics.methods["read_hosts"].buckets) == 2
+
+
+def test_slow_query_log(engine_fixture, db_with_data, caplog):
+    """
+    Given metrics with a slow-query threshold of 0 seconds
+    When query_host_country is called
+    Then its statement should be logged with its parameters and the method, and kept in slow_queries
+    """
+    metrics = QueryMetrics(engine_fixture, slow_threshold=0)
+    qs = metrics.instrument(QueryService(engine_fixture))
+    with caplog.at_level(logging.WARNING, logger="para_app.slow_queries"), metrics:
+        qs.query_host_country("Italy")
+    slow_statements = [slow for slow in metrics.slow_queries if slow.statement is not None]
+    assert slow_statements[0].method == "query_host_country"
+    assert "Italy" in str(slow_statements[0].parameters)
+    assert any("Slow query" in message and "Italy" in message for message in caplog.messages)
+    assert any("Slow method" in message and "query_host_country" in message for message in caplog.messages)
+
+
+def test_stop(engine_fixture, db_with_data):
+    """
+    Given metrics that have been started and then stopped
+    When a query is run
+    Then no statement or checkout should be recorded
+    """
+    metrics = QueryMetrics(engine_fixture)
+    metrics.start()
+    metrics.stop()
+    QueryService(engine_fixture).read_hosts()
+    assert metrics.statements == {}
+    assert metrics.checkouts.count == 0
+
+
+def test_dump(engine_fixture, db_with_data, tmp_path):
+    """
+    Given metrics recorded for a query
+    When dump is called with a path
+    Then the file should hold the same metrics as the returned dict
+    """
+    metrics = QueryMetrics(engine_fixture)
+    qs = metrics.instrument(QueryService(engine_fixture))
+    with metrics:
+        qs.query_games_year_type()
+    path = tmp_path / "metrics.json"
+    dumped = metrics.dump(path)
+    assert json.loads(path.read_text()) == dumped
+    assert dumped["methods"]["query_games_year_type"]["count"] == 1
+
+
+def test_histogram_percentile():
+    """
+    Given a histogram of 99 fast and 1 slow measurement
+    When the percentiles are read
+    Then the median should be the bucket of the fast ones and the maximum the slow one
+    """
+    histogram = LatencyHistogram()
+    for _ in range(99):
+        histogram.record(0.0008)
+    histogram.record(0.3)
+    assert histogram.percentile(50) == 0.001
+    assert histogram.percentile(99) == 0.001
+    assert histogram.percentile(100) == 0.3
+    assert histogram.max_seconds == 0.3
+
+
+def test_checkouts_after_dispose(tmp_path):
+    """
+    Given metrics started on an engine for a database file
+    When connections are checked out, the engine is disposed and a connection is checked out again
+    Then every checkout should be recorded, with the time taken to open each new connection
+    """
+    engine = create_engine(f"sqlite:///{tmp_path / 'metrics.db'}")
+    with QueryMetrics(engine) as metrics:
+        for _ in range(2):
+            with engine.connect():
+                pass
+        engine.dispose()
+        with engine.connect():
+            pass
+    assert metrics.checkouts.count == 3
+    # The first checkout and the one after dispose open a new connection, the second reuses the first
+    assert metrics.checkouts.buckets[0] >= 1 and metrics.checkouts.max_seconds > 0
+    engine.dispose()
+    with engine.connect():
+        pass
+    assert metrics.checkouts.count == 3
+
+
+def test_failed_statement(engine_fixture):
+    """
+    Given metrics that are recording
+    When a statement fails and another statement is run on the same connection
+    Then no start time should be left on the connection and the second statement should be recorded
+    """
+    with QueryMetrics(engine_fixture) as metrics, engine_fixture.connect() as conn:
+        with pytest.raises(OperationalError):
+            conn.exec_driver_sql("SELECT * FROM no_such_table")
+        assert not conn.info.get("query_start")
+        conn.exec_driver_sql("SELECT 1")
+        assert not conn.info.get("query_start")
+    assert metrics.statements["SELECT 1"].count == 1
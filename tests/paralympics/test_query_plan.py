@@ -0,0 +1,74 @@
+""" Tests for the query_plan.py module in src/para_app
+
+Tests included:
+
+    - With the indexes declared in the models no QueryService statement scans a whole table unexpectedly
+    - Without the link table indexes the full table scans are reported
+    - Checking the plans does not change the data
+    - Full scans are found in the plan steps of SQLite before and from 3.36
+
+"""
+import pytest
+from sqlalchemy import text
+
+from para_app.query_plan import check_query_plans, format_report, full_scans
+from para_app.query_service import QueryService
+
+
+def test_no_full_scans(engine_fixture, db_with_data):
+    """
+    Given a database with the tables and indexes declared in the models
+    When check_query_plans is called
+    Then there should be a plan for each QueryService read and no plan should have a full table scan
+    """
+    plans = check_query_plans(engine_fixture)
+    assert {plan.method for plan in plans} >= {"query_games_type_with_host", "query_games_disability",
+                                               "query_teams_year", "create_host", "delete_host", "read_hosts_by_ids",
+                                               "create_hosts", "update_hosts", "delete_hosts", "update_where",
+                                               "export", "games_metrics"}
+    assert [plan for plan in plans if plan.full_scans] == []
+    assert format_report(plans).endswith("0 with full table scans")
+
+
+def test_full_scans_reported(engine_fixture, db_with_data):
+    """
+    Given a database without the indexes on the games_disability link table
+    When check_query_plans is called
+    Then query_games_disability should be reported as scanning games_disability
+    """
+    with engine_fixture.begin() as conn:
+        conn.execute(text("DROP INDEX ix_games_disability_games_id_disability_id"))
+        conn.execute(text("DROP INDEX ix_games_disability_disability_id_games_id"))
+    plans = check_query_plans(engine_fixture)
+    scans = {plan.method: plan.full_scans for plan in plans if plan.full_scans}
+    assert scans["query_games_disability"] == ["games_disability"]
+
+
+def test_check_does_not_change_data(engine_fixture, db_with_data):
+    """
+    Given a database with data
+    When check_query_plans is called
+    Then the hosts should be unchanged, as the example writes are rolled back
+    """
+    hosts = QueryService(engine_fixture).read_hosts()
+    check_query_plans(engine_fixture)
+    assert QueryService(engine_fixture).read_hosts() == hosts
+
+
+@pytest.mark.parametrize("steps, tables", [
+    (["SCAN games", "SEARCH games_host USING INDEX ix_games_host_games_id (games_id=?)"], ["games"]),
+    (["SCAN TABLE games", "SEARCH TABLE games_host USING INDEX ix_games_host_games_id (games_id=?)"], ["games"]),
+    (["SCAN games_host_1"], ["games_host"]),
+    (["SCAN TABLE games_host AS games_host_1"], ["games_host"]),
+    (["SCAN games USING INDEX ix_games_start_date"], []),
+    (["SCAN TABLE games USING COVERING INDEX ix_games_start_date"], []),
+    (["CO-ROUTINE anon_2", "SCAN games", "SCAN anon_2"], ["games"]),
+    (["MATERIALIZE 1", "SCAN TABLE games", "SCAN SUBQUERY 1"], ["games"]),
+])
+def test_full_scans_steps(steps, tables):
+    """
+    Given the steps of a query plan as written by SQLite from 3.36, or by earlier versions with TABLE
+    When full_scans is called
+    Then only the tables read without an index should be returned, not subqueries or index scans
+    """
+    assert full_scans(steps) == tables
@@ -7,7 +7,17 @@ The QueryService class required the engine_fixture
 The db_with_data fixture adds data at the start of each test function and removes it at the end (function scope)
 
 """
+import sqlite3
+from datetime import date, datetime
+from pathlib import Path
+
+import pytest
+from sqlalchemy import event
+
+from para_app.database import db_file
+from para_app.models import Disability, Games, Host, Team
 from para_app.query_service import QueryService
+from para_app.result_cache import ResultCache
 
 
 def test_read_hosts(engine_fixture, db_with_data):
@@ -43,3 +53,310 @@ def test_create_host(engine_fixture, db_with_data):
     host = qs.create_host(place_name="Cape Town", country_name="South Africa")
     assert host.place_name == "Cape Town"
 
+
+def test_batch_host_crud(engine_fixture, db_with_data):
+    """
+    Given a query service
+    When hosts are created, read, updated and deleted with the batch methods
+    Then each method should return the hosts in order with their country ids and the deleted hosts should be gone
+    """
+    qs = QueryService(engine_fixture)
+    hosts = qs.create_hosts([("Cape Town", "South Africa"), ("Atlantis", "No such country"), ("Milan", "Italy")])
+    assert [host.place_name for host in hosts] == ["Cape Town", "Atlantis", "Milan"]
+    assert hosts[1].country_id is None
+    assert hosts[2].country_id == qs.read_host(1).country_id  # Rome
+    host_ids = [host.id for host in hosts]
+    assert qs.read_hosts_by_ids(host_ids + [-1]) == hosts
+
+    for host in hosts:
+        host.place_name = host.place_name.upper()
+    updated = qs.update_hosts(hosts)
+    assert [host.place_name for host in updated] == ["CAPE TOWN", "ATLANTIS", "MILAN"]
+    assert [host.place_name for host in qs.read_hosts_by_ids(host_ids)] == ["CAPE TOWN", "ATLANTIS", "MILAN"]
+
+    assert qs.delete_hosts(host_ids + [1]) == 4
+    assert qs.read_hosts_by_ids(host_ids + [1]) == []
+    assert all(host not in ("Rome",) for host, _ in qs.query_host_country("Italy"))
+
+
+def test_create_hosts_statements(engine_fixture, db_with_data):
+    """
+    Given a query service
+    When create_hosts is called with 500 hosts
+    Then it should run four statements and commit once
+    """
+    qs = QueryService(engine_fixture)
+    statements = []
+    event.listen(engine_fixture, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    event.listen(engine_fixture, "commit", lambda conn: statements.append("COMMIT"))
+    hosts = qs.create_hosts([(f"Host {i}", "Italy") for i in range(500)])
+    assert len(hosts) == 500
+    assert len(statements) == 4
+    assert statements[2] == "COMMIT"
+
+
+def test_cached_reads_invalidated_by_write(engine_fixture, db_with_data):
+    """
+    Given a query service with a result cache
+    When read_hosts is called twice, then a host is created and read_hosts is called again
+    Then the second call should be a cache hit and the third should include the new host
+    """
+    qs = QueryService(engine_fixture, cache=ResultCache())
+    first = qs.read_hosts()
+    assert qs.read_hosts() is first
+    assert (qs.cache.hits, qs.cache.misses) == (1, 1)
+
+    qs.create_host(place_name="Cape Town", country_name="South Africa")
+    assert "Cape Town" in str(qs.read_hosts())
+    assert qs.cache.misses == 2
+
+
+def test_cached_reads_keyed_on_arguments(engine_fixture, db_with_data):
+    """
+    Given a query service with a result cache
+    When query_region_teams is called for two regions and a write is made to a table it does not read
+    Then each region should be a separate entry and both should still be cached after the write
+    """
+    qs = QueryService(engine_fixture, cache=ResultCache())
+    europe = qs.query_region_teams("Europe")
+    asia = qs.query_region_teams("Asia")
+    assert europe != asia
+    qs.create_host(place_name="Cape Town", country_name="South Africa")
+    assert qs.query_region_teams("Europe") is europe
+    assert qs.cache.info()["hits"] == 1
+
+
+def test_unit_of_work_shares_session(engine_fixture, db_with_data):
+    """
+    Given a query service
+    When a host is created, read and deleted inside unit_of_work()
+    Then the calls should run on one connection with a single commit and the host should be gone afterwards
+    """
+    qs = QueryService(engine_fixture)
+    events = []
+    event.listen(engine_fixture, "engine_connect", lambda conn: events.append("connect"))
+    event.listen(engine_fixture, "commit", lambda conn: events.append("commit"))
+    with qs.unit_of_work():
+        host = qs.create_host(place_name="Cape Town", country_name="South Africa")
+        assert qs.read_host(host.id).place_name == "Cape Town"
+        qs.delete_host(host.id)
+    assert events == ["connect", "commit"]
+    assert host.place_name == "Cape Town"
+    assert qs.read_host(host.id) is None
+
+
+def test_unit_of_work_rolls_back(engine_fixture, db_with_data):
+    """
+    Given a query service
+    When a host is created inside unit_of_work() and the block then raises an error
+    Then the host should not be in the database
+    """
+    qs = QueryService(engine_fixture)
+    with pytest.raises(RuntimeError):
+        with qs.unit_of_work():
+            qs.create_host(place_name="Cape Town", country_name="South Africa")
+            raise RuntimeError("abandon the unit of work")
+    assert "Cape Town" not in str(qs.read_hosts())
+
+
+def test_iter_hosts_matches_read_hosts(engine_fixture, db_with_data):
+    """
+    Given an instance of the query service
+    When iter_hosts is called with a batch size smaller than the number of hosts
+    Then it should yield the same hosts in the same order as read_hosts
+    """
+    qs = QueryService(engine_fixture)
+    assert list(qs.iter_hosts(batch_size=4)) == list(qs.read_hosts())
+    assert list(qs.iter_games_host_country(batch_size=4)) == list(qs.query_games_host_country())
+
+
+def test_page_games(engine_fixture, db_with_data):
+    """
+    Given an instance of the query service
+    When page_games is called with a limit of 4, passing each page's next_after to get the next page
+    Then the pages should hold every games once in year and id order and the last page should have no next_after
+    """
+    qs = QueryService(engine_fixture)
+    games = []
+    page = qs.page_games(limit=4)
+    while True:
+        assert len(page.items) <= 4
+        games += page.items
+        if page.next_after is None:
+            break
+        page = qs.page_games(after=page.next_after, limit=4)
+    assert [(g.year, g.id) for g in games] == sorted((g.year, g.id) for g in games)
+    assert len(games) == len({g.id for g in games}) == len(qs.query_games_year_type())
+
+
+def test_page_games_host_country(engine_fixture, db_with_data):
+    """
+    Given an instance of the query service
+    When page_games_host_country is called for every page with a limit of 5
+    Then the pages together should hold the same rows as query_games_host_country
+    """
+    qs = QueryService(engine_fixture)
+    rows = []
+    after = None
+    while True:
+        page = qs.page_games_host_country(limit=5) if after is None else qs.page_games_host_country(after, 5)
+        rows += [tuple(row[:4]) for row in page.items]
+        after = page.next_after
+        if after is None:
+            break
+    assert sorted(rows) == sorted(tuple(row) for row in qs.query_games_host_country())
+
+
+def test_page_hosts(engine_fixture, db_with_data):
+    """
+    Given an instance of the query service
+    When the first page of hosts is read with a limit of 10 and then the page after it
+    Then the second page should start after the last id of the first
+    """
+    qs = QueryService(engine_fixture)
+    first = qs.page_hosts(limit=10)
+    second = qs.page_hosts(after_id=first.next_after, limit=10)
+    assert first.next_after == first.items[-1].id
+    assert second.items[0].id > first.next_after
+
+
+def test_repeated_calls_use_compiled_cache(engine_fixture, db_with_data):
+    """
+    Given a query service whose methods have each been called once
+    When the methods are called again with other arguments
+    Then every statement should be taken from the engine's compiled cache rather than compiled again
+    """
+    qs = QueryService(engine_fixture)
+    qs.query_games_type_with_host("winter")
+    qs.query_teams_year(2016, "summer")
+    qs.page_games()
+    cache_misses = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if context.cache_hit != context.dialect.CACHE_HIT:
+            cache_misses.append(statement)
+
+    event.listen(engine_fixture, "before_cursor_execute", record)
+    qs.query_games_type_with_host("summer")
+    qs.query_teams_year(2012, "winter")
+    qs.page_games(after=(2000, 0), limit=5)
+    event.remove(engine_fixture, "before_cursor_execute", record)
+    assert cache_misses == []
+
+
+def test_year_arguments_bound(engine_fixture, db_with_data):
+    """
+    Given the summer Paralympics of 2016 and 2012, and the Paralympics after 2010
+    When query_teams_year is called for each year and query_games_after_year for 2010
+    Then the teams should differ between the years and every games should be after 2010
+    """
+    qs = QueryService(engine_fixture)
+    assert qs.query_teams_year(2016, "summer") != qs.query_teams_year(2012, "summer")
+    assert qs.query_games_after_year(2010)
+    assert all(games.year > 2010 for games in qs.query_games_after_year(2010))
+
+
+def test_update_disability(engine_fixture, db_with_data):
+    """
+    Given a cached query service and the disability 'Les Autres'
+    When update_disability renames it to 'Other'
+    Then one row should be updated in one UPDATE statement, and the cached disabilities and summary should change
+    """
+    qs = QueryService(engine_fixture, cache=ResultCache())
+    assert "Les Autres" in [d.description for d in qs.query_disabilities()]
+    updates = []
+    event.listen(engine_fixture, "before_cursor_execute",
+                 lambda *args: updates.append(args[2]) if args[2].startswith("UPDATE disability") else None)
+    assert qs.update_disability("Les Autres", "Other") == 1
+    assert len(updates) == 1
+    descriptions = [d.description for d in qs.query_disabilities()]
+    assert "Other" in descriptions and "Les Autres" not in descriptions
+    summary_disabilities = " ".join(row.disabilities or "" for row in qs.query_games_summary())
+    assert "Other" in summary_disabilities and "Les Autres" not in summary_disabilities
+    assert qs.update_disability("Les Autres", "Other") == 0
+
+
+def test_update_where(engine_fixture, db_with_data):
+    """
+    Given the teams in Oceania and a host
+    When update_where sets the notes of the Oceania teams and the place name of the host
+    Then it should return the number of rows matched, and the changes should be read back and searchable
+    """
+    qs = QueryService(engine_fixture, cache=ResultCache())
+    oceania = qs.query_region_teams("Oceania")
+    assert qs.update_where(Team, {"notes": "Updated"}, region="Oceania") == len(oceania)
+    assert {team.notes for team in qs.query_region_teams("Oceania")} == {"Updated"}
+
+    host = qs.read_hosts()[0]
+    assert qs.update_where(Host, {"place_name": "Zanzibar"}, id=host.id) == 1
+    assert qs.read_host(host.id).place_name == "Zanzibar"
+    assert qs.search("zanzibar")
+
+
+@pytest.mark.parametrize("model, values, where", [
+    (Games, {"year": 2000}, {"id": 1}),
+    (Host, {"id": 1}, {"place_name": "Rome"}),
+    (Team, {"notes": "x"}, {"colour": "red"}),
+    (Disability, {"description": "x"}, {}),
+])
+def test_update_where_invalid(engine_fixture, model, values, where):
+    """
+    Given a model that cannot be updated, a column that cannot be set or a where column that does not exist
+    When update_where is called
+    Then a ValueError should be raised
+    """
+    with pytest.raises(ValueError):
+        QueryService(engine_fixture).update_where(model, values, **where)
+
+
+@pytest.mark.parametrize("start, end", [("01-01-2000", "31-12-2004"), (date(2000, 1, 1), date(2004, 12, 31))])
+def test_query_games_between_dates(engine_fixture, db_with_data, start, end):
+    """
+    Given a date range as dd-mm-YYYY text or as dates
+    When query_games_between_dates is called
+    Then the Games starting in the range should be returned in order of start_date
+    """
+    qs = QueryService(engine_fixture)
+    games = qs.query_games_between_dates(start, end)
+    expected = [g for g in qs.query_games_by_start()
+                if date(2000, 1, 1) <= datetime.strptime(g.start_date, "%d-%m-%Y").date() <= date(2004, 12, 31)]
+    assert games and [g.id for g in games] == [g.id for g in expected]
+    assert {g.year for g in games} <= {2000, 2002, 2004}
+
+
+def test_query_games_by_start(engine_fixture, db_with_data):
+    """
+    Given a database with data
+    When query_games_by_start is called
+    Then every Games with a start_date should be returned in date order rather than text order
+    """
+    games = QueryService(engine_fixture).query_games_by_start()
+    starts = [datetime.strptime(g.start_date, "%d-%m-%Y") for g in games]
+    assert len(starts) > 30 and starts == sorted(starts)
+
+
+def test_default_engine_keeps_journal_mode():
+    """
+    Given paralympics.db
+    When a QueryService is created without an engine and reads from it
+    Then the database should keep its journal mode and no -wal file should be created
+    """
+    path = Path(str(db_file))
+    journal_mode = sqlite3.connect(path).execute("PRAGMA journal_mode").fetchone()
+    qs = QueryService()
+    qs.read_hosts()
+    qs.engine.dispose()
+    assert sqlite3.connect(path).execute("PRAGMA journal_mode").fetchone() == journal_mode
+    assert not path.with_name(f"{path.name}-wal").exists()
+
+
+@pytest.mark.parametrize("method", ["page_hosts", "page_games", "page_games_host_country"])
+@pytest.mark.parametrize("limit", [0, -1])
+def test_page_invalid_limit(engine_fixture, db_with_data, method, limit):
+    """
+    Given a limit less than 1
+    When a page_ method is called
+    Then a ValueError should be raised rather than a page with a cursor of a row it does not return
+    """
+    with pytest.raises(ValueError):
+        getattr(QueryService(engine_fixture), method)(limit=limit)
@@ -0,0 +1,88 @@
+""" Tests for the result_cache.py module in src/para_app
+
+Tests included:
+
+    - A cached result is returned without loading it again
+    - The least recently used result is removed when the cache is full
+    - A result expires after the time to live
+    - Invalidating a table removes only the results that read it
+
+"""
+from para_app.result_cache import ResultCache
+
+
+class Loader:
+    """ Returns numbered results and counts the calls """
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return self.calls
+
+
+def test_get_or_load_hit():
+    """
+    Given an empty cache
+    When the same key is looked up twice
+    Then the result should be loaded once and there should be one miss and one hit
+    """
+    cache = ResultCache()
+    load = Loader()
+    assert cache.get_or_load("key", ["host"], load) == 1
+    assert cache.get_or_load("key", ["host"], load) == 1
+    assert load.calls == 1
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_least_recently_used_removed():
+    """
+    Given a cache with room for two results holding 'a' and 'b', where 'a' was used most recently
+    When 'c' is added
+    Then 'b' should be removed and 'a' kept
+    """
+    cache = ResultCache(max_entries=2)
+    cache.get_or_load("a", [], Loader())
+    cache.get_or_load("b", [], Loader())
+    cache.get_or_load("a", [], Loader())
+    cache.get_or_load("c", [], Loader())
+    load = Loader()
+    cache.get_or_load("a", [], load)
+    cache.get_or_load("b", [], load)
+    assert load.calls == 1
+    assert len(cache) == 2
+
+
+def test_ttl_expiry():
+    """
+    Given a cache with a 10 second time to live
+    When a result is looked up again after 5 and then after 11 seconds
+    Then it should be a hit after 5 seconds and loaded again after 11 seconds
+    """
+    now = [0.0]
+    cache = ResultCache(ttl=10, clock=lambda: now[0])
+    load = Loader()
+    cache.get_or_load("key", [], load)
+    now[0] = 5
+    assert cache.get_or_load("key", [], load) == 1
+    now[0] = 11
+    assert cache.get_or_load("key", [], load) == 2
+
+
+def test_invalidate_tables():
+    """
+    Given cached results that read the host table and the team table
+    When the host table is invalidated
+    Then only the result that read the host table should be loaded again
+    """
+    cache = ResultCache()
+    cache.get_or_load("hosts", ["host", "country"], Loader())
+    cache.get_or_load("teams", ["team"], Loader())
+    cache.invalidate("host")
+    load = Loader()
+    cache.get_or_load("hosts", ["host", "country"], load)
+    cache.get_or_load("teams", ["team"], load)
+    assert load.calls == 1
+    cache.invalidate()
+    assert len(cache) == 0
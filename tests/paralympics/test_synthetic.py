@@ -0,0 +1,101 @@
+""" Tests for the synthetic.py module in src/para_app
+
+Tests included:
+
+    - A generated database has the requested number of rows and valid foreign keys
+    - The same seed generates the same database and a different seed a different one
+    - A generated workbook loads with stream_add_data into the expected number of rows
+    - Invalid sizes raise a ValueError
+
+"""
+import pytest
+from sqlalchemy import StaticPool, text
+from sqlmodel import SQLModel, create_engine, select
+
+from para_app.database import stream_add_data
+from para_app.synthetic import SyntheticSize, write_database, write_workbook
+
+SIZE = SyntheticSize(games=25, teams=30, hosts=12, disabilities=6, hosts_per_games=2, disabilities_per_games=3,
+                     teams_per_games=2)
+
+
+def new_engine():
+    """ Creates another empty in-memory database with the tables """
+    engine = create_engine("sqlite:///:memory:", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    SQLModel.metadata.create_all(engine)
+    return engine
+
+
+def table_rows(engine) -> dict:
+    """ Returns all rows of every table in the database, keyed by table name """
+    with engine.connect() as conn:
+        return {name: conn.execute(select(table)).all() for name, table in SQLModel.metadata.tables.items()}
+
+
+def foreign_key_errors(engine) -> list:
+    """ Returns the rows whose foreign keys do not refer to a row """
+    with engine.connect() as conn:
+        return conn.execute(text("PRAGMA foreign_key_check")).all()
+
+
+def test_write_database(engine_fixture):
+    """
+    Given an empty database
+    When write_database is called
+    Then each table should have the requested number of rows and every foreign key should refer to a row
+    """
+    counts = write_database(engine_fixture, SIZE, seed=1)
+    rows = table_rows(engine_fixture)
+    assert {name: len(rows[name]) for name in counts} == counts
+    assert counts["games"] == SIZE.games
+    assert counts["host"] == SIZE.hosts
+    assert counts["games_host"] + counts["games_disability"] + counts["games_team"] == SIZE.link_rows
+    assert foreign_key_errors(engine_fixture) == []
+
+
+def test_write_database_seed(engine_fixture):
+    """
+    Given three empty databases
+    When write_database is called on two with the same seed and on the third with another seed
+    Then the first two should have the same rows and the third different rows
+    """
+    same_engine, other_engine = new_engine(), new_engine()
+    write_database(engine_fixture, SIZE, seed=1)
+    write_database(same_engine, SIZE, seed=1)
+    write_database(other_engine, SIZE, seed=2)
+    assert table_rows(same_engine) == table_rows(engine_fixture)
+    assert table_rows(other_engine)["games"] != table_rows(engine_fixture)["games"]
+
+
+def test_write_workbook_loads(engine_fixture, tmp_path):
+    """
+    Given a generated workbook
+    When it is loaded with stream_add_data
+    Then there should be a Games for each row with its hosts, disabilities and country team
+    """
+    path = tmp_path / "synthetic.xlsx"
+    write_workbook(path, SIZE, seed=1)
+    stream_add_data(engine_fixture, data_file=path, batch_size=10)
+    rows = table_rows(engine_fixture)
+    assert len(rows["games"]) == SIZE.games
+    assert len(rows["team"]) == SIZE.teams
+    assert len(rows["games_host"]) == SIZE.games * SIZE.hosts_per_games
+    assert len(rows["games_disability"]) == SIZE.games * SIZE.disabilities_per_games
+    assert len(rows["games_team"]) == SIZE.games
+    assert foreign_key_errors(engine_fixture) == []
+
+
+@pytest.mark.parametrize("size", [
+    {"games": -1},
+    {"teams": 0},
+    {"hosts": 1, "hosts_per_games": 2},
+    {"disabilities": 2, "disabilities_per_games": 3},
+])
+def test_synthetic_size_invalid(size):
+    """
+    Given a size with a negative count or more link rows per Games than rows to link to
+    When a SyntheticSize is created
+    Then a ValueError should be raised
+    """
+    with pytest.raises(ValueError):
+        SyntheticSize(**size)
@@ -0,0 +1,70 @@
+""" Tests for the workbook.py module in src/para_app
+
+Tests included:
+
+    - Reading a workbook twice reuses the cached sheets
+    - A changed workbook is parsed again rather than read from the cache
+    - Streaming a sheet yields batches of converted rows
+
+"""
+import os
+
+import pandas as pd
+import pytest
+
+from para_app import workbook
+from para_app.workbook import cache_path, iter_sheet_batches, read_sheets, to_int
+
+
+@pytest.fixture(scope="function")
+def workbook_file(tmp_path):
+    """ Writes a small two-sheet workbook to a temporary directory and yields its path """
+    path = tmp_path / "sample.xlsx"
+    with pd.ExcelWriter(path) as writer:
+        pd.DataFrame({"year": [1960, 1964], "host": ["Rome", "Tokyo"]}).to_excel(writer, sheet_name="games",
+                                                                                  index=False)
+        pd.DataFrame({"Code": ["GBR"], "TeamName": ["Great Britain"]}).to_excel(writer, sheet_name="team_codes",
+                                                                                 index=False)
+    yield path
+
+
+def test_read_sheets_uses_cache(workbook_file, monkeypatch):
+    """
+    Given a workbook that has been read once
+    When read_sheets is called again after the workbook has only been touched
+    Then the sheets should come from the cache without parsing the workbook
+    """
+    expected = read_sheets(workbook_file, ["games", "team_codes"])
+    assert cache_path(workbook_file, "games").exists()
+
+    def fail_parse(*args):
+        raise AssertionError("workbook parsed instead of read from cache")
+
+    monkeypatch.setattr(workbook, "_parse", fail_parse)
+    os.utime(workbook_file, ns=(0, 0))
+    result = read_sheets(workbook_file, ["games", "team_codes"])
+    pd.testing.assert_frame_equal(result["games"], expected["games"])
+    pd.testing.assert_frame_equal(result["team_codes"], expected["team_codes"])
+
+
+def test_read_sheets_changed_workbook(workbook_file):
+    """
+    Given a workbook that has been read once
+    When the workbook is replaced with different data and read again
+    Then the new data should be returned
+    """
+    read_sheets(workbook_file, ["games"])
+    with pd.ExcelWriter(workbook_file) as writer:
+        pd.DataFrame({"year": [2012], "host": ["London"]}).to_excel(writer, sheet_name="games", index=False)
+    result = read_sheets(workbook_file, ["games"])
+    assert result["games"]["host"].tolist() == ["London"]
+
+
+def test_iter_sheet_batches(workbook_file):
+    """
+    Given a workbook with two rows in the games sheet
+    When iter_sheet_batches is called with a batch_size of 1 and a converter for the year column
+    Then two batches of one row each should be yielded with the converted values
+    """
+    batches = list(iter_sheet_batches(workbook_file, "games", 1, {"year": to_int}))
+    assert batches == [[{"year": 1960, "host": "Rome"}], [{"year": 1964, "host": "Tokyo"}]]